@@ -1,10 +1,24 @@
+# Timing the script run (streamlit reruns it on every interaction) before anything else is imported
+from src.startup import StartupTimer
+startup = StartupTimer('app')
+
+import time
 import streamlit as st
-import ee
-import geemap
-import folium
-from streamlit_folium import folium_static
-from datetime import datetime, timedelta
-import json
+from collections import OrderedDict
+from datetime import datetime
+from src import cache
+from src import classify
+from src import composite
+from src import engine
+from src import geometry
+from src import graph
+from src import indices
+from src import ingest
+from src import instrument
+from src import mapshell
+from src.dates import date_input_proc
+# earth engine, geemap and folium are imported at first use: the input panel is drawn without them
+startup.mark('imports')
 
 st.set_page_config(
     page_title="Wildfire Burn Severity Analysis",
@@ -24,108 +38,308 @@ st.set_page_config(
 # geemap auth + initialization for cloud deployment
 @st.cache_data(persist=True)
 def ee_authenticate(token_name="EARTHENGINE_TOKEN"):
+    import geemap
     geemap.ee_initialize(token_name=token_name)
 
-# Earth Engine drawing method setup
-def add_ee_layer(self, ee_image_object, vis_params, name):
-    map_id_dict = ee.Image(ee_image_object).getMapId(vis_params)
-    layer = folium.raster_layers.TileLayer(
-        tiles=map_id_dict['tile_fetcher'].url_format,
-        attr='Map Data &copy; <a href="https://earthengine.google.com/">Google Earth Engine</a>',
-        name=name,
-        overlay=True,
-        control=True
-    )
-    layer.add_to(self)
-    return layer
-
-# Configuring Earth Engine display rendering method in Folium
-folium.Map.add_ee_layer = add_ee_layer
-
-# Defining a function to create and filter a GEE image collection for results
-def satCollection(cloudRate, initialDate, updatedDate, aoi):
-    collection = ee.ImageCollection('COPERNICUS/S2_SR') \
-        .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", cloudRate)) \
-        .filterDate(initialDate, updatedDate) \
-        .filterBounds(aoi)
-    
-    # Defining a function to clip the colleciton to the area of interst
-    def clipCollection(image):
-        return image.clip(aoi).divide(10000)
-    # clipping the collection
-    collection = collection.map(clipCollection)
-    return collection
+# Persistent result cache shared by every session and rerun
+@st.cache_resource
+def get_result_cache():
+    return cache.ResultCache()
+
+# Local tile server shared by every session: local layers are served as z/x/y PNG tiles rendered
+# and cached on disk (least recently used layers evicted past TILE_MAX_BYTES), no Earth Engine URL expiry
+@st.cache_resource
+def get_tile_server():
+    from src import tiles
+    store = tiles.TileStore()
+    try:
+        server = tiles.TileServer(store)
+    except OSError:
+        # default port taken, any free port will do
+        server = tiles.TileServer(store, port=0)
+    return server.start()
+
+# Compositing methods as shown in the input panel
+COMPOSITING_LABELS = {
+    'median': 'Median (scene cloud filter only)',
+    'masked_median': 'Cloud masked median',
+    'best_pixel': 'Best pixel',
+}
+
+# Analysis modes: burn severity between two dates, or burn recovery over every acquisition from the
+# pre-fire date to a monitoring end date
+SEVERITY_MODE = 'Burn severity'
+RECOVERY_MODE = 'Recovery time series'
+
+# Earth Engine tile URLs are short-lived: cached ones are reused for 12 hours at most
+EE_TILE_URL_MAX_AGE = 12 * 3600
+
+# Streamlit server addresses of an app opened from the machine it runs on (browser.serverAddress)
+LOCAL_ADDRESSES = ('localhost', '127.0.0.1')
 
 # Upload function
 last_uploaded_centroid = None
 
-def upload_files_proc(upload_files):
+def upload_files_proc(upload_files, backend):
     # A global variable to track the latest geojson uploaded
     global last_uploaded_centroid
-    # Setting up a variable that takes all polygons/geometries within the same/different geojson
-    geometry_aoi_list = []
-
-    for upload_file in upload_files:
-        bytes_data = upload_file.read()
-        geojson_data = json.loads(bytes_data)
-
-        if 'features' in geojson_data and isinstance(geojson_data['features'], list):
-            # Handle GeoJSON files with a 'features' list
-            features = geojson_data['features']
-        elif 'geometries' in geojson_data and isinstance(geojson_data['geometries'], list):
-            # Handle GeoJSON files with a 'geometries' list
-            features = [{'geometry': geo} for geo in geojson_data['geometries']]
-        else:
-            # handling cases of unexpected file format or missing 'features' or 'geometries'
-            continue
-
-        for feature in features:
-            if 'geometry' in feature and 'coordinates' in feature['geometry']:
-                coordinates = feature['geometry']['coordinates']
-                geometry = ee.Geometry.Polygon(coordinates) if feature['geometry']['type'] == 'Polygon' else ee.Geometry.MultiPolygon(coordinates)
-                geometry_aoi_list.append(geometry)
-
-                # Update the last uploaded centroid
-                last_uploaded_centroid = geometry.centroid(maxError=1).getInfo()['coordinates']
-
-    if geometry_aoi_list:
-        geometry_aoi = ee.Geometry.MultiPolygon(geometry_aoi_list)
+
+    # Streaming every polygon/geometry within the same/different geojson files into a spatial index,
+    # bounds and centroids are computed locally (no Earth Engine round-trip per feature)
+    feature_index = ingest.load_files(upload_files)
+
+    if len(feature_index):
+        # Update the last uploaded centroid
+        last_uploaded_centroid = feature_index.centroids[-1].tolist()
+
+    # Merging all polygons, or falling back to the backend's default area
+    geometry_aoi = backend.union(feature_index.geometries)
+
+    # the uploaded polygons themselves, kept as zones of the burn statistics
+    return geometry_aoi, feature_index.geometries
+
+
+# Satellite imagery processing as a dependency graph: from the image collections to the map layers
+# Every step is memoized, changing one date only recomputes the branch of that date (and what depends on both)
+def analysis_graph(backend, library_key, memo, cloud_pixel_percentage, compositing, geometry_aoi, zones, classes_preset,
+                   str_initial_start_date, str_initial_end_date, str_updated_start_date, str_updated_end_date,
+                   str_monitoring_end_date=None, recorder=None, dnbr_offset=0.0):
+    g = graph.Graph(memo, recorder=recorder)
+    g.input('backend', backend, key=[backend.name, library_key])
+    g.input('cloud_pixel_percentage', cloud_pixel_percentage)
+    g.input('compositing', compositing)
+    g.input('geometry_aoi', geometry_aoi)
+    g.input('zones', zones)
+    g.input('classes_preset', classes_preset)
+    g.input('initial_dates', (str_initial_start_date, str_initial_end_date))
+    g.input('updated_dates', (str_updated_start_date, str_updated_end_date))
+    g.input('dnbr_offset', dnbr_offset)
+
+    ## Defining and clipping image collections for both dates:
+    # initial Image collection
+    g.node('initial_collection', lambda backend, cloud, dates, aoi, method: backend.satCollection(cloud, *dates, aoi, method),
+           'backend', 'cloud_pixel_percentage', 'initial_dates', 'geometry_aoi', 'compositing')
+    # updated Image collection
+    g.node('updated_collection', lambda backend, cloud, dates, aoi, method: backend.satCollection(cloud, *dates, aoi, method),
+           'backend', 'cloud_pixel_percentage', 'updated_dates', 'geometry_aoi', 'compositing')
+
+    # setting a sat_imagery variable that could be used for various processes later on (tci, NBR... etc)
+    # composited per pixel: SCL masked median or best pixel, see src/composite.py
+    g.node('initial_sat_imagery', lambda backend, collection, method: backend.composite(collection, method),
+           'backend', 'initial_collection', 'compositing')
+    g.node('updated_sat_imagery', lambda backend, collection, method: backend.composite(collection, method),
+           'backend', 'updated_collection', 'compositing')
+
+
+    ####################  Remote Sensing Index #################### 
+
+    ## TCI (True Color Imagery)
+    # TCI image visual parameters
+    g.input('tci_params', {
+    'bands': ['B12', 'B11', 'B4'],
+    'min': 0,
+    'max': 1,
+    'gamma': 1.1
+    })
+
+    # NBR, NDWI, dNBR, RdNBR and RBR of both composites in one fused pass over their bands (src/indices.py)
+    g.node('severity_indices', lambda backend, pre, post, offset: backend.severity_indices(pre, post, offset),
+           'backend', 'initial_sat_imagery', 'updated_sat_imagery', 'dnbr_offset')
+
+    # NDWI (Normalized Difference Water Index)
+    g.node('pre_ndwi', lambda backend, products: backend.mask_gt(products['pre_NDWI'], -0.12), 'backend', 'severity_indices')
+    g.node('post_ndwi', lambda backend, products: backend.mask_gt(products['post_NDWI'], -0.12), 'backend', 'severity_indices')
+
+    g.input('ndwi_params', {
+    'min': -1,
+    'max': 0,
+    'palette': ['#00FFFF', '#0000FF']
+    })
+
+    # NBR (Normalized Burn Ratio)
+    # claculating NBR for pre/post fire
+    g.node('pre_fire_NBR', lambda products: products['pre_NBR'], 'severity_indices')
+    g.node('post_fire_NBR', lambda products: products['post_NBR'], 'severity_indices')
+
+    # Delta NBR (dNBR, offset corrected) and the relativized indices: RdNBR, RBR
+    for name in indices.INDICES:
+        g.node(name, lambda products, name=name: products[name], 'severity_indices')
+        g.input(f'{name}_params', indices.VIS_PARAMS[name])
+
+    # ########## ANALYSIS RESULTS CLASSIFICATION
+    # ##### dNBR classification with the selected thresholds preset
+    g.node('dNBR_classified', lambda backend, dNBR, preset: backend.classify(dNBR, preset), 'backend', 'dNBR', 'classes_preset')
+
+    # Classified dNBR visual parameters
+    g.input('dNBR_classified_params', {
+    'min': 1,
+    'max': 7,
+    'palette': classify.PALETTE
+    })
+
+    # Per class burned area and dNBR statistics, for the whole AOI and each uploaded polygon
+    g.node('zonal_stats', lambda backend, dNBR, classified, aoi, preset, zones: backend.zonal_stats(dNBR, classified, aoi, preset, zones),
+           'backend', 'dNBR', 'dNBR_classified', 'geometry_aoi', 'classes_preset', 'zones')
+
+    ### Burn recovery time series (src/timeseries.py)
+    # every acquisition from the pre-fire dates to the monitoring end date, the scene stack is read once
+    g.input('monitoring_end', str_monitoring_end_date)
+    g.node('series_collection', lambda backend, cloud, pre_dates, end, aoi, method: backend.satCollection(cloud, pre_dates[0], end, aoi, method),
+           'backend', 'cloud_pixel_percentage', 'initial_dates', 'monitoring_end', 'geometry_aoi', 'compositing')
+    # post-fire dates start with the post-fire date window
+    g.node('recovery', lambda backend, collection, pre_dates, post_dates, aoi: backend.recovery(collection, pre_dates, post_dates[0], aoi),
+           'backend', 'series_collection', 'initial_dates', 'updated_dates', 'geometry_aoi')
+    g.node('recovery_trajectory', lambda recovery: recovery[1], 'recovery')
+    for name in ['RdNBR', 'recovery_rate', 'recovery_ratio']:
+        g.node(f'series {name}', lambda recovery, name=name: recovery[0][name], 'recovery')
+
+    # Recovery visual parameters: RdNBR with the severity ramp (RdNBR_params), rate (NBR / year) and ratio from red to green
+    g.input('recovery_rate_params', {
+    'min': -0.1,
+    'max': 0.5,
+    'palette': ['#d7191c', '#fdae61', '#ffffbf', '#a6d96a', '#1a9641']
+    })
+    g.input('recovery_ratio_params', {
+    'min': 0,
+    'max': 1,
+    'palette': ['#d7191c', '#fdae61', '#ffffbf', '#a6d96a', '#1a9641']
+    })
+
+    ### Layers as cacheable data (tile URLs / rendered rasters)
+    # Layers expire: Earth Engine tile URLs after EE_TILE_URL_MAX_AGE, local layers when the tile store evicts
+    # them. The layer nodes depend on the current period / store generation, so the session memo hands out new
+    # getMapId URLs / stores the layers again once theirs may be gone
+    if backend.name == engine.EarthEngineBackend.name:
+        layer_epoch = int(time.time() // EE_TILE_URL_MAX_AGE)
     else:
-        geometry_aoi = ee.Geometry.Point([16.25, 36.65])
+        layer_epoch = None if backend.tiles is None else backend.tiles.store.generation
+    g.input('layer_epoch', layer_epoch)
+    for image, params in [('initial_sat_imagery', 'tci_params'), ('updated_sat_imagery', 'tci_params'),
+                          ('dNBR_classified', 'dNBR_classified_params'), ('pre_ndwi', 'ndwi_params'),
+                          ('series RdNBR', 'RdNBR_params'), ('series recovery_rate', 'recovery_rate_params'),
+                          ('series recovery_ratio', 'recovery_ratio_params')] + \
+                         [(name, f'{name}_params') for name in indices.INDICES]:
+        g.node(f'{image} layer', lambda backend, image, params, epoch: backend.layer_data(image, params), 'backend', image, params,
+               'layer_epoch')
+    return g
+
+# Evaluating the graph nodes needed by the map, concurrently: layers (tile URLs / local tile pyramids) and
+# statistics are prepared at the same time, the map waits for the slowest one instead of their sum
+# progress(name, done, total) reports each node as it completes
+# severity_indices: names of the src/indices.py indices shown as layers
+def satellite_processing(g, initial_date, updated_date, progress=None, analysis_mode=SEVERITY_MODE, severity_indices=()):
+    if analysis_mode == RECOVERY_MODE:
+        return recovery_processing(g, progress)
+
+    ### Layers section - START
+    layer_nodes = {}
+    # Check if the initial and updated dates are the same
+    if initial_date == updated_date:
+        layer_nodes['Satellite Imagery'] = 'updated_sat_imagery layer'
+    else:
+        layer_nodes[f'Pre-Fire Satellite Imagery: {initial_date}'] = 'initial_sat_imagery layer'
+        layer_nodes[f'Post-Fire Satellite Imagery: {updated_date}'] = 'updated_sat_imagery layer'
 
-    return geometry_aoi
+        for name in severity_indices:
+            layer_nodes[indices.LABELS[name]] = f'{name} layer'
 
+        layer_nodes['dNBR Classes'] = 'dNBR_classified layer'
+
+        layer_nodes[f'NDWI: {initial_date}'] = 'pre_ndwi layer'
+
+    #### Layers section - END
+
+    stats_nodes = ['zonal_stats'] if initial_date != updated_date else []
+
+    values = g.evaluate(list(layer_nodes.values()) + stats_nodes, callback=progress)
+    return {
+        # layers keep their drawing order
+        'layers': {name: values[node] for name, node in layer_nodes.items()},
+        'stats': values['zonal_stats'] if stats_nodes else None,
+    }
+
+# Recovery layers and the per date trajectory of the burned pixels
+def recovery_processing(g, progress=None):
+    layer_nodes = {
+        'RdNBR (first post-fire observation)': 'series RdNBR layer',
+        'Recovery Rate (NBR / year)': 'series recovery_rate layer',
+        'Recovery Ratio': 'series recovery_ratio layer',
+    }
+    values = g.evaluate(list(layer_nodes.values()) + ['recovery_trajectory'], callback=progress)
+    return {
+        'layers': {name: values[node] for name, node in layer_nodes.items()},
+        'stats': None,
+        'trajectory': values['recovery_trajectory'],
+    }
 
-# Time input processing function
-def date_input_proc(input_date, time_range):
-    end_date = input_date
-    start_date = input_date - timedelta(days=time_range)
-    
-    str_start_date = start_date.strftime('%Y-%m-%d')
-    str_end_date = end_date.strftime('%Y-%m-%d')
-    return str_start_date, str_end_date
 
 # Main function to run the Streamlit app
 def main():
-    # initiate gee 
-    ee_authenticate(token_name="EARTHENGINE_TOKEN")
-
     #### User input section - START
     # columns for input - map
     c1, c2 = st.columns([3, 1])
 
     with st.container():
         with c2:
+        ## Compute backend input
+            st.info("Compute Backend ⚙️")
+            backend_name = st.selectbox("compute backend", [engine.EarthEngineBackend.name, engine.LocalBackend.name], label_visibility="collapsed")
+            if backend_name == engine.LocalBackend.name:
+                # folder holding the local Sentinel-2 scenes (see src/engine.py for the expected layout)
+                scene_library = st.text_input("Local Sentinel-2 scene library folder", "data/scenes")
+                # decoded bands are kept memory-mappable in the band store, shared by every session
+                from src import bandstore
+                backend = engine.get_backend(backend_name, scene_library, get_tile_server(), bandstore.BandStore())
+            else:
+                # initiate gee 
+                ee_authenticate(token_name="EARTHENGINE_TOKEN")
+                scene_library = None
+                backend = engine.get_backend(backend_name)
+
         ## Cloud coverage input
             st.info("Cloud Coverage 🌥️")
             cloud_pixel_percentage = st.slider(label="cloud pixel rate", min_value=5, max_value=100, step=5, value=75 , label_visibility="collapsed")
 
+        ## Compositing input
+            st.info("Compositing 🧩")
+            # masked methods drop cloudy pixels (SCL band) and filter scenes on their cloudy pixels over the AOI
+            compositing = st.selectbox("compositing", composite.METHODS, index=composite.METHODS.index('masked_median'),
+                                       format_func=lambda method: COMPOSITING_LABELS[method], label_visibility="collapsed")
+
+        ## dNBR classes thresholds input
+            st.info("dNBR Classes Thresholds 📊")
+            classes_preset = st.selectbox("dNBR classes thresholds", list(classify.PRESETS), label_visibility="collapsed")
+
+        ## Severity indices input
+            st.info("Severity Indices 🔥")
+            # computed together in one pass, the selection only picks the layers shown
+            severity_indices = st.multiselect("severity indices", indices.INDICES, label_visibility="collapsed",
+                                              help="dNBR, RdNBR (relativized dNBR) and RBR (relativized burn ratio) layers")
+            dnbr_offset = st.number_input("dNBR offset", value=0.0, step=0.01, format="%.3f",
+                                          help="Mean dNBR of unburned pixels, subtracted from dNBR before the classes, RdNBR and RBR")
+
+        ## Analysis mode input
+            st.info("Analysis Mode 🔭")
+            analysis_mode = st.selectbox("analysis mode", [SEVERITY_MODE, RECOVERY_MODE], label_visibility="collapsed",
+                                         help="Recovery: NBR of every acquisition up to the monitoring end date, in one pass over the scenes")
+
+        ## Map output input
+            # the lightweight map is a small page served by the local tile server: its layer list and styles are
+            # fetched by the browser instead of being sent again with every rerun. The tile server listens on
+            # 127.0.0.1, only a browser on the same machine reaches it: offered with the local backend of an
+            # app running on localhost
+            lightweight_map = False
+            if backend_name == engine.LocalBackend.name and st.get_option('browser.serverAddress') in LOCAL_ADDRESSES:
+                lightweight_map = st.checkbox("Lightweight map page", help="Map page with its layers loaded from a JSON list")
+
         ## File upload
             # User input GeoJSON file
             st.info("Upload Area Of Interest file:")
             upload_files = st.file_uploader("Crete a GeoJSON file at: [geojson.io](https://geojson.io/)", accept_multiple_files=True)
             # calling upload files function
-            geometry_aoi = upload_files_proc(upload_files)
+            geometry_aoi, aoi_polygons = upload_files_proc(upload_files, backend)
+            # each polygon gets its own statistics when there are several
+            zones = aoi_polygons if len(aoi_polygons) > 1 else None
 
 
     with st.container():
@@ -145,128 +359,135 @@ def main():
 
             # Process updated date
             str_updated_start_date, str_updated_end_date = date_input_proc(updated_date, time_range)
+
+            # Monitoring end date of the recovery time series
+            str_monitoring_end_date = None
+            if analysis_mode == RECOVERY_MODE:
+                c1.info("Monitoring End Date 📅")
+                monitoring_end_date = c1.date_input("monitoring end", datetime(2024, 7, 27), label_visibility="collapsed")
+                str_monitoring_end_date = monitoring_end_date.strftime('%Y-%m-%d')
     
     #### User input section - END
+            startup.mark('input panel')
 
             #### Map section - START
-            global last_uploaded_centroid
-
-            # Create the initial map
+            # Initial map view
             if last_uploaded_centroid is not None:
                 latitude = last_uploaded_centroid[1]
                 longitude = last_uploaded_centroid[0]
-                m = folium.Map(location=[latitude, longitude], tiles=None, zoom_start=11, control_scale=True)
+                map_location, map_zoom = [latitude, longitude], 11
             else:
                 # Default location if no file is uploaded
-                m = folium.Map(location=[36.60, 16.00], tiles=None, zoom_start=5, control_scale=True)
-
-            ## Primary basemap
-            # OSM
-            b0 = folium.TileLayer('Open Street Map', name="Open Street Map")
-            b0.add_to(m)
-
-            #### Satellite imagery Processing Section - START
-            ## Defining and clipping image collections for both dates:
-            # initial Image collection
-            initial_collection = satCollection(cloud_pixel_percentage, str_initial_start_date, str_initial_end_date, geometry_aoi)
-            # updated Image collection
-            updated_collection = satCollection(cloud_pixel_percentage, str_updated_start_date, str_updated_end_date, geometry_aoi)
-
-            # setting a sat_imagery variable that could be used for various processes later on (tci, NBR... etc)
-            initial_sat_imagery = initial_collection.median()
-            updated_sat_imagery = updated_collection.median()
-
-
-            ####################  Remote Sensing Index #################### 
-
-            ## TCI (True Color Imagery)
-            # Clipping the image to the area of interest "aoi"
-            pre_fire_tci = initial_sat_imagery
-            post_fire_tci = updated_sat_imagery
-
-            # TCI image visual parameters
-            tci_params = {
-            'bands': ['B12', 'B11', 'B4'],
-            'min': 0,
-            'max': 1,
-            'gamma': 1.1
-            }
-
-            # NDWI (Normalized Difference Water Index)
-            def get_NDWI(image):
-                return image.normalizedDifference(['B3', 'B11'])
-
-            pre_ndwi = get_NDWI(initial_sat_imagery)
-            post_ndwi = get_NDWI(updated_sat_imagery)
-            
-            pre_ndwi = pre_ndwi.updateMask(pre_ndwi.gt(-0.12))
-            post_ndwi = post_ndwi.updateMask(post_ndwi.gt(-0.12))
-
-            ndwi_params = {
-            'min': -1,
-            'max': 0,
-            'palette': ['#00FFFF', '#0000FF']
-            }
-
-            # NBR (Normalized Burn Ratio)
-            def get_NBR(image):
-                return image.normalizedDifference(['B8', 'B12'])
-
-            # claculating NBR for pre/post fire
-            pre_fire_NBR = get_NBR(pre_fire_tci)
-            post_fire_NBR = get_NBR(post_fire_tci)
-
-            # Delta NBR (dNBR)
-            dNBR = pre_fire_NBR.subtract(post_fire_NBR)
-
-            # ########## ANALYSIS RESULTS CLASSIFICATION
-            # Masking satellite images over the water to show only land
-            def satImageMask(sat_image):
-                masked_image = sat_image.updateMask(sat_image.gte(0))
-                return masked_image
-
-            # Mask NBR images
-            pre_fire_NBR = satImageMask(pre_fire_NBR)
-            pre_fire_NBR = satImageMask(pre_fire_NBR)
-
-            # ##### dNBR classification: 8 classes
-            dNBR_classified = ee.Image(dNBR) \
-                .where(dNBR.gte(-0.5).And(dNBR.lt(-0.251)), 1) \
-                .where(dNBR.gte(-0.250).And(dNBR.lt(-0.101)), 2) \
-                .where(dNBR.gte(-0.100).And(dNBR.lt(0.99)), 3) \
-                .where(dNBR.gte(0.100).And(dNBR.lt(0.269)), 4) \
-                .where(dNBR.gte(0.270).And(dNBR.lt(0.439)), 5) \
-                .where(dNBR.gte(0.440).And(dNBR.lt(0.659)), 6) \
-                .where(dNBR.gte(0.660).And(dNBR.lte(1.300)), 7) \
-
-            # Classified dNBR visual parameters
-            dNBR_classified_params = {
-            'min': 1,
-            'max': 7,
-            'palette': ['#1c742c', '#2aae29', '#a1d574', '#f8ebb0', '#f7a769', '#e86c4e', '#902cd6']
-            }
-
-            #### Satellite imagery Processing Section - END
-
-            ### Layers section - START
-            # Check if the initial and updated dates are the same
-            if initial_date == updated_date:
-                m.add_ee_layer(post_fire_tci, tci_params, 'Satellite Imagery')
-            else:
-                m.add_ee_layer(pre_fire_tci, tci_params, f'Pre-Fire Satellite Imagery: {initial_date}')
-                m.add_ee_layer(post_fire_tci, tci_params, f'Post-Fire Satellite Imagery: {updated_date}')
-
-                m.add_ee_layer(dNBR_classified, dNBR_classified_params, 'dNBR Classes')
+                map_location, map_zoom = [36.60, 16.00], 5
 
-                m.add_ee_layer(pre_ndwi, ndwi_params, f'NDWI: {initial_date}')
-
-            #### Layers section - END
+            if lightweight_map:
+                # OSM basemap, layers added below
+                shell = mapshell.MapShell(center=map_location, zoom=map_zoom)
+            else:
+                import folium
+                from streamlit_folium import folium_static
+
+                # Create the initial map
+                m = folium.Map(location=map_location, tiles=None, zoom_start=map_zoom, control_scale=True)
+
+                ## Primary basemap
+                # OSM
+                b0 = folium.TileLayer('Open Street Map', name="Open Street Map")
+                b0.add_to(m)
+
+            #### Satellite imagery Processing Section
+            # Results are cached under the hash of every input: reruns that only toggle a layer,
+            # or come back to a previous analysis, skip the processing and the tile URL requests
+            # per stage timings of this run (JSON logs with WILDFIRE_STAGE_LOG, debug panel below the map)
+            recorder = instrument.Recorder('app')
+            result_cache = get_result_cache()
+            # local results also depend on the library content: added or replaced scenes change the key
+            library_key = [scene_library, backend.library_signature()] if backend.name == engine.LocalBackend.name else None
+            analysis_key = cache.cache_key(
+                backend.name, library_key, geometry_aoi,
+                [str_initial_start_date, str_initial_end_date], [str_updated_start_date, str_updated_end_date],
+                cloud_pixel_percentage, compositing, classes_preset, initial_date == updated_date,
+                analysis_mode, str_monitoring_end_date, severity_indices, dnbr_offset
+            )
+            # Earth Engine tile URLs expire, their cache entries too
+            max_age = EE_TILE_URL_MAX_AGE if backend.name == engine.EarthEngineBackend.name else None
+            with recorder.stage('result cache') as stage:
+                results = result_cache.get(analysis_key, max_age=max_age)
+                # local layers evicted from the tile store since are stored again
+                if results is not None and not backend.has_layers(results['layers'].values()):
+                    results = None
+                stage['cache'] = 'miss' if results is None else 'hit'
+            if results is None:
+                # processing steps memoized for the session: only the branch of the changed inputs is recomputed
+                g = analysis_graph(backend, library_key, st.session_state.setdefault('analysis_memo', OrderedDict()),
+                                   cloud_pixel_percentage, compositing, geometry_aoi, zones, classes_preset,
+                                   str_initial_start_date, str_initial_end_date, str_updated_start_date, str_updated_end_date,
+                                   str_monitoring_end_date, recorder, dnbr_offset)
+                progress_bar = c2.progress(0.0, text="Preparing layers")
+                def progress(name, done, total):
+                    progress_bar.progress(done / total, text=f"{name} ready ({done}/{total})")
+                try:
+                    results = satellite_processing(g, initial_date, updated_date, progress, analysis_mode, severity_indices)
+                except ValueError as error:
+                    # local collections without any scene over the AOI and dates (or on different pixel grids)
+                    if backend.name != engine.LocalBackend.name:
+                        raise
+                    progress_bar.empty()
+                    aoi_bounds = geometry.bounds(geometry_aoi) if geometry_aoi is not None else None
+                    aoi_text = 'whole scenes' if aoi_bounds is None else 'W {:.4f}, S {:.4f}, E {:.4f}, N {:.4f}'.format(*aoi_bounds)
+                    if analysis_mode == RECOVERY_MODE:
+                        dates_text = f"{str_initial_start_date} to {str_monitoring_end_date}"
+                    else:
+                        dates_text = f"pre-fire {str_initial_start_date} to {str_initial_end_date}, post-fire {str_updated_start_date} to {str_updated_end_date}"
+                    st.error(f"{error} in {scene_library} (area of interest: {aoi_text}; dates: {dates_text}, cloud rate {cloud_pixel_percentage}%)")
+                    st.stop()
+                progress_bar.empty()
+                result_cache.put(analysis_key, results)
+                c2.caption(f"Recomputed {len(g.computed)} of {len(g.nodes)} processing steps")
+
+            ### Layers section
+            with recorder.stage('add layers'):
+                for name, layer_data in results['layers'].items():
+                    if lightweight_map:
+                        backend.add_shell_layer(shell, layer_data, name)
+                    else:
+                        backend.add_layer_data(m, layer_data, name)
+
+            cache_stats = result_cache.stats()
+            c2.caption(f"Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+            c2.caption(f"Input panel drawn in {startup.elapsed('input panel') * 1000:.0f} ms, layers ready in {startup.mark('layers') * 1000:.0f} ms")
 
             #### Map result display - START
-            # Folium Map Layer Control: we can see and interact with map layers
-            folium.LayerControl(collapsed=True).add_to(m)
-            # Display the map
-            folium_static(m)
+            with recorder.stage('render map'):
+                if lightweight_map:
+                    # the shell page is written next to the shared assets under the tile server's maps folder, reruns
+                    # only send its url (the page revalidates its layer list, unchanged files answer 304)
+                    import streamlit.components.v1 as components
+                    components.iframe(get_tile_server().write_map(shell, analysis_key), height=500)
+                else:
+                    # Folium Map Layer Control: we can see and interact with map layers
+                    folium.LayerControl(collapsed=True).add_to(m)
+                    # Display the map
+                    folium_static(m)
+
+            ### Burn statistics table
+            if results.get('stats'):
+                st.info("Burn Severity Statistics 📋")
+                st.dataframe(results['stats'])
+
+            ### Burn recovery trajectory
+            if results.get('trajectory'):
+                import pandas as pd
+                st.info("Burn Recovery Trajectory 📈")
+                trajectory = pd.DataFrame(results['trajectory'])
+                st.line_chart(trajectory.set_index('date')[['mean_NBR', 'mean_dNBR', 'mean_RdNBR']])
+                st.dataframe(trajectory)
+
+            ### Processing stages debug panel
+            if c2.checkbox("Show processing stages", help="Time, bytes read, peak memory and cache hits of every processing step of this run"):
+                st.info("Processing Stages ⏱️")
+                st.dataframe(recorder.summary())
+                st.dataframe(recorder.records)
 
     #### Map result display - END
 
@@ -0,0 +1,377 @@
+# Timing the startup before anything else is imported
+from src.startup import StartupTimer
+startup = StartupTimer('batch')
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from src import bandstore
+from src import classify
+from src import engine
+from src import export
+from src import geometry
+from src import ingest
+from src import instrument
+from src import mapshell
+from src import overviews
+from src import render
+from src import tiles
+from src import tiling
+from src import timeseries
+from src import vectorize
+from src import zonal
+from src.dates import date_input_proc
+startup.mark('imports')
+
+#################### Batch burn severity analysis ####################
+# Headless entry point: runs the local engine over every fire of a manifest, no browser or streamlit needed.
+#
+#   python batch.py fires.json --output results --workers 4
+#
+# Manifest (JSON):
+# {
+#   "library": "data/scenes",                  # local Sentinel-2 scene library (see src/engine.py)
+#   "fires": [
+#     {
+#       "name": "chenoua-2022",
+#       "aoi": "aoi/chenoua.geojson",          # GeoJSON file (Feature/FeatureCollection/geometry), paths relative to the manifest
+#       "pre_date": "2022-08-12",
+#       "post_date": "2022-08-20",
+#       "cloud": 20,                           # optional, cloud pixel rate (default 75)
+#       "time_range": 7,                       # optional, days before each date (default 7)
+#       "preset": "USGS",                      # optional, dNBR thresholds preset (default USGS)
+#       "compositing": "masked_median",        # optional, median / masked_median / best_pixel (see src/composite.py)
+#       "dnbr_offset": 0.02,                   # optional, mean dNBR of unburned pixels, subtracted (src/indices.py, default 0)
+#       "recovery_end": "2023-08-20"           # optional, burn recovery time series up to this date (src/timeseries.py)
+#     }
+#   ]
+# }
+#
+# Each fire gets its own folder: the tiled run outputs (NBR, dNBR, RdNBR, RBR... .npy rasters + run.json), stats.json
+# (per class pixels and percent of the classified pixels), burn_scar.geojson, zonal_stats.csv (per class areas,
+# percent of the AOI area and dNBR percentiles, per AOI polygon too, also as .parquet when pandas and pyarrow are
+# installed), a dNBR_classes.png quicklook and a map.html with its pre-rendered tiles.
+# With --export cog / zarr, the rasters are also written as Cloud Optimized GeoTIFFs / a Zarr group in <fire>/export.
+# stages.json records the time, bytes read, peak memory and cache hits of every step (see src/instrument.py),
+# --profile cprofile / pyinstrument also writes a profile of the whole fire (profile.prof / profile.html).
+# With recovery_end, <fire>/recovery holds the recovery rasters (pre_NBR, dNBR, RdNBR, recovery_rate, recovery_ratio .npy),
+# the per post-fire date dNBR / RdNBR stacks (dNBR_series.npy, RdNBR_series.npy: (dates, rows, cols)) and trajectory.csv.
+# <output>/index.html is a lightweight map page (src/mapshell.py) over every fire of the run, its layer list
+# (index.layers.json) points to the fires' tiles and burn scars: serve the output folder to open it
+#   python -m http.server --directory results
+
+# Quicklooks are downsampled to this size at most (pixels on the longest side)
+QUICKLOOK_SIZE = 2048
+
+# Defaults of the optional fire parameters (same as the streamlit app)
+FIRE_DEFAULTS = {
+    'cloud': 75,
+    'time_range': 7,
+    'preset': 'USGS',
+    'compositing': 'masked_median',
+    'dnbr_offset': 0.0,
+}
+
+
+# Reading the manifest, relative paths are resolved against its folder
+def load_manifest(path):
+    with open(path) as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    library = os.path.join(base_dir, manifest['library'])
+    fires = []
+    for fire in manifest['fires']:
+        fire = dict(FIRE_DEFAULTS, **fire)
+        fire['aoi'] = os.path.join(base_dir, fire['aoi'])
+        fires.append(fire)
+    return library, fires
+
+def load_aoi(path):
+    with open(path) as f:
+        return geometry.union(json.load(f))
+
+# Class statistics of a run: percent_classified is the share of the classified pixels (zonal_stats.csv has
+# the share of the AOI area, unclassified and masked pixels included)
+def class_stats(counts, preset):
+    labels = classify.get_preset(preset)['labels']
+    total = int(counts[1:].sum())
+    return [
+        {
+            'class': value,
+            'label': labels[value - 1],
+            'pixels': int(counts[value]),
+            'percent_classified': 100 * float(counts[value]) / total if total else 0.0,
+        }
+        for value in range(1, len(counts))
+    ]
+
+# Layers of map.html: output raster, nodata value, vis params
+MAP_LAYERS = {
+    'dNBR Classes': ('dNBR_classes', 0, {'min': 1, 'max': 7, 'palette': classify.PALETTE}),
+    'dNBR - Burn Severity': ('dNBR', None, {'min': -0.12, 'max': 0.82, 'palette': classify.PALETTE}),
+}
+
+# Burn scar perimeters, styled like webmap.py's burn scar layer
+BURN_SCAR_STYLE = {'color': '#87043b', 'weight': 2, 'fillOpacity': 0}
+BURN_SCAR_TOOLTIP = [('area_ha', 'Area (ha)'), ('mean_dNBR', 'Mean dNBR')]
+
+# Writing the classes quicklook PNG and a folium map of the outputs
+# Returns the PNG path and the native zoom of each map layer's tiles ({output: zoom})
+# The map layers are pre-rendered z/x/y PNG tiles next to map.html: the map works offline and never expires
+def write_maps(fire_dir, fire, summary, outputs, burn_scar=None):
+    import folium
+    from PIL import Image
+
+    # the quicklook is the first overview level (mode resampled classes) fitting in QUICKLOOK_SIZE
+    output_overviews = tiling.open_overviews(summary, fire_dir)
+    classes = outputs['dNBR_classes']
+    for level in output_overviews['dNBR_classes']:
+        if max(classes.shape) <= QUICKLOOK_SIZE:
+            break
+        classes = level
+    step = max(1, int(np.ceil(max(classes.shape) / QUICKLOOK_SIZE)))
+    preview = np.asarray(classes[::step, ::step], dtype=np.float32)
+    preview[preview == 0] = np.nan
+    rgba = render.colorize([preview], {'min': 1, 'max': 7, 'palette': classify.PALETTE})
+    png_path = os.path.join(fire_dir, 'dNBR_classes.png')
+    Image.fromarray(rgba).save(png_path)
+
+    west, south, east, north = engine.transform_bounds(summary['transform'], summary['shape'])
+    m = folium.Map(location=[(south + north) / 2, (west + east) / 2], zoom_start=12, control_scale=True)
+    max_zooms = {}
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = tiles.TileStore(store_dir)
+        for name, (output, nodata, vis_params) in MAP_LAYERS.items():
+            layer = store.add_layer([outputs[output]], summary['transform'], vis_params, nodata,
+                                    overviews.resampling_for(output), [output_overviews[output]])
+            store.prerender(layer, os.path.join(fire_dir, 'tiles', output))
+            _, max_zoom = store.zoom_range(layer)
+            max_zooms[output] = max_zoom
+            folium.raster_layers.TileLayer(
+                tiles=f'tiles/{output}/{{z}}/{{x}}/{{y}}.png',
+                attr='Local rendering',
+                name=f"{name}: {fire['name']}",
+                max_native_zoom=max_zoom,
+                max_zoom=max(max_zoom, 18),
+                overlay=True,
+                control=True
+            ).add_to(m)
+    if burn_scar:
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': burn_scar},
+            name=f"Burn Scar: {fire['name']}",
+            style_function=lambda feature: BURN_SCAR_STYLE,
+            tooltip=folium.GeoJsonTooltip(fields=[field for field, _ in BURN_SCAR_TOOLTIP],
+                                          aliases=[alias for _, alias in BURN_SCAR_TOOLTIP])
+        ).add_to(m)
+    folium.LayerControl(collapsed=False).add_to(m)
+    m.save(os.path.join(fire_dir, 'map.html'))
+    return png_path, max_zooms
+
+# Lightweight map page over the fires of a run (<output>/index.html): the page only holds the shared
+# assets links, each fire adds a few entries to index.layers.json. The classes of every fire are shown,
+# the other layers and the burn scars (fetched on demand) are in the layer control.
+def write_index(output_dir, results):
+    shell = mapshell.MapShell(legend=True, collapsed=False)
+    extents = []
+    for result in sorted(results, key=lambda result: result['name']):
+        fire_url = urllib.parse.quote(result['name'])
+        for name, (output, _, _) in MAP_LAYERS.items():
+            max_zoom = result['max_zooms'][output]
+            shell.tile_layer(f"{name}: {result['name']}", f'{fire_url}/tiles/{output}/{{z}}/{{x}}/{{y}}.png', 'Local rendering',
+                             max_native_zoom=max_zoom, max_zoom=max(max_zoom, 18), visible=output == 'dNBR_classes')
+        shell.vector_layer(f"Burn Scar: {result['name']}", f'{fire_url}/burn_scar.geojson', BURN_SCAR_STYLE, BURN_SCAR_TOOLTIP)
+        extents.append(result['bounds'])
+    if extents:
+        west, south, east, north = [f(values) for f, values in zip((min, min, max, max), zip(*extents))]
+        shell.bounds = [[south, west], [north, east]]
+    return shell.write(output_dir, 'index')
+
+# Zonal statistics table of a run, read from its output rasters: the whole AOI, plus each polygon of the AOI
+# file when it holds several. Written as zonal_stats.csv (and .parquet when pandas + pyarrow are available)
+def write_zonal_stats(fire_dir, fire, summary, outputs):
+    polygons = ingest.load_files([fire['aoi']]).geometries
+    zones = polygons if len(polygons) > 1 else None
+    rows = zonal.zonal_stats(outputs['dNBR_classes'], outputs['dNBR'], summary['transform'], fire['preset'], zones,
+                             aoi=geometry.union(polygons))
+    zonal.write_table(os.path.join(fire_dir, 'zonal_stats.csv'), rows)
+    try:
+        zonal.write_table(os.path.join(fire_dir, 'zonal_stats.parquet'), rows)
+    except ImportError:
+        pass
+    return rows
+
+# Profile files of the --profile choices
+PROFILE_FILES = {
+    'cprofile': 'profile.prof',
+    'pyinstrument': 'profile.html',
+}
+
+# Burn recovery time series of a fire: every scene from the pre-fire date window to recovery_end is read
+# once, the outputs go to <fire>/recovery (see the top of the file), returns the trajectory and its dates
+def write_recovery(fire_dir, fire, backend, aoi):
+    pre_dates = date_input_proc(datetime.strptime(fire['pre_date'], '%Y-%m-%d').date(), fire['time_range'])
+    post_start, _ = date_input_proc(datetime.strptime(fire['post_date'], '%Y-%m-%d').date(), fire['time_range'])
+    collection = backend.satCollection(fire['cloud'], pre_dates[0], fire['recovery_end'], aoi, fire['compositing'])
+    transform, shape = collection.grid()
+    _, _, post_date = timeseries.parse_periods(pre_dates, post_start)
+    dates = timeseries.post_fire_dates([scene.date for scene in collection.scenes], post_date)
+
+    recovery_dir = os.path.join(fire_dir, 'recovery')
+    os.makedirs(recovery_dir, exist_ok=True)
+    # the recovery and per date rasters are written chunk by chunk into memory maps
+    rasters = {name: np.lib.format.open_memmap(os.path.join(recovery_dir, f'{name}.npy'), mode='w+', dtype=np.float32,
+                                               shape=tuple(shape))
+               for name in timeseries.RASTERS}
+    series = {name: np.lib.format.open_memmap(os.path.join(recovery_dir, f'{name}_series.npy'), mode='w+', dtype=np.float32,
+                                              shape=(len(dates),) + tuple(shape))
+              for name in ('dNBR', 'RdNBR')}
+    _, trajectory = backend.recovery(collection, pre_dates, post_start, aoi, series, rasters)
+    for values in list(rasters.values()) + list(series.values()):
+        values.flush()
+    timeseries.write_trajectory(os.path.join(recovery_dir, 'trajectory.csv'), trajectory)
+    with open(os.path.join(recovery_dir, 'recovery.json'), 'w') as f:
+        json.dump({'transform': list(transform), 'shape': list(shape), 'series_dates': [date.isoformat() for date in dates],
+                   'scenes': [scene.id for scene in collection.scenes]}, f, indent=2)
+    return {'series_dates': [date.isoformat() for date in dates], 'trajectory': trajectory}
+
+# Full analysis of one fire, exported as COG / Zarr when export_formats are given
+# band_store (src/bandstore.py) keeps the decoded scene bands for the next fires sharing them
+# profiler: None, 'cprofile' or 'pyinstrument' (optional dependency)
+def process_fire(library, fire, output_dir, tile_workers=1, export_formats=(), band_store=None, profiler=None):
+    start = time.perf_counter()
+    fire_dir = os.path.join(output_dir, fire['name'])
+    os.makedirs(fire_dir, exist_ok=True)
+    recorder = instrument.Recorder(fire['name'])
+    arguments = (library, fire, fire_dir, tile_workers, export_formats, band_store, recorder)
+    try:
+        if profiler:
+            summary = instrument.profiled(profiler, os.path.join(fire_dir, PROFILE_FILES[profiler]), analyse_fire, *arguments)
+        else:
+            summary = analyse_fire(*arguments)
+    finally:
+        # the stages reached are kept when the fire fails
+        recorder.write(os.path.join(fire_dir, 'stages.json'))
+    return {
+        'name': fire['name'],
+        'seconds': time.perf_counter() - start,
+        'peak_rss': summary['peak_rss'],
+        # map layers of the run index page
+        'bounds': list(engine.transform_bounds(summary['transform'], summary['shape'])),
+        'max_zooms': summary['max_zooms'],
+    }
+
+# Steps of a fire's analysis, each one timed by the recorder, returns the tiled run summary
+def analyse_fire(library, fire, fire_dir, tile_workers, export_formats, band_store, recorder):
+    backend = engine.LocalBackend(library, band_store=band_store)
+    aoi = load_aoi(fire['aoi'])
+
+    pre_date = datetime.strptime(fire['pre_date'], '%Y-%m-%d').date()
+    post_date = datetime.strptime(fire['post_date'], '%Y-%m-%d').date()
+    with recorder.stage('collections'):
+        pre_collection = backend.satCollection(fire['cloud'], *date_input_proc(pre_date, fire['time_range']), aoi, fire['compositing'])
+        post_collection = backend.satCollection(fire['cloud'], *date_input_proc(post_date, fire['time_range']), aoi, fire['compositing'])
+
+    # exports carry the pre/post fire composites too
+    composite_bands = tiling.COMPOSITE_BANDS if export_formats else ()
+    with recorder.stage('tiled run', workers=tile_workers) as stage:
+        summary = tiling.run(backend, pre_collection, post_collection, fire_dir, fire['preset'], workers=tile_workers,
+                             composite_bands=composite_bands, offset=fire['dnbr_offset'])
+        stage['tiles'] = summary['tiles']
+    counts = np.asarray(summary['class_counts'])
+    with recorder.stage('vectorize'):
+        burn_scar, _ = vectorize.vectorize_run(fire_dir)
+    _, outputs = tiling.open_outputs(fire_dir)
+    with recorder.stage('zonal stats'):
+        zonal_stats = write_zonal_stats(fire_dir, fire, summary, outputs)
+    stats = {
+        'fire': fire,
+        'pre_fire_scenes': [scene.id for scene in pre_collection.scenes],
+        'post_fire_scenes': [scene.id for scene in post_collection.scenes],
+        'classes': class_stats(counts, fire['preset']),
+        'burn_scar': {
+            'polygons': len(burn_scar),
+            'area_ha': round(sum(feature['properties']['area_ha'] for feature in burn_scar), 4),
+        },
+        'zonal_stats': zonal_stats,
+    }
+    if fire.get('recovery_end'):
+        with recorder.stage('recovery'):
+            stats['recovery'] = write_recovery(fire_dir, fire, backend, aoi)
+    with open(os.path.join(fire_dir, 'stats.json'), 'w') as f:
+        json.dump(stats, f, indent=2)
+
+    with recorder.stage('maps'):
+        _, summary['max_zooms'] = write_maps(fire_dir, fire, summary, outputs, burn_scar)
+    if export_formats:
+        with recorder.stage('export', formats=list(export_formats)):
+            export.export_run(fire_dir, export_formats)
+    return summary
+
+# Running every fire, `workers` fires at a time, then writing the index map of the fires done
+def run_batch(library, fires, output_dir, workers=1, tile_workers=1, export_formats=(), band_store=None, profiler=None):
+    results = []
+    failures = []
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(process_fire, library, fire, output_dir, tile_workers, export_formats, band_store, profiler): fire for fire in fires}
+            for future in as_completed(futures):
+                fire = futures[future]
+                try:
+                    results.append(report(future.result()))
+                except Exception:
+                    failures.append(fire['name'])
+                    print(f"{fire['name']}: failed\n{traceback.format_exc()}", file=sys.stderr)
+    else:
+        for fire in fires:
+            try:
+                results.append(report(process_fire(library, fire, output_dir, tile_workers, export_formats, band_store, profiler)))
+            except Exception:
+                failures.append(fire['name'])
+                print(f"{fire['name']}: failed\n{traceback.format_exc()}", file=sys.stderr)
+    if results:
+        write_index(output_dir, results)
+    return failures
+
+def report(result):
+    print(f"{result['name']}: done in {result['seconds']:.1f}s, peak RSS {result['peak_rss'] / 1024 ** 2:.0f} MB")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batch wildfire burn severity analysis with the local engine')
+    parser.add_argument('manifest', help='JSON manifest listing the fires to process')
+    parser.add_argument('--output', default='results', help='output folder, one sub-folder per fire')
+    parser.add_argument('--workers', type=int, default=1, help='fires processed at the same time')
+    parser.add_argument('--tile-workers', type=int, default=1, help='worker processes per fire for the tiles')
+    parser.add_argument('--export', nargs='+', default=[], choices=export.FORMATS,
+                        help='also export composites, NBR, dNBR, classes and burn scar as COG (rasterio) / Zarr (zarr)')
+    parser.add_argument('--band-store', default=bandstore.BAND_DIR, help='folder keeping the decoded scene bands')
+    parser.add_argument('--no-band-store', action='store_true', help='decode the scene bands on every read')
+    parser.add_argument('--profile', choices=list(PROFILE_FILES),
+                        help='profile each fire with cProfile (profile.prof) or pyinstrument (profile.html)')
+    args = parser.parse_args(argv)
+
+    library, fires = load_manifest(args.manifest)
+    startup.mark('manifest loaded')
+    band_store = None if args.no_band_store else bandstore.BandStore(args.band_store)
+    failures = run_batch(library, fires, args.output, args.workers, args.tile_workers, args.export, band_store, args.profile)
+    if failures:
+        print(f"{len(failures)} of {len(fires)} fires failed: {', '.join(failures)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import re
+import uuid
+
+import numpy as np
+
+from src.cache import CACHE_DIR
+
+#################### Memory-mapped band store ####################
+# Decoded Sentinel-2 bands kept on disk as .npy files, ready for the analysis: reflectance bands already
+# divided by 10000 (float32), SCL as is (uint8). Bands are decoded (GeoTIFF / Zarr) and scaled once, every
+# later read is a memory map: neighbouring analyses, repeated requests and the tile workers of a run share
+# the same pages through the OS page cache instead of decoding the scene again.
+#
+#   <store>/<tile>/<scene_id>/<band>.<source signature>.npy
+#
+# The signature hashes the source file path, size and modification time: an updated scene is decoded again.
+
+BAND_DIR = os.path.join(CACHE_DIR, 'bands')
+
+# Rows decoded at once when a band enters the store
+WRITE_ROWS = 1024
+
+# Sources already read as memory maps, not copied into the store (scaling them on read costs less than
+# reading twice as many float32 bytes)
+MAPPED_EXTENSIONS = ('.npy',)
+
+# Sentinel-2 MGRS tile in a scene id (e.g. 20220812T103031_T31SDA)
+_TILE_PATTERN = re.compile(r'T(\d{2}[A-Z]{3})')
+
+
+# MGRS tile of a scene: 'tile' in its metadata, else found in its id, 'untiled' when there is none
+def scene_tile(scene):
+    if getattr(scene, 'tile', None):
+        return scene.tile
+    match = _TILE_PATTERN.search(scene.id)
+    return match.group(1) if match else 'untiled'
+
+# Signature of a band source (file, or Zarr array folder)
+def source_signature(path):
+    stat = os.stat(path)
+    return hashlib.sha256(f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()[:16]
+
+
+class BandStore:
+    def __init__(self, directory=BAND_DIR):
+        self.directory = directory
+
+    def scene_dir(self, scene):
+        return os.path.join(self.directory, scene_tile(scene), scene.id)
+
+    # Store file of a scene band for its current source
+    def path(self, scene, band):
+        return os.path.join(self.scene_dir(scene), f'{band}.{source_signature(scene.band_source(band))}.npy')
+
+    # Whether a scene band goes through the store
+    def keeps(self, scene, band):
+        return not scene.band_source(band).lower().endswith(MAPPED_EXTENSIONS)
+
+    def has_band(self, scene, band):
+        return os.path.exists(self.path(scene, band))
+
+    # Band of a scene as a read-only memory map, decoded into the store on first use
+    def band(self, scene, band):
+        path = self.path(scene, band)
+        if not os.path.exists(path):
+            self._write(scene, band, path)
+        return np.load(path, mmap_mode='r')
+
+    # Decoding a band row block by row block into a temporary file, moved in place once complete so
+    # concurrent workers never map a partial file (the last one to finish wins, both are identical)
+    def _write(self, scene, band, path):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        height, width = scene.shape
+        tmp_path = os.path.join(directory, f'.{uuid.uuid4().hex}.npy')
+        output = None
+        try:
+            # a zero-height band still reads its (empty) first block: the output gets the band's dtype
+            for row in range(0, max(height, 1), WRITE_ROWS):
+                rows = np.asarray(scene.read_source(band, ((row, min(row + WRITE_ROWS, height)), (0, width))))
+                if output is None:
+                    output = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=rows.dtype, shape=(height, width))
+                output[row:row + len(rows)] = rows
+            output.flush()
+            del output
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # versions decoded from older sources of the band
+        for file_name in os.listdir(directory):
+            if file_name.startswith(f'{band}.') and file_name.endswith('.npy') and file_name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(directory, file_name))
+                except OSError:
+                    pass
+
+    # Decoding bands of scenes ahead of an analysis, returns the number of bands written
+    def prefetch(self, scenes, bands):
+        written = 0
+        for scene in scenes:
+            for band in bands:
+                if band in scene.band_names and self.keeps(scene, band) and not self.has_band(scene, band):
+                    self.band(scene, band)
+                    written += 1
+        return written
@@ -0,0 +1,279 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from src.cache import CACHE_DIR
+
+#################### Offline benchmarks ####################
+# Times every processing stage of the app / batch / webmap logic on synthetic Sentinel-2 scenes, no Earth
+# Engine token or real imagery needed. Each size gets its own scene library (pre / post fire scenes with a
+# smooth burn scar, cloud blobs flagged in SCL) and AOI file (a grid of round polygons), then the stages run
+# `repeat` times and keep their best time:
+#   ingest > aos simplify > composite > indices > classify > vectorize > zonal stats > tiles
+# Results are appended to a JSON lines history and compared with the previous runs of the same size on the
+# same machine: a stage slower than its baseline by more than `threshold` is reported as a regression.
+#
+#   python -m src.bench --sizes 512 1024 2048 --fail-on-regression
+
+# Scene sides in pixels
+SIZES = (512, 1024, 2048)
+
+# Scenes per date range
+SCENES = 3
+
+# Runs per size, the best time of each stage is kept
+REPEAT = 3
+
+# Pixel size (about 10 m) and upper left corner of the synthetic scenes, near the Mt Chenoua use-case
+PIXEL_SIZE = 0.0001
+ORIGIN = (2.3, 36.62)
+
+# Dates of the synthetic scenes, the analysis windows are the 7 days before each date (as in the app)
+PRE_FIRE_DATE = date(2023, 7, 12)
+POST_FIRE_DATE = date(2023, 7, 27)
+
+# AOI polygons per side of the grid, per 32 pixels of scene side
+AOI_CELL_PIXELS = 32
+
+HISTORY_PATH = os.path.join(CACHE_DIR, 'bench', 'history.jsonl')
+
+# Slowdown over the baseline reported as a regression, stages faster than MIN_SECONDS are ignored
+THRESHOLD = 0.2
+MIN_SECONDS = 0.01
+
+# Previous runs making the baseline (median of each stage)
+BASELINE_RUNS = 5
+
+
+#################### Synthetic fixtures
+# Smooth random field in [0, 1]: a sum of gaussian bumps
+def _bumps(shape, count, radius, rng):
+    rows, columns = np.ogrid[:shape[0], :shape[1]]
+    field = np.zeros(shape, dtype=np.float32)
+    for _ in range(count):
+        row, column = rng.uniform(0, shape[0]), rng.uniform(0, shape[1])
+        scale = rng.uniform(0.5, 1.5) * radius
+        field += np.exp(-((rows - row) ** 2 + (columns - column) ** 2) / (2 * scale ** 2)).astype(np.float32)
+    return np.clip(field / max(field.max(), 1e-6), 0, 1)
+
+# Writing a scene of the local library layout (see src/engine.py): one .npy file per band + scene.json
+def write_scene(directory, scene_id, scene_date, bands, transform):
+    scene_dir = os.path.join(directory, scene_id)
+    os.makedirs(scene_dir, exist_ok=True)
+    for band, values in bands.items():
+        np.save(os.path.join(scene_dir, f'{band}.npy'), values)
+    cloudy = np.isin(bands['SCL'], [3, 8, 9, 10]).mean() * 100
+    with open(os.path.join(scene_dir, 'scene.json'), 'w') as f:
+        json.dump({'date': scene_date.isoformat(), 'CLOUDY_PIXEL_PERCENTAGE': float(cloudy), 'transform': list(transform)}, f)
+
+# Scene library of `scenes` pre fire and post fire scenes, returns the grid transform
+def synthetic_library(directory, size, scenes=SCENES, seed=0):
+    rng = np.random.default_rng(seed)
+    shape = (size, size)
+    transform = (ORIGIN[0], PIXEL_SIZE, 0, ORIGIN[1], 0, -PIXEL_SIZE)
+    vegetation = 0.6 + 0.4 * _bumps(shape, 12, size / 8, rng)
+    severity = _bumps(shape, 6, size / 10, rng) ** 1.5
+
+    for period, period_date in (('pre', PRE_FIRE_DATE), ('post', POST_FIRE_DATE)):
+        burnt = severity if period == 'post' else 0
+        for index in range(scenes):
+            noise = lambda scale: rng.normal(0, scale, shape).astype(np.float32)
+            reflectance = {
+                'B2': 0.04 + noise(0.005),
+                'B3': 0.07 + noise(0.005),
+                'B4': 0.06 + 0.04 * burnt + noise(0.005),
+                'B8': 0.35 * vegetation * (1 - 0.7 * burnt) + noise(0.01),
+                'B11': 0.18 + 0.1 * burnt + noise(0.01),
+                'B12': 0.1 + 0.2 * burnt + noise(0.01),
+            }
+            # a cloud blob per scene: bright, flagged as high probability cloud
+            cloud = _bumps(shape, 1, size / 12, rng) > 0.6
+            scl = np.where(cloud, 9, 4).astype(np.uint8)
+            bands = {band: np.clip(np.where(cloud, 0.6, values) * 10000, 0, 65535).astype(np.uint16)
+                     for band, values in reflectance.items()}
+            bands['SCL'] = scl
+            scene_date = period_date - timedelta(days=1 + index)
+            write_scene(directory, f'{scene_date:%Y%m%d}T103031_{period}{index}_T31SDA', scene_date, bands, transform)
+    return transform
+
+# AOI GeoJSON file: a grid of round (32 vertices) polygons over the scene
+def synthetic_aoi(path, size, vertices=32):
+    cells = max(1, size // AOI_CELL_PIXELS)
+    cell = size * PIXEL_SIZE / cells
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    features = []
+    for row in range(cells):
+        for column in range(cells):
+            x = ORIGIN[0] + (column + 0.5) * cell
+            y = ORIGIN[1] - (row + 0.5) * cell
+            ring = np.column_stack([x + 0.45 * cell * np.cos(angles), y + 0.45 * cell * np.sin(angles)]).tolist()
+            ring.append(ring[0])
+            features.append({'type': 'Feature', 'properties': {'cell': len(features)},
+                             'geometry': {'type': 'Polygon', 'coordinates': [ring]}})
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+    return len(features)
+
+
+#################### Stages
+# Running the whole pipeline once, returns {stage: seconds}
+def run_stages(library, aoi_path, tile_dir):
+    from src import aos
+    from src import classify
+    from src import engine
+    from src import geometry
+    from src import ingest
+    from src import tiles
+    from src import vectorize
+    from src import zonal
+    from src.dates import date_input_proc
+
+    timings = {}
+    def timed(stage, function, *args):
+        start = time.perf_counter()
+        value = function(*args)
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - start
+        return value
+
+    feature_index = timed('ingest', ingest.load_files, [aoi_path])
+    timed('aos simplify', geometry.simplify, {'type': 'Polygon', 'coordinates': [aos.coordinates().tolist()]},
+          geometry.tolerance_for_resolution(10))
+
+    backend = engine.LocalBackend(library)
+    aoi = backend.union(feature_index.geometries)
+    images = {}
+    for period, period_date in (('pre', PRE_FIRE_DATE), ('post', POST_FIRE_DATE)):
+        collection = timed('composite', backend.satCollection, 75, *date_input_proc(period_date, 7), aoi, 'masked_median')
+        images[period] = timed('composite', backend.composite, collection)
+
+    # NBR, NDWI, dNBR, RdNBR and RBR in one fused pass (src/indices.py)
+    products = timed('indices', backend.severity_indices, images['pre'], images['post'])
+    timed('indices', backend.mask_gt, products['pre_NDWI'], -0.12)
+    dNBR = products['dNBR']
+    classified = timed('classify', backend.classify, dNBR, 'USGS')
+
+    classes = np.nan_to_num(classified.band('classification')).astype(np.uint8)
+    timed('vectorize', vectorize.burn_scar_features, classes, dNBR.band('dNBR'), dNBR.transform, 'USGS')
+    timed('zonal stats', zonal.zonal_stats, classes, dNBR.band('dNBR'), dNBR.transform, 'USGS', feature_index.geometries)
+
+    store = tiles.TileStore(tile_dir)
+    vis_params = {'min': 1, 'max': 7, 'palette': classify.PALETTE}
+    def tile_pyramid():
+        layer = store.add_layer([classified.band('classification')], classified.transform, vis_params, resampling='mode')
+        return store.prerender(layer)
+    timed('tiles', tile_pyramid)
+    return timings
+
+# Benchmarking one scene size: fixtures, then `repeat` runs keeping the best time of each stage
+def bench_size(size, repeat=REPEAT, scenes=SCENES):
+    with tempfile.TemporaryDirectory() as work_dir:
+        library = os.path.join(work_dir, 'scenes')
+        aoi_path = os.path.join(work_dir, 'aoi.geojson')
+        synthetic_library(library, size, scenes)
+        features = synthetic_aoi(aoi_path, size)
+        best = {}
+        for run in range(repeat):
+            timings = run_stages(library, aoi_path, os.path.join(work_dir, f'tiles{run}'))
+            for stage, seconds in timings.items():
+                best[stage] = min(seconds, best.get(stage, np.inf))
+    return {'size': size, 'scenes': scenes, 'aoi_features': features, 'stages': best}
+
+
+#################### History
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    return {
+        'machine': platform.node(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+    }
+
+def load_history(path):
+    if not os.path.isfile(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def append_history(path, records):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+# Baseline of a result: median time of each stage over the last runs of the same size, scene count and machine
+def baseline(history, result):
+    previous = [record for record in history
+                if record['size'] == result['size'] and record['scenes'] == result['scenes']
+                and record['environment']['machine'] == result['environment']['machine']][-BASELINE_RUNS:]
+    stages = {}
+    for stage in result['stages']:
+        values = [record['stages'][stage] for record in previous if stage in record['stages']]
+        if values:
+            stages[stage] = float(np.median(values))
+    return stages
+
+# Stages slower than their baseline by more than `threshold` (and MIN_SECONDS): [(stage, seconds, baseline)]
+def regressions(result, stages_baseline, threshold=THRESHOLD):
+    return [
+        (stage, seconds, stages_baseline[stage])
+        for stage, seconds in result['stages'].items()
+        if stage in stages_baseline and seconds > stages_baseline[stage] * (1 + threshold)
+        and seconds - stages_baseline[stage] > MIN_SECONDS
+    ]
+
+def report(result, stages_baseline):
+    print(f"{result['size']} x {result['size']} px, {result['scenes']} scenes per date, {result['aoi_features']} AOI polygons")
+    for stage, seconds in result['stages'].items():
+        line = f'  {stage:<14} {seconds * 1000:9.1f} ms'
+        if stage in stages_baseline:
+            change = (seconds / stages_baseline[stage] - 1) * 100 if stages_baseline[stage] else 0
+            line += f'   baseline {stages_baseline[stage] * 1000:9.1f} ms  {change:+6.1f} %'
+        print(line)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Offline benchmarks of the processing stages on synthetic scenes')
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(SIZES), help='scene sides in pixels')
+    parser.add_argument('--scenes', type=int, default=SCENES, help='scenes per date range')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='runs per size, the best time is kept')
+    parser.add_argument('--history', default=HISTORY_PATH, help='JSON lines file the results are appended to')
+    parser.add_argument('--no-history', action='store_true', help="don't record this run")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='slowdown reported as a regression (0.2 = 20 %%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on a regression')
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    run_info = {'date': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(), 'environment': environment()}
+    results, slower = [], []
+    for size in args.sizes:
+        result = dict(run_info, **bench_size(size, args.repeat, args.scenes))
+        stages_baseline = baseline(history, result)
+        report(result, stages_baseline)
+        slower += [(size, *regression) for regression in regressions(result, stages_baseline, args.threshold)]
+        results.append(result)
+
+    if not args.no_history:
+        append_history(args.history, results)
+    for size, stage, seconds, stage_baseline in slower:
+        print(f'regression: {stage} at {size} px, {seconds * 1000:.1f} ms vs {stage_baseline * 1000:.1f} ms', file=sys.stderr)
+    return 1 if slower and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
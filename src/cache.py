@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import date, datetime
+
+import numpy as np
+
+#################### Content-addressed result cache ####################
+# Results are stored on disk under the hash of everything that produced them
+# (area of interest, date windows, cloud rate, thresholds preset...), so a repeated request is
+# a file read instead of a recomputation. The cache is bounded in bytes, least recently used
+# entries are evicted first.
+
+# Default cache location and size
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'wildfire-burn-severity')
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Turning key parts into plain JSON values (ee.Geometry, numpy values, dates...)
+def _canonical(value):
+    if hasattr(value, 'toGeoJSON'):
+        return value.toGeoJSON()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+# Hashing the inputs of a result into a cache key
+def cache_key(*parts, **named_parts):
+    content = json.dumps(_canonical([parts, named_parts]), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # key > [entry size in bytes, last access time], rebuilt from disk
+        self._entries = {}
+        for key in os.listdir(directory):
+            manifest = os.path.join(directory, key, 'entry.json')
+            if os.path.isfile(manifest):
+                self._entries[key] = [self._entry_size(key), os.path.getmtime(manifest)]
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def _entry_size(self, key):
+        entry_dir = self._entry_dir(key)
+        return sum(os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+
+    # Reading an entry: a dict of JSON values and numpy arrays (memory-mapped), None when missing or
+    # older than max_age seconds
+    def get(self, key, max_age=None):
+        manifest = os.path.join(self._entry_dir(key), 'entry.json')
+        with self._lock:
+            try:
+                with open(manifest) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            if max_age is not None and time.time() - entry['created'] > max_age:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            now = time.time()
+            os.utime(manifest, (now, now))
+            if key in self._entries:
+                self._entries[key][1] = now
+        return self._load(key, entry['values'])
+
+    def _load(self, key, value):
+        if isinstance(value, dict):
+            if '__array__' in value:
+                return np.load(os.path.join(self._entry_dir(key), value['__array__']), mmap_mode='r')
+            return {name: self._load(key, item) for name, item in value.items()}
+        if isinstance(value, list):
+            return [self._load(key, item) for item in value]
+        return value
+
+    def _dump(self, entry_dir, value, arrays):
+        if isinstance(value, np.ndarray):
+            file_name = f'{len(arrays)}.npy'
+            np.save(os.path.join(entry_dir, file_name), value)
+            arrays.append(file_name)
+            return {'__array__': file_name}
+        if isinstance(value, dict):
+            return {str(name): self._dump(entry_dir, item, arrays) for name, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._dump(entry_dir, item, arrays) for item in value]
+        return _canonical(value)
+
+    # Storing an entry, values is a dict of JSON serializable values and numpy arrays
+    def put(self, key, values):
+        # written in a temporary folder then renamed, readers never see half written entries
+        tmp_dir = os.path.join(self.directory, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(tmp_dir)
+        entry = {'created': time.time(), 'values': self._dump(tmp_dir, values, [])}
+        with open(os.path.join(tmp_dir, 'entry.json'), 'w') as f:
+            json.dump(entry, f)
+
+        with self._lock:
+            entry_dir = self._entry_dir(key)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            self._entries[key] = [self._entry_size(key), time.time()]
+            self._evict()
+
+    # Removing the least recently used entries until the cache fits in max_bytes
+    def _evict(self):
+        total = sum(size for size, _ in self._entries.values())
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            del self._entries[key]
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            self._entries = {}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': sum(size for size, _ in self._entries.values()),
+            }
@@ -0,0 +1,98 @@
+import numpy as np
+
+#################### dNBR classification ####################
+# Threshold tables: class k covers [edges[k-1], edges[k]), the last class includes its upper edge
+# when 'top_inclusive' is set. Pixels out of every class (or masked) get class 0.
+PRESETS = {
+    # USGS burn severity levels, as used by the streamlit app
+    'USGS': {
+        'edges': [-0.5, -0.25, -0.1, 0.1, 0.27, 0.44, 0.66, 1.3],
+        'top_inclusive': True,
+        'labels': [
+            'Enhanced Regrowth (High)',
+            'Enhanced Regrowth (Low)',
+            'Unburned',
+            'Low Severity Burns',
+            'Moderate-Low Severity Burns',
+            'Moderate-High Severity Burns',
+            'High Severity Burns',
+        ],
+        # classes making the burn scar mask
+        'burn_scar_from': 4,
+    },
+    # Mt Chenoua use-case thresholds, as used by webmap.py
+    'Project': {
+        'edges': [-0.12, 0, 0.1, 0.27, 0.37, 0.44, 0.66, 0.82, np.inf],
+        'top_inclusive': False,
+        'labels': [
+            'Enhanced Regrowth',
+            'Unburned',
+            'Low Severity Burns',
+            'Moderate-Low Severity Burns',
+            'Moderate Severity Burns',
+            'Moderate-High Severity Burns',
+            'High Severity Burns',
+            'Very High Severity Burns',
+        ],
+        # same threshold as webmap.py's burn scar vectors
+        'burn_scar_from': 4,
+    },
+}
+
+# Classified dNBR palette (classes above 7 are drawn with the last color)
+PALETTE = ['#1c742c', '#2aae29', '#a1d574', '#f8ebb0', '#f7a769', '#e86c4e', '#902cd6']
+
+# Rows processed at once, bounds the temporary arrays whatever the raster size
+CHUNK_ROWS = 1024
+
+
+def get_preset(preset):
+    if isinstance(preset, dict):
+        return preset
+    return PRESETS[preset]
+
+def class_count(preset):
+    return len(get_preset(preset)['edges']) - 1
+
+# Classifying a block of dNBR values in one searchsorted pass
+def classify_block(values, preset):
+    preset = get_preset(preset)
+    edges = np.asarray(preset['edges'], dtype=np.float64)
+    last = len(edges) - 1
+
+    # number of edges <= value, i.e. the class index for values inside the table
+    classes = np.searchsorted(edges, values, side='right')
+    if preset['top_inclusive']:
+        classes[values == edges[-1]] = last
+    # below the first edge (0), above the last one (len(edges)) and NaN (sorted last) are unclassified
+    classes[classes > last] = 0
+    return classes.astype(np.uint8)
+
+# Classifying a whole raster chunk by chunk, returns the class raster and the pixel count of every class
+# (counts[0] holds the unclassified pixels)
+def classify(values, preset='USGS', chunk_rows=CHUNK_ROWS):
+    classes = np.zeros(values.shape, dtype=np.uint8)
+    counts = np.zeros(class_count(preset) + 1, dtype=np.int64)
+
+    for row in range(0, values.shape[0], chunk_rows):
+        block = classify_block(np.asarray(values[row:row + chunk_rows]), preset)
+        classes[row:row + chunk_rows] = block
+        counts += np.bincount(block.ravel(), minlength=len(counts))
+    return classes, counts
+
+# Earth Engine version: the class is the number of lower edges a pixel passes, computed in a single
+# expression instead of one .where() per class
+# Pixels out of the table are masked, like the local classification (the .where() chain kept their raw dNBR,
+# drawn with the first class color)
+def classify_ee(dNBR, preset='USGS'):
+    import ee
+    preset = get_preset(preset)
+    edges = [float(edge) for edge in preset['edges'] if np.isfinite(edge)]
+    lower_edges = edges[:class_count(preset)]
+
+    classes = ee.Image(dNBR).gte(ee.Image.constant(lower_edges)).reduce(ee.Reducer.sum())
+    top = preset['edges'][-1]
+    if np.isfinite(top):
+        in_range = dNBR.lte(top) if preset['top_inclusive'] else dNBR.lt(top)
+        classes = classes.updateMask(in_range)
+    return classes.updateMask(classes.gt(0)).rename('classification').toByte()
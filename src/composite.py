@@ -0,0 +1,107 @@
+import numpy as np
+
+#################### Cloud masking and compositing ####################
+# Per pixel masking from the Sentinel-2 L2A scene classification band (SCL), and composites of stacked
+# (scenes, rows, cols) band arrays computed chunk by chunk:
+#   - median:         plain per pixel median, every observation counts (scene-level cloud filter only)
+#   - masked_median:  median of the clear observations only (NaN where a pixel is never clear)
+#   - best_pixel:     for every pixel, all bands from the single observation of best quality: clear
+#                     vegetation / soil / water first, then the least hazy one (lowest blue reflectance)
+
+METHODS = ('median', 'masked_median', 'best_pixel')
+
+# Methods reading the SCL band: scenes are then filtered on their cloudy pixels over the area of interest
+# instead of the scene-wide CLOUDY_PIXEL_PERCENTAGE
+MASKED_METHODS = ('masked_median', 'best_pixel')
+
+# SCL classes masked out: no data, saturated / defective, cloud shadows, cloud medium / high probability, cirrus
+SCL_MASKED = [0, 1, 3, 8, 9, 10]
+
+# Best pixel quality of the SCL classes left: vegetation, bare soil, water > dark areas, unclassified, snow
+SCL_QUALITY = {2: 1, 4: 2, 5: 2, 6: 2, 7: 1, 11: 1}
+
+# Band used to rank observations of the same quality (haze raises the blue reflectance)
+HAZE_BAND = 'B2'
+
+# Rows composited at once, bounds the sorted copies of the stacks
+CHUNK_ROWS = 256
+
+# Lookup tables indexed by SCL value
+_CLEAR = np.ones(256, dtype=bool)
+_CLEAR[SCL_MASKED] = False
+_QUALITY = np.zeros(256, dtype=np.float32)
+for _value, _quality in SCL_QUALITY.items():
+    _QUALITY[_value] = _quality
+
+
+# Rejecting unknown compositing methods
+def check_method(method):
+    if method not in METHODS:
+        raise ValueError(f"Unknown compositing method: {method} (expected one of {', '.join(METHODS)})")
+
+# Clear observations (True) of an SCL array of any shape
+def clear_mask(scl):
+    return _CLEAR[np.asarray(scl, dtype=np.uint8)]
+
+# Percentage of masked SCL pixels, nodata (0) pixels excluded
+def cloudy_percentage(scl):
+    scl = np.asarray(scl, dtype=np.uint8)
+    observed = np.count_nonzero(scl)
+    if not observed:
+        return 100.0
+    return 100.0 * np.count_nonzero(~_CLEAR[scl] & (scl > 0)) / observed
+
+# Median over the first axis of the valid observations: NaNs are sorted last, the middle of the valid
+# values is then picked for every pixel at once (no per pixel loop, unlike np.nanmedian's fallback)
+def masked_median(stack, valid):
+    values = np.where(valid, stack, np.nan)
+    values.sort(axis=0)
+    count = valid.sum(axis=0)
+    lower = np.take_along_axis(values, (np.maximum(count - 1, 0) // 2)[None], axis=0)[0]
+    upper = np.take_along_axis(values, (count // 2)[None], axis=0)[0]
+    with np.errstate(invalid='ignore'):
+        median = (lower + upper) / 2
+    return np.where(count > 0, median, np.nan).astype(np.float32)
+
+# Index of the best observation of every pixel, and whether it is clear: SCL quality first, the lowest haze
+# band value among observations of the same quality
+def best_pixel_index(scl, haze=None):
+    score = _QUALITY[np.asarray(scl, dtype=np.uint8)]
+    score[~clear_mask(scl)] = -np.inf
+    if haze is not None:
+        # reflectances are below 1 (a few bright targets aside): they never outweigh a quality step
+        score = score - np.clip(np.nan_to_num(haze, nan=1), 0, 0.999)
+    index = np.argmax(score, axis=0)
+    return index, np.isfinite(np.take_along_axis(score, index[None], axis=0)[0])
+
+# Composite of several bands stacked as {band: (scenes, rows, cols)}, `scl` is the matching SCL stack
+# (None when the scenes have no SCL band: every observation is clear)
+def composite(stacks, scl=None, method='median', chunk_rows=CHUNK_ROWS):
+    check_method(method)
+    first = next(iter(stacks.values()))
+    scenes, rows, columns = first.shape
+    results = {band: np.empty((rows, columns), dtype=np.float32) for band in stacks}
+    if scenes == 1 and (scl is None or method == 'median'):
+        for band, stack in stacks.items():
+            results[band][:] = stack[0]
+        return results
+
+    for row in range(0, rows, chunk_rows):
+        chunk = slice(row, row + chunk_rows)
+        if method == 'median' or (scl is None and method == 'masked_median'):
+            for band, stack in stacks.items():
+                results[band][chunk] = np.median(stack[:, chunk], axis=0)
+            continue
+
+        chunk_scl = scl[:, chunk] if scl is not None else np.full(first[:, chunk].shape, 4, dtype=np.uint8)
+        if method == 'masked_median':
+            valid = clear_mask(chunk_scl)
+            for band, stack in stacks.items():
+                results[band][chunk] = masked_median(stack[:, chunk], valid)
+        else:
+            haze = stacks[HAZE_BAND][:, chunk] if HAZE_BAND in stacks else None
+            index, clear = best_pixel_index(chunk_scl, haze)
+            for band, stack in stacks.items():
+                best = np.take_along_axis(stack[:, chunk], index[None], axis=0)[0]
+                results[band][chunk] = np.where(clear, best, np.nan)
+    return results
@@ -0,0 +1,10 @@
+from datetime import timedelta
+
+# Time input processing function: the [start, end) window of `time_range` days ending on input_date
+def date_input_proc(input_date, time_range):
+    end_date = input_date
+    start_date = input_date - timedelta(days=time_range)
+    
+    str_start_date = start_date.strftime('%Y-%m-%d')
+    str_end_date = end_date.strftime('%Y-%m-%d')
+    return str_start_date, str_end_date
@@ -0,0 +1,720 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from src import classify as classification
+from src import composite
+from src import geometry
+from src import indices
+from src import overviews
+from src import render
+from src import spatial
+from src import timeseries
+from src import zonal
+
+#################### Compute backends ####################
+# Both backends expose the same processing steps used by app.py:
+# satCollection > composite > severity_indices (or get_NBR / get_NDWI > get_dNBR) > classify > add_layer
+# EarthEngineBackend runs them remotely, LocalBackend runs them with numpy on local Sentinel-2 bands.
+
+# Sentinel-2 bands read by the analysis (TCI, NDWI, NBR)
+BANDS = ['B2', 'B3', 'B4', 'B8', 'B11', 'B12']
+
+# Sentinel-2 L2A reflectance scale factor
+SCALE = 10000
+
+# Bands holding classes rather than reflectance, never scaled
+UNSCALED_BANDS = ['SCL']
+
+
+#################### Earth Engine backend ####################
+class EarthEngineBackend:
+    name = 'Earth Engine'
+
+    # Converting GeoJSON geometry dicts to a single ee.Geometry, built once client-side
+    def union(self, geometries):
+        import ee
+        if geometries:
+            return ee.Geometry.MultiPolygon(geometry.polygons(geometries))
+        return ee.Geometry.Point([16.25, 36.65])
+
+    # Defining a function to create and filter a GEE image collection for results
+    # With the SCL masked compositing methods, cloudRate applies to the cloudy pixels over the area of interest
+    # instead of the whole scene: scenes mostly cloudy elsewhere are kept
+    def satCollection(self, cloudRate, initialDate, updatedDate, aoi, compositing='median'):
+        import ee
+        composite.check_method(compositing)
+        collection = ee.ImageCollection('COPERNICUS/S2_SR') \
+            .filterDate(initialDate, updatedDate) \
+            .filterBounds(aoi)
+
+        if compositing in composite.MASKED_METHODS:
+            def aoiCloudyPixels(image):
+                cloudy = image.select('SCL').remap(composite.SCL_MASKED, [1] * len(composite.SCL_MASKED), 0).rename('cloudy')
+                percentage = cloudy.reduceRegion(ee.Reducer.mean(), aoi, 60, maxPixels=1e9).getNumber('cloudy').multiply(100)
+                return image.set('AOI_CLOUDY_PIXEL_PERCENTAGE', percentage)
+            collection = collection.map(aoiCloudyPixels).filter(ee.Filter.lt("AOI_CLOUDY_PIXEL_PERCENTAGE", cloudRate))
+        else:
+            collection = collection.filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", cloudRate))
+
+        # Defining a function to clip the colleciton to the area of interst (SCL keeps its class values)
+        def clipCollection(image):
+            clipped = image.clip(aoi)
+            return clipped.divide(SCALE).addBands(clipped.select('SCL'), overwrite=True)
+        # clipping the collection
+        return collection.map(clipCollection)
+
+    def median(self, collection):
+        return collection.median()
+
+    # Compositing the collection with one of the src/composite.py methods: SCL masked pixels are dropped
+    # before the median, or the best quality clear pixel is picked (qualityMosaic)
+    def composite(self, collection, method='median'):
+        composite.check_method(method)
+        if method == 'median':
+            return collection.median()
+
+        def mask(image):
+            return image.updateMask(image.select('SCL').remap(composite.SCL_MASKED, [0] * len(composite.SCL_MASKED), 1))
+        if method == 'masked_median':
+            return collection.map(mask).median()
+
+        def quality(image):
+            score = image.select('SCL').remap(list(composite.SCL_QUALITY), list(composite.SCL_QUALITY.values()), 0) \
+                .subtract(image.select(composite.HAZE_BAND).clamp(0, 0.999))
+            return mask(image).addBands(score.rename('quality').toFloat())
+        return collection.map(quality).qualityMosaic('quality')
+
+    # NDWI (Normalized Difference Water Index)
+    def get_NDWI(self, image):
+        return image.normalizedDifference(['B3', 'B11'])
+
+    # NBR (Normalized Burn Ratio)
+    def get_NBR(self, image):
+        return image.normalizedDifference(['B8', 'B12'])
+
+    # Delta NBR (dNBR)
+    def get_dNBR(self, pre_fire_NBR, post_fire_NBR):
+        return pre_fire_NBR.subtract(post_fire_NBR)
+
+    # NBR / NDWI of both images, offset corrected dNBR, RdNBR and RBR in one expression graph (src/indices.py)
+    # Returns {product: image}
+    def severity_indices(self, pre_image, post_image, offset=0.0, products=indices.PRODUCTS):
+        return indices.ee_severity(pre_image, post_image, offset, products)
+
+    # Keeping only pixels above a threshold
+    def mask_gt(self, image, threshold):
+        return image.updateMask(image.gt(threshold))
+
+    # dNBR classification with one of the src/classify.py threshold presets
+    def classify(self, dNBR, preset='USGS'):
+        return classification.classify_ee(dNBR, preset)
+
+    # Per class area and dNBR statistics of the AOI and of each zone geometry (src/zonal.py table rows)
+    # Grouped reducers compute every class of a zone in one reduction, all zones come back in one getInfo()
+    def zonal_stats(self, dNBR, classified, aoi, preset='USGS', zones=None, zone_names=None, scale=20):
+        import ee
+        regions = [aoi] + [ee.Geometry(zone) for zone in zones or []]
+        area_reducer = ee.Reducer.sum().combine(ee.Reducer.count(), sharedInputs=True).group(groupField=1, groupName='class')
+        dNBR_reducer = ee.Reducer.mean().combine(ee.Reducer.percentile(list(zonal.PERCENTILES)), sharedInputs=True) \
+            .group(groupField=1, groupName='class')
+        area_image = ee.Image.pixelArea().addBands(classified)
+        dNBR_image = ee.Image(dNBR).addBands(classified)
+
+        def reduce(region):
+            options = {'geometry': region, 'scale': scale, 'maxPixels': 1e13, 'tileScale': 4}
+            return ee.List([
+                area_image.reduceRegion(area_reducer, **options).get('groups'),
+                dNBR_image.reduceRegion(dNBR_reducer, **options).get('groups'),
+                # whole zone area, masked and unclassified pixels included
+                ee.Image.pixelArea().reduceRegion(ee.Reducer.sum(), **options).get('area'),
+            ])
+        results = ee.List([reduce(region) for region in regions]).getInfo()
+
+        slots = classification.class_count(preset) + 1
+        names = ['all'] + list(zone_names or [f'polygon {index}' for index in range(1, len(regions))])
+        rows = []
+        for name, (area_groups, dNBR_groups, zone_area) in zip(names, results):
+            pixels, area = np.zeros(slots), np.zeros(slots)
+            means, percentiles = np.full(slots, np.nan), np.full((slots, len(zonal.PERCENTILES)), np.nan)
+            for group in area_groups or []:
+                pixels[int(group['class'])], area[int(group['class'])] = group['count'], group['sum']
+            for group in dNBR_groups or []:
+                means[int(group['class'])] = group['mean']
+                percentiles[int(group['class'])] = [group[f'p{percentile}'] for percentile in zonal.PERCENTILES]
+            rows += zonal.zone_rows(name, preset, pixels, area, means, percentiles, zone_area or 0.0)
+        return rows
+
+    # Burn recovery over a collection covering the pre-fire dates and the post-fire monitoring period (see
+    # src/timeseries.py): SCL masked NBR of every image, pre-fire median, first / last clear post-fire NBR
+    # and linearFit slope over time. Returns the rasters ({name: image}) and the trajectory rows, computed
+    # for every image in one getInfo() (images of the same date are merged)
+    def recovery(self, collection, pre_dates, post_start, aoi, scale=20):
+        import ee
+        pre_start, pre_end, post_date = timeseries.parse_periods(pre_dates, post_start)
+        fire = ee.Date(post_start)
+
+        def nbr(image):
+            clear = image.select('SCL').remap(composite.SCL_MASKED, [0] * len(composite.SCL_MASKED), 1)
+            years = image.date().difference(fire, 'year')
+            return ee.Image.constant(years).float().rename('years') \
+                .addBands(image.normalizedDifference(['B8', 'B12']).rename('NBR')) \
+                .updateMask(clear) \
+                .copyProperties(image, ['system:time_start'])
+        series = collection.map(nbr)
+        pre = series.filterDate(*pre_dates).select('NBR').median()
+        post = series.filter(ee.Filter.gte('system:time_start', fire.millis())).sort('system:time_start')
+        first = post.select('NBR').reduce(ee.Reducer.firstNonNull())
+        last = post.select('NBR').reduce(ee.Reducer.lastNonNull())
+        dNBR = pre.subtract(first)
+        images = {
+            'pre_NBR': pre,
+            'dNBR': dNBR,
+            'RdNBR': dNBR.divide(pre.abs().max(indices.MIN_PRE_NBR).sqrt()),
+            'recovery_rate': post.select(['years', 'NBR']).reduce(ee.Reducer.linearFit()).select('scale'),
+            'recovery_ratio': last.subtract(first).divide(dNBR).updateMask(dNBR.gte(timeseries.MIN_NBR_DROP)),
+        }
+
+        burned = dNBR.gte(timeseries.BURNED_DNBR)
+        options = {'geometry': aoi, 'scale': scale, 'maxPixels': 1e13, 'tileScale': 4}
+        def trajectory(image):
+            values = image.select('NBR')
+            dNBR_image = pre.subtract(values)
+            stats = values.addBands(dNBR_image.rename('dNBR')) \
+                .addBands(dNBR_image.divide(pre.abs().max(indices.MIN_PRE_NBR).sqrt()).rename('RdNBR')) \
+                .updateMask(burned) \
+                .reduceRegion(ee.Reducer.mean().combine(ee.Reducer.count(), sharedInputs=True), **options)
+            clear = values.mask().reduceRegion(ee.Reducer.mean(), **options).get('NBR')
+            return ee.Feature(None, stats).set('date', image.date().format('YYYY-MM-dd'), 'clear', clear)
+        features = series.map(trajectory).getInfo()['features']
+
+        # images of the same date are merged, weighted by their burned pixels
+        dates = {}
+        for feature in features:
+            properties = feature['properties']
+            date = datetime.strptime(properties['date'], '%Y-%m-%d').date()
+            if not (pre_start <= date < pre_end or date >= post_date):
+                continue
+            merged = dates.setdefault(date, {'clear': [], 'count': 0, 'sums': {'NBR': 0.0, 'dNBR': 0.0, 'RdNBR': 0.0}})
+            merged['clear'].append(properties.get('clear') or 0)
+            count = properties.get('NBR_count') or 0
+            merged['count'] += count
+            for name in merged['sums']:
+                merged['sums'][name] += (properties.get(f'{name}_mean') or 0) * count
+        trajectory_rows = []
+        for date, merged in sorted(dates.items()):
+            means = {name: value / merged['count'] if merged['count'] else None for name, value in merged['sums'].items()}
+            trajectory_rows.append(timeseries.trajectory_row(date, date < pre_end, post_date, 100 * np.mean(merged['clear']),
+                                                             merged['count'], means))
+        return images, trajectory_rows
+
+    # Tile URLs of cached layers expire with their cache entries (EE_TILE_URL_MAX_AGE in the app)
+    def has_layers(self, layers):
+        return True
+
+    # Tile URL of an image rendered with its vis params (the getMapId round-trip), can be cached
+    def layer_data(self, image, vis_params):
+        import ee
+        map_id_dict = ee.Image(image).getMapId(vis_params)
+        return {'tiles': map_id_dict['tile_fetcher'].url_format}
+
+    # Earth Engine drawing method setup
+    def add_layer_data(self, m, layer_data, name):
+        import folium
+        layer = folium.raster_layers.TileLayer(
+            tiles=layer_data['tiles'],
+            attr='Map Data &copy; <a href="https://earthengine.google.com/">Google Earth Engine</a>',
+            name=name,
+            overlay=True,
+            control=True
+        )
+        layer.add_to(m)
+        return layer
+
+    # Same layer in a lightweight map page (src/mapshell.py)
+    def add_shell_layer(self, shell, layer_data, name):
+        return shell.tile_layer(name, layer_data['tiles'], 'Map Data &copy; <a href="https://earthengine.google.com/">Google Earth Engine</a>')
+
+    def add_layer(self, m, image, vis_params, name):
+        return self.add_layer_data(m, self.layer_data(image, vis_params), name)
+
+
+#################### Local backend ####################
+# Bounding box (west, south, east, north) of a raster grid
+def transform_bounds(transform, shape):
+    height, width = shape
+    x0, dx, _, y0, _, dy = transform
+    xs = (x0, x0 + width * dx)
+    ys = (y0, y0 + height * dy)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+# A local raster: named 2D float32 bands (NaN = masked) sharing one geotransform
+class LocalImage:
+    def __init__(self, bands, transform, properties=None):
+        self.bands = bands
+        self.transform = transform
+        self.properties = properties or {}
+
+    def band(self, name):
+        return self.bands[name]
+
+    @property
+    def shape(self):
+        return next(iter(self.bands.values())).shape
+
+    def bounds(self):
+        return transform_bounds(self.transform, self.shape)
+
+
+# Reading a window ((row_start, row_stop), (col_start, col_stop)) of a band file (.npy, .tif)
+# .npy files are memory-mapped and GeoTIFFs read with rasterio windows: only the window is loaded
+def read_band(path, window=None):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        data = np.load(path, mmap_mode='r')
+    else:
+        try:
+            import rasterio
+            from rasterio.windows import Window
+        except ImportError:
+            from PIL import Image
+            data = np.asarray(Image.open(path))
+        else:
+            with rasterio.open(path) as src:
+                if window is None:
+                    return src.read(1)
+                (row_start, row_stop), (col_start, col_stop) = window
+                return src.read(1, window=Window(col_start, row_start, col_stop - col_start, row_stop - row_start))
+    if window is None:
+        return data
+    (row_start, row_stop), (col_start, col_stop) = window
+    return data[row_start:row_stop, col_start:col_stop]
+
+# Band size (height, width) without reading the pixels
+def band_shape(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        return np.load(path, mmap_mode='r').shape
+    try:
+        import rasterio
+    except ImportError:
+        from PIL import Image
+        width, height = Image.open(path).size
+        return height, width
+    with rasterio.open(path) as src:
+        return src.height, src.width
+
+
+# A Sentinel-2 scene stored locally:
+#   <library>/<scene_id>/scene.json + one band file per band (B3.npy, B8.tif...)
+#   <library>/<scene_id>.zarr with one array per band and the scene.json content as group attributes
+# scene.json: {"date": "YYYY-MM-DD", "CLOUDY_PIXEL_PERCENTAGE": 3.2, "transform": [x0, dx, 0, y0, 0, dy]}
+# With a src.bandstore.BandStore, bands are decoded and scaled once then read as memory maps
+class LocalScene:
+    def __init__(self, path, band_store=None):
+        self.path = path
+        self.band_store = band_store
+        self.id = os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+
+        if path.endswith('.zarr'):
+            import zarr
+            self._group = zarr.open_group(path, mode='r')
+            metadata = dict(self._group.attrs)
+            self._files = {name: None for name in self._group.array_keys()}
+        else:
+            self._group = None
+            with open(os.path.join(path, 'scene.json')) as f:
+                metadata = json.load(f)
+            self._files = {}
+            for file_name in os.listdir(path):
+                band, extension = os.path.splitext(file_name)
+                if extension.lower() in ('.npy', '.tif', '.tiff'):
+                    self._files[band] = os.path.join(path, file_name)
+
+        self.id = metadata.get('id', self.id)
+        self.tile = metadata.get('tile')
+        self.date = datetime.strptime(metadata['date'], '%Y-%m-%d').date()
+        self.cloudy_pixel_percentage = float(metadata.get('CLOUDY_PIXEL_PERCENTAGE', 0))
+        self.transform = tuple(metadata['transform'])
+        first_band = next(iter(self._files))
+        if self._group is not None:
+            self.shape = self._group[first_band].shape
+        else:
+            self.shape = band_shape(self._files[first_band])
+
+    @property
+    def band_names(self):
+        return list(self._files)
+
+    # File (or Zarr array folder) holding a band
+    def band_source(self, band):
+        if self._group is not None:
+            return os.path.join(self.path, band)
+        return self._files[band]
+
+    # Reading a band window ((row_start, row_stop), (col_start, col_stop)) as scaled reflectance,
+    # from the band store when there is one (raw values and .npy bands are read from the source)
+    def read(self, band, window=None, scale=True):
+        if self.band_store is None or not (scale or band in UNSCALED_BANDS) or not self.band_store.keeps(self, band):
+            return self.read_source(band, window, scale)
+        data = self.band_store.band(self, band)
+        if window is None:
+            return data
+        (row_start, row_stop), (col_start, col_stop) = window
+        return data[row_start:row_stop, col_start:col_stop]
+
+    # Decoding a band window from the scene files
+    def read_source(self, band, window=None, scale=True):
+        if self._group is not None:
+            data = self._group[band]
+            if window is not None:
+                (row_start, row_stop), (col_start, col_stop) = window
+                data = data[row_start:row_stop, col_start:col_stop]
+        else:
+            data = read_band(self._files[band], window)
+        if not scale or band in UNSCALED_BANDS:
+            return data
+        return np.asarray(data, dtype=np.float32) / SCALE
+
+    def bounds(self):
+        return transform_bounds(self.transform, self.shape)
+
+    # Percentage of cloudy pixels of a window from the SCL band (read in row blocks),
+    # the scene-wide CLOUDY_PIXEL_PERCENTAGE when the scene has no SCL band
+    def cloudy_percentage(self, window):
+        if 'SCL' not in self._files:
+            return self.cloudy_pixel_percentage
+        (row_start, row_stop), (col_start, col_stop) = window
+        cloudy, observed = 0, 0
+        for row in range(row_start, row_stop, composite.CHUNK_ROWS):
+            scl = np.asarray(self.read('SCL', ((row, min(row + composite.CHUNK_ROWS, row_stop)), (col_start, col_stop)), scale=False))
+            rows_observed = np.count_nonzero(scl)
+            cloudy += composite.cloudy_percentage(scl) * rows_observed / 100
+            observed += rows_observed
+        return 100.0 * cloudy / observed if observed else 100.0
+
+    # Pixel window covering the bounding box of a geometry, None if they don't overlap
+    def window(self, aoi):
+        height, width = self.shape
+        if aoi is None:
+            return (0, height), (0, width)
+        box = geometry.bounds(aoi)
+        col, row = geometry.to_pixel([box[:2], box[2:]], self.transform)
+        row_start, row_stop = np.clip([np.floor(row.min()), np.ceil(row.max())], 0, height).astype(int)
+        col_start, col_stop = np.clip([np.floor(col.min()), np.ceil(col.max())], 0, width).astype(int)
+        if row_start >= row_stop or col_start >= col_stop:
+            return None
+        return (int(row_start), int(row_stop)), (int(col_start), int(col_stop))
+
+
+# Geotransform of a window of a larger raster
+def window_transform(transform, window):
+    (row_start, _), (col_start, _) = window
+    x0, dx, rx, y0, ry, dy = transform
+    return (x0 + col_start * dx, dx, rx, y0 + row_start * dy, ry, dy)
+
+# Offsetting a window expressed inside another window
+def sub_window(window, inner):
+    (row_start, _), (col_start, _) = window
+    (inner_row_start, inner_row_stop), (inner_col_start, inner_col_stop) = inner
+    return (row_start + inner_row_start, row_start + inner_row_stop), (col_start + inner_col_start, col_start + inner_col_stop)
+
+
+# Scenes of a local collection, each with the window clipping it to the area of interest
+# `compositing` is the src/composite.py method used by LocalBackend.composite by default
+class LocalCollection:
+    def __init__(self, scenes, windows, aoi, compositing='median'):
+        self.scenes = scenes
+        self.windows = windows
+        self.aoi = aoi
+        self.compositing = compositing
+        self._polygons = None
+        self._index = None
+
+    # STR tree over the polygons of the area of interest, built on first use
+    def _aoi_index(self):
+        if self._index is None:
+            # vertices closer than half a pixel to the perimeter don't change the mask, they are dropped
+            transform, _ = self.grid()
+            simplified = geometry.simplify(self.aoi, min(abs(transform[1]), abs(transform[5])) / 2)
+            self._polygons = [{'type': 'Polygon', 'coordinates': polygon} for polygon in geometry.polygons(simplified)]
+            boxes, _ = geometry.bounds_and_centroids(self._polygons)
+            self._index = spatial.STRtree(boxes)
+        return self._index
+
+    # Polygons of the area of interest under a window (relative to the grid)
+    def polygons(self, window):
+        transform, _ = self.grid()
+        shape = (window[0][1] - window[0][0], window[1][1] - window[1][0])
+        box = transform_bounds(window_transform(transform, window), shape)
+        return [self._polygons[index] for index in self._aoi_index().query(box)]
+
+    # Whether a window (relative to the grid) touches the area of interest
+    def intersects(self, window):
+        return self.aoi is None or bool(self.polygons(window))
+
+    def size(self):
+        return len(self.scenes)
+
+    # Common (transform, shape) of the clipped scenes
+    def grid(self):
+        if not self.scenes:
+            raise ValueError('No scene matches the date range and cloud coverage filters')
+
+        shapes = {(window[0][1] - window[0][0], window[1][1] - window[1][0]) for window in self.windows}
+        grids = {window_transform(scene.transform, window) for scene, window in zip(self.scenes, self.windows)}
+        if len(shapes) > 1 or len(grids) > 1:
+            raise ValueError('Scenes of a local collection must share the same pixel grid')
+        return grids.pop(), shapes.pop()
+
+    def has_band(self, band):
+        return all(band in scene.band_names for scene in self.scenes)
+
+    # Stacking a band of every scene as a (scenes, rows, cols) array, window is relative to the grid
+    def read(self, band, window=None, scale=True):
+        windows = self.windows if window is None else [sub_window(scene_window, window) for scene_window in self.windows]
+        return np.stack([scene.read(band, scene_window, scale) for scene, scene_window in zip(self.scenes, windows)])
+
+    # Pixels inside the area of interest, window is relative to the grid
+    def inside(self, window=None):
+        transform, shape = self.grid()
+        if window is not None:
+            transform = window_transform(transform, window)
+            shape = (window[0][1] - window[0][0], window[1][1] - window[1][0])
+        if self.aoi is None:
+            return np.ones(shape, dtype=bool)
+        self._aoi_index()
+        if window is None:
+            return geometry.rasterize(self._polygons, transform, shape)
+        # only the polygons under the window are burnt
+        return geometry.rasterize(self.polygons(window), transform, shape)
+
+
+class LocalBackend:
+    name = 'Local'
+
+    # `tiles` is an optional src.tiles.TileServer serving the map layers,
+    # `band_store` an optional src.bandstore.BandStore keeping the decoded bands
+    def __init__(self, root, tiles=None, band_store=None):
+        self.root = root
+        self.tiles = tiles
+        self.band_store = band_store
+        self._scenes = None
+
+    # Signature of the library content: name, size and modification time of every scene file (the metadata
+    # files of Zarr scenes, not each chunk), it changes when scenes are added, removed or replaced
+    def library_signature(self):
+        if not os.path.isdir(self.root):
+            return None
+        entries = []
+        for entry in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, entry)
+            if entry.endswith('.zarr'):
+                # group and array metadata: .zgroup / .zattrs / .zarray (zarr v2) or zarr.json (v3)
+                folders = [''] + [name for name in sorted(os.listdir(path)) if os.path.isdir(os.path.join(path, name))]
+                names = [os.path.join(folder, name) for folder in folders for name in sorted(os.listdir(os.path.join(path, folder)))
+                         if name.startswith('.z') or name == 'zarr.json']
+            elif os.path.isfile(os.path.join(path, 'scene.json')):
+                names = sorted(os.listdir(path))
+            else:
+                continue
+            for name in names:
+                stat = os.stat(os.path.join(path, name))
+                entries.append(f'{entry}/{name}:{stat.st_size}:{stat.st_mtime_ns}')
+        return hashlib.sha256('\n'.join(entries).encode()).hexdigest()
+
+    # Listing the scenes of the local library once
+    def scenes(self):
+        if self._scenes is None:
+            scenes = []
+            for entry in sorted(os.listdir(self.root)):
+                path = os.path.join(self.root, entry)
+                if entry.endswith('.zarr') or os.path.isfile(os.path.join(path, 'scene.json')):
+                    scenes.append(LocalScene(path, self.band_store))
+            # assigned once complete: collections may be built from several threads
+            self._scenes = scenes
+        return self._scenes
+
+    def union(self, geometries):
+        if geometries:
+            return geometry.union(geometries)
+        # no area of interest: whole scenes are processed
+        return None
+
+    # Same filters as the Earth Engine collection: cloud rate, [initialDate, updatedDate) and bounds
+    # With the SCL masked compositing methods, cloudRate applies to the cloudy pixels of the scene window
+    def satCollection(self, cloudRate, initialDate, updatedDate, aoi, compositing='median'):
+        composite.check_method(compositing)
+        start = datetime.strptime(initialDate, '%Y-%m-%d').date()
+        end = datetime.strptime(updatedDate, '%Y-%m-%d').date()
+        scenes, windows = [], []
+        for scene in self.scenes():
+            if not start <= scene.date < end:
+                continue
+            window = scene.window(aoi)
+            if window is None:
+                continue
+            if compositing in composite.MASKED_METHODS:
+                cloudy_percentage = scene.cloudy_percentage(window)
+            else:
+                cloudy_percentage = scene.cloudy_pixel_percentage
+            if cloudy_percentage >= cloudRate:
+                continue
+            scenes.append(scene)
+            windows.append(window)
+        return LocalCollection(scenes, windows, aoi, compositing)
+
+    def median(self, collection, window=None, bands=BANDS):
+        return self.composite(collection, 'median', window, bands)
+
+    # Per band composite of the clipped collection (src/composite.py method, the collection's by default),
+    # pixels outside the area of interest are masked
+    # window (relative to the collection grid) restricts the composite to a part of the area
+    def composite(self, collection, method=None, window=None, bands=BANDS):
+        method = method or collection.compositing
+        composite.check_method(method)
+        transform, _ = collection.grid()
+        if window is not None:
+            transform = window_transform(transform, window)
+        inside = collection.inside(window)
+
+        bands = [band for band in bands if collection.has_band(band)]
+        scl = None
+        if method in composite.MASKED_METHODS and collection.has_band('SCL'):
+            scl = collection.read('SCL', window, scale=False)
+        # bands are composited one at a time, except for best pixel: all bands come from the same observation
+        if method == 'best_pixel':
+            read = bands + [composite.HAZE_BAND] if composite.HAZE_BAND not in bands and collection.has_band(composite.HAZE_BAND) else bands
+            groups = [read]
+        else:
+            groups = [[band] for band in bands]
+
+        composites = {}
+        for group in groups:
+            results = composite.composite({band: collection.read(band, window) for band in group}, scl, method)
+            for band in bands:
+                if band in results:
+                    composites[band] = np.where(inside, results[band], np.nan).astype(np.float32)
+        return LocalImage(composites, transform)
+
+    def normalized_difference(self, image, first, second, name):
+        a, b = image.band(first), image.band(second)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return LocalImage({name: (a - b) / (a + b)}, image.transform)
+
+    def get_NDWI(self, image):
+        return self.normalized_difference(image, 'B3', 'B11', 'NDWI')
+
+    def get_NBR(self, image):
+        return self.normalized_difference(image, 'B8', 'B12', 'NBR')
+
+    def get_dNBR(self, pre_fire_NBR, post_fire_NBR):
+        return LocalImage({'dNBR': pre_fire_NBR.band('NBR') - post_fire_NBR.band('NBR')}, pre_fire_NBR.transform)
+
+    # Fused pass over the bands of both composites (src/indices.py), each band is read once per chunk
+    # Returns {product: LocalImage} with the band names of get_NBR / get_NDWI / get_dNBR
+    def severity_indices(self, pre_image, post_image, offset=0.0, products=indices.PRODUCTS):
+        values = indices.severity(pre_image.bands, post_image.bands, offset, products)
+        return {name: LocalImage({indices.PRODUCTS[name]: values[name]}, pre_image.transform) for name in products}
+
+    def mask_gt(self, image, threshold):
+        return LocalImage({name: np.where(band > threshold, band, np.nan) for name, band in image.bands.items()}, image.transform)
+
+    # Single pass classification, the per class pixel counts come along as the 'counts' property
+    def classify(self, dNBR, preset='USGS'):
+        classes, counts = classification.classify(dNBR.band('dNBR'), preset)
+        # unclassified pixels are masked like on Earth Engine
+        classified = np.where(classes > 0, classes, np.nan).astype(np.float32)
+        return LocalImage({'classification': classified}, dNBR.transform, {'counts': counts, 'preset': preset})
+
+    # Per class area and dNBR statistics of the AOI and of each zone geometry (src/zonal.py table rows),
+    # the rasters are already clipped to the AOI
+    def zonal_stats(self, dNBR, classified, aoi, preset='USGS', zones=None, zone_names=None):
+        return zonal.zonal_stats(classified.band('classification'), dNBR.band('dNBR'), dNBR.transform, preset, zones, zone_names, aoi)
+
+    # Burn recovery over a collection covering the pre-fire dates and the post-fire monitoring period (see
+    # src/timeseries.py): B8 / B12 / SCL of every scene are read once, chunk by chunk. Returns the rasters
+    # ({name: LocalImage}) and the trajectory rows, `series` receives the per date dNBR / RdNBR rasters and
+    # `rasters` the recovery rasters (e.g. memory maps, see timeseries.recovery)
+    def recovery(self, collection, pre_dates, post_start, aoi=None, series=None, rasters=None):
+        transform, shape = collection.grid()
+        order = sorted(range(collection.size()), key=lambda index: collection.scenes[index].date)
+        has_scl = collection.has_band('SCL')
+
+        def read(window):
+            return collection.read('B8', window)[order], collection.read('B12', window)[order], \
+                collection.read('SCL', window, scale=False)[order] if has_scl else None
+        rasters, trajectory = timeseries.recovery(read, shape, [collection.scenes[index].date for index in order],
+                                                  *timeseries.parse_periods(pre_dates, post_start), collection.inside, series, rasters)
+        return {name: LocalImage({name: values}, transform) for name, values in rasters.items()}, trajectory
+
+    # Whether the tile store still holds the layers of a cached result (least recently used ones are evicted)
+    def has_layers(self, layers):
+        return all('layer' not in layer_data or self.tiles.store.has_layer(layer_data['layer']) for layer_data in layers)
+
+    # Rendered RGBA raster and its bounds, can be cached
+    # Layers are stored in the tile server's store when there is one (served as z/x/y PNG tiles),
+    # rendered as a single overlay image otherwise
+    def layer_data(self, image, vis_params):
+        west, south, east, north = image.bounds()
+        if self.tiles is not None:
+            # class rasters are resampled by mode in the overview pyramids
+            resampling = overviews.resampling_for(next(iter(image.bands))) if len(image.bands) == 1 else 'mean'
+            layer = self.tiles.store.add_layer(render.image_bands(image, vis_params), image.transform, vis_params, resampling=resampling)
+            return {'layer': layer, 'bounds': [[south, west], [north, east]]}
+        return {
+            'image': render.colorize(render.image_bands(image, vis_params), vis_params),
+            'bounds': [[south, west], [north, east]],
+        }
+
+    # Local drawing method: tiles from the local tile server, or the rendered raster overlaid on the map
+    def add_layer_data(self, m, layer_data, name):
+        import folium
+        if 'layer' in layer_data:
+            _, max_zoom = self.tiles.store.zoom_range(layer_data['layer'])
+            layer = folium.raster_layers.TileLayer(
+                tiles=self.tiles.url(layer_data['layer']),
+                attr='Local rendering',
+                name=name,
+                max_native_zoom=max_zoom,
+                max_zoom=max(max_zoom, 18),
+                overlay=True,
+                control=True
+            )
+        else:
+            layer = folium.raster_layers.ImageOverlay(
+                image=np.asarray(layer_data['image']),
+                bounds=layer_data['bounds'],
+                mercator_project=True,
+                name=name,
+                overlay=True,
+                control=True
+            )
+        layer.add_to(m)
+        return layer
+
+    # Same layer in a lightweight map page (src/mapshell.py): tiles of the local tile server, or the rendered
+    # raster as a PNG data url in the layer list
+    def add_shell_layer(self, shell, layer_data, name):
+        if 'layer' in layer_data:
+            _, max_zoom = self.tiles.store.zoom_range(layer_data['layer'])
+            return shell.tile_layer(name, self.tiles.url(layer_data['layer']), 'Local rendering', max_native_zoom=max_zoom,
+                                    max_zoom=max(max_zoom, 18))
+        import base64
+        from src.tiles import png_bytes
+        data = base64.b64encode(png_bytes(np.asarray(layer_data['image']))).decode()
+        return shell.image_layer(name, f'data:image/png;base64,{data}', layer_data['bounds'])
+
+    def add_layer(self, m, image, vis_params, name):
+        return self.add_layer_data(m, self.layer_data(image, vis_params), name)
+
+
+# Picking a backend by name
+def get_backend(name, root=None, tiles=None, band_store=None):
+    if name == LocalBackend.name:
+        return LocalBackend(root, tiles, band_store)
+    return EarthEngineBackend()
@@ -0,0 +1,170 @@
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from src import classify
+from src import overviews
+from src import tiling
+
+#################### Analysis exports ####################
+# The outputs of a tiled run (see src/tiling.py) exported for downstream tools:
+#   - Cloud Optimized GeoTIFFs: internally tiled, deflate compressed, with overviews (rasterio / GDAL >= 3.1)
+#   - one chunked Zarr group, every raster stored with its overview levels (zarr)
+# Readers can then range-read only the window they need, and a past analysis is re-opened without any
+# recomputation. Both libraries are optional, only needed by the format they write.
+#
+#   python -m src.export results/chenoua-2022 --format cog zarr
+
+# Block (COG) and chunk (Zarr) side in pixels
+BLOCK_SIZE = 512
+
+# Rows written at once, bounds memory whatever the raster size
+WRITE_ROWS = 2048
+
+FORMATS = ('cog', 'zarr')
+
+
+# Rasters of a run to export: name > (bands, band descriptions, nodata, resampling)
+# Composites are multi-band rasters, the burn scar mask is derived from the classes
+def export_rasters(summary, outputs, output_dir):
+    rasters = {}
+    composite_bands = summary.get('composite_bands') or []
+    for period in ('pre_fire', 'post_fire'):
+        if composite_bands:
+            bands = [outputs[f'{period}_{band}'] for band in composite_bands]
+            rasters[f'{period}_composite'] = (bands, composite_bands, np.nan, 'mean')
+    for name in ('pre_fire_NBR', 'post_fire_NBR', 'dNBR', 'RdNBR', 'RBR'):
+        # runs written before the relativized indices don't have them
+        if name in outputs:
+            rasters[name] = ([outputs[name]], [name], np.nan, 'mean')
+    rasters['dNBR_classes'] = ([outputs['dNBR_classes']], ['dNBR_classes'], 0, 'mode')
+    rasters['burn_scar'] = ([burn_scar(summary, outputs['dNBR_classes'], output_dir)], ['burn_scar'], None, 'mode')
+    return rasters
+
+# Burn scar mask (1 = burned) of the classes from the preset's 'burn_scar_from' class, written next to the outputs
+def burn_scar(summary, classes, output_dir):
+    threshold = classify.get_preset(summary['preset'])['burn_scar_from']
+    mask = np.lib.format.open_memmap(os.path.join(output_dir, 'burn_scar.npy'), mode='w+', dtype=np.uint8, shape=classes.shape)
+    for start in range(0, classes.shape[0], WRITE_ROWS):
+        mask[start:start + WRITE_ROWS] = np.asarray(classes[start:start + WRITE_ROWS]) >= threshold
+    mask.flush()
+    return mask
+
+# Writing bands as a Cloud Optimized GeoTIFF: a tiled GeoTIFF is written row block by row block, then the
+# GDAL COG driver lays it out with its overviews
+def write_cog(path, bands, transform, nodata=None, resampling='mean', descriptions=None):
+    import rasterio
+    from rasterio.shutil import copy as copy_dataset
+    from rasterio.transform import Affine
+    from rasterio.windows import Window
+
+    height, width = bands[0].shape
+    dtype = np.dtype(bands[0].dtype)
+    profile = {
+        'driver': 'GTiff',
+        'height': height,
+        'width': width,
+        'count': len(bands),
+        'dtype': dtype.name,
+        'crs': 'EPSG:4326',
+        'transform': Affine.from_gdal(*transform),
+        'nodata': nodata,
+        'tiled': True,
+        'blockxsize': BLOCK_SIZE,
+        'blockysize': BLOCK_SIZE,
+        'BIGTIFF': 'IF_SAFER',
+    }
+    tmp_path = f'{path}.tmp.tif'
+    with rasterio.open(tmp_path, 'w', **profile) as dst:
+        for index, band in enumerate(bands, 1):
+            for start in range(0, height, WRITE_ROWS):
+                rows = np.asarray(band[start:start + WRITE_ROWS])
+                dst.write(rows, index, window=Window(0, start, width, len(rows)))
+            if descriptions:
+                dst.set_band_description(index, descriptions[index - 1])
+
+    copy_dataset(
+        tmp_path, path, driver='COG',
+        COMPRESS='DEFLATE',
+        PREDICTOR='YES',
+        BLOCKSIZE=BLOCK_SIZE,
+        OVERVIEW_RESAMPLING='AVERAGE' if resampling == 'mean' else 'MODE',
+        BIGTIFF='IF_SAFER',
+    )
+    os.remove(tmp_path)
+    return path
+
+# Writing rasters into a Zarr group: one sub group per raster holding the full resolution array ('0') and its
+# overview levels ('1', '2'...), arrays are (band, row, column) with the grid in the group attributes
+def write_zarr(path, rasters, transform):
+    import zarr
+
+    root = zarr.open_group(path, mode='w')
+    root.attrs.update({'transform': list(transform), 'crs': 'EPSG:4326'})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, (bands, descriptions, nodata, resampling) in rasters.items():
+            group = root.create_group(name)
+            fill_value = None if nodata is None else float(nodata) if np.isnan(nodata) else nodata
+            # overview levels of each band, built on disk
+            band_levels = [
+                [band] + overviews.build(band, resampling, None if nodata is None or np.isnan(nodata) else nodata,
+                                         path_template=os.path.join(tmp_dir, f'{name}.{index}.ov{{}}.npy'))
+                for index, band in enumerate(bands)
+            ]
+            for level in range(len(band_levels[0])):
+                height, width = band_levels[0][level].shape
+                array = group.create_dataset(
+                    str(level), shape=(len(bands), height, width), chunks=(1, BLOCK_SIZE, BLOCK_SIZE),
+                    dtype=band_levels[0][level].dtype, fill_value=fill_value
+                )
+                for index, levels in enumerate(band_levels):
+                    for start in range(0, height, WRITE_ROWS):
+                        array[index, start:start + WRITE_ROWS] = np.asarray(levels[level][start:start + WRITE_ROWS])
+            group.attrs.update({
+                'bands': descriptions,
+                'resampling': resampling,
+                'levels': [overviews.level_transform(transform, level) for level in range(len(band_levels[0]))],
+            })
+    return path
+
+# Exporting the outputs of a finished run in the requested formats, listed in <export_dir>/export.json
+def export_run(output_dir, formats=('cog',), export_dir=None):
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {', '.join(sorted(unknown))}")
+    export_dir = export_dir or os.path.join(output_dir, 'export')
+    os.makedirs(export_dir, exist_ok=True)
+
+    summary, outputs = tiling.open_outputs(output_dir)
+    rasters = export_rasters(summary, outputs, output_dir)
+    files = {}
+    if 'cog' in formats:
+        for name, (bands, descriptions, nodata, resampling) in rasters.items():
+            files[name] = write_cog(os.path.join(export_dir, f'{name}.tif'), bands, summary['transform'],
+                                    nodata, resampling, descriptions)
+    if 'zarr' in formats:
+        files['zarr'] = write_zarr(os.path.join(export_dir, 'analysis.zarr'), rasters, summary['transform'])
+
+    manifest = {'run': os.path.join(output_dir, 'run.json'), 'preset': summary['preset'], 'files': files}
+    with open(os.path.join(export_dir, 'export.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Export the outputs of a tiled analysis as COG / Zarr')
+    parser.add_argument('output_dir', help='folder of a tiled run (holding run.json)')
+    parser.add_argument('--format', nargs='+', default=['cog'], choices=FORMATS)
+    parser.add_argument('--export-dir', help='destination folder (default: <output_dir>/export)')
+    args = parser.parse_args(argv)
+    manifest = export_run(args.output_dir, args.format, args.export_dir)
+    print(f"{len(manifest['files'])} files written, see {os.path.join(args.export_dir or os.path.join(args.output_dir, 'export'), 'export.json')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
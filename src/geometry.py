@@ -0,0 +1,319 @@
+import numpy as np
+
+#################### Local geometry helpers ####################
+# Plain GeoJSON geometry dicts ({'type': ..., 'coordinates': ...}) handled with numpy,
+# so bounds, centroids and masks never need an Earth Engine round-trip.
+
+# Listing the polygons of a geometry as lists of rings (first ring = exterior, others = holes)
+def polygons(geometry):
+    if geometry is None:
+        return []
+    if isinstance(geometry, (list, tuple)):
+        return [polygon for geo in geometry for polygon in polygons(geo)]
+
+    geo_type = geometry.get('type')
+    if geo_type == 'Polygon':
+        return [geometry['coordinates']]
+    if geo_type == 'MultiPolygon':
+        return list(geometry['coordinates'])
+    if geo_type == 'GeometryCollection':
+        return polygons(geometry['geometries'])
+    if geo_type == 'Feature':
+        return polygons(geometry['geometry'])
+    if geo_type == 'FeatureCollection':
+        return polygons([feature['geometry'] for feature in geometry['features']])
+    # points and lines have no surface: not usable as an area of study
+    return []
+
+# Merging a list of geometries into a single MultiPolygon
+def union(geometries):
+    return {'type': 'MultiPolygon', 'coordinates': polygons(geometries)}
+
+# Bounding box as (west, south, east, north)
+def bounds(geometry):
+    rings = [np.asarray(polygon[0], dtype=np.float64) for polygon in polygons(geometry)]
+    if not rings:
+        return None
+    coords = np.concatenate(rings)
+    return coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max()
+
+# Signed ring area and centroid moments with the shoelace formula
+def _ring_moments(ring):
+    ring = np.asarray(ring, dtype=np.float64)
+    x, y = ring[:, 0], ring[:, 1]
+    x1, y1 = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y1 - x1 * y
+    area = cross.sum() / 2
+    return area, ((x + x1) * cross).sum() / 6, ((y + y1) * cross).sum() / 6
+
+# Area-weighted centroid as [lon, lat], same layout as ee centroid().getInfo()['coordinates']
+def centroid(geometry):
+    total_area, total_x, total_y = 0.0, 0.0, 0.0
+    for polygon in polygons(geometry):
+        for index, ring in enumerate(polygon):
+            area, moment_x, moment_y = _ring_moments(ring)
+            # exterior rings add surface, holes remove it, whatever their winding order
+            sign = np.sign(area) * (1 if index == 0 else -1)
+            total_area += sign * area
+            total_x += sign * moment_x
+            total_y += sign * moment_y
+
+    if total_area == 0:
+        box = bounds(geometry)
+        if box is None:
+            return None
+        return [float(box[0] + box[2]) / 2, float(box[1] + box[3]) / 2]
+    return [float(total_x / total_area), float(total_y / total_area)]
+
+# Bounding boxes (n, 4) and centroids (n, 2) of many geometries at once: every ring of every geometry is
+# stacked in a single coordinates array and reduced with numpy, instead of one small computation per feature
+def bounds_and_centroids(geometries):
+    coords, ring_sizes, ring_signs, ring_owner = [], [], [], []
+    for owner, geo in enumerate(geometries):
+        for polygon in polygons(geo):
+            for index, ring in enumerate(polygon):
+                coords.extend(ring)
+                ring_sizes.append(len(ring))
+                ring_signs.append(1 if index == 0 else -1)
+                ring_owner.append(owner)
+
+    count = len(geometries)
+    boxes = np.full((count, 4), np.nan)
+    centroids = np.full((count, 2), np.nan)
+    if not coords:
+        return boxes, centroids
+
+    coords = np.asarray(coords, dtype=np.float64)[:, :2]
+    ring_sizes = np.asarray(ring_sizes)
+    ring_owner = np.asarray(ring_owner)
+    ring_starts = np.cumsum(ring_sizes) - ring_sizes
+
+    # next vertex of each vertex, wrapping around inside its ring
+    following = np.arange(1, len(coords) + 1)
+    following[ring_starts + ring_sizes - 1] = ring_starts
+    x, y = coords[:, 0], coords[:, 1]
+    x1, y1 = x[following], y[following]
+    cross = x * y1 - x1 * y
+
+    area = np.add.reduceat(cross, ring_starts) / 2
+    moment_x = np.add.reduceat((x + x1) * cross, ring_starts) / 6
+    moment_y = np.add.reduceat((y + y1) * cross, ring_starts) / 6
+    # exterior rings add surface, holes remove it, whatever their winding order
+    sign = np.sign(area) * np.asarray(ring_signs)
+
+    total_area = np.bincount(ring_owner, sign * area, count)
+    total_x = np.bincount(ring_owner, sign * moment_x, count)
+    total_y = np.bincount(ring_owner, sign * moment_y, count)
+
+    vertex_owner = np.repeat(ring_owner, ring_sizes)
+    owners, owner_starts = np.unique(vertex_owner, return_index=True)
+    boxes[owners, 0] = np.minimum.reduceat(x, owner_starts)
+    boxes[owners, 1] = np.minimum.reduceat(y, owner_starts)
+    boxes[owners, 2] = np.maximum.reduceat(x, owner_starts)
+    boxes[owners, 3] = np.maximum.reduceat(y, owner_starts)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centroids[:, 0] = total_x / total_area
+        centroids[:, 1] = total_y / total_area
+    # degenerate surfaces fall back to their box center
+    flat = total_area == 0
+    centroids[flat, 0] = (boxes[flat, 0] + boxes[flat, 2]) / 2
+    centroids[flat, 1] = (boxes[flat, 1] + boxes[flat, 3]) / 2
+    return boxes, centroids
+
+#################### Simplification ####################
+# Half a web map pixel at a zoom level, in degrees (tolerance at which simplification is invisible)
+def tolerance_for_zoom(zoom, latitude=0):
+    meters_per_pixel = 156543.03392 * np.cos(np.radians(latitude)) / 2 ** zoom
+    return tolerance_for_resolution(meters_per_pixel)
+
+# Half a processing pixel of `meters` size, in degrees
+def tolerance_for_resolution(meters):
+    return meters / 2 / 111320
+
+# Douglas-Peucker simplification of a closed ring, returns the kept vertices (at least 4)
+def simplify_ring(ring, tolerance):
+    ring = np.asarray(ring, dtype=np.float64)
+    if tolerance <= 0 or len(ring) <= 4:
+        return ring
+    keep = np.zeros(len(ring), dtype=bool)
+    # the ring is split in two halves so the start/end vertex is not a degenerate segment
+    middle = len(ring) // 2
+    keep[[0, middle, len(ring) - 1]] = True
+
+    stack = [(0, middle), (middle, len(ring) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        points = ring[start + 1:end]
+        segment = ring[end] - ring[start]
+        length = np.hypot(*segment)
+        offset = points - ring[start]
+        if length == 0:
+            distance = np.hypot(offset[:, 0], offset[:, 1])
+        else:
+            distance = np.abs(segment[0] * offset[:, 1] - segment[1] * offset[:, 0]) / length
+        farthest = int(np.argmax(distance))
+        if distance[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    simplified = ring[keep]
+    if len(simplified) < 4:
+        return ring
+    return simplified
+
+# Candidate segment pairs examined at once by rings_cross
+CROSS_CHECK_PAIRS = 4 * 1024 * 1024
+
+# Orientation of r relative to the segment (p, q): 1 left, -1 right, 0 collinear
+def _orientation(p, q, r):
+    return np.sign((q[:, 0] - p[:, 0]) * (r[:, 1] - p[:, 1]) - (q[:, 1] - p[:, 1]) * (r[:, 0] - p[:, 0]))
+
+# Whether any two non adjacent segments of a set of rings cross each other
+def rings_cross(rings):
+    segments = np.concatenate([np.stack([ring[:-1], ring[1:]], axis=1) for ring in rings])
+    ring_id = np.concatenate([np.full(len(ring) - 1, index) for index, ring in enumerate(rings)])
+    return len(crossing_rings(segments, ring_id)) > 0
+
+# Rings having a segment crossing another non adjacent segment: segments is a (n, 2, 2) array of the ring
+# segments in order, ring_id (sorted) the ring of each one. With `group` (one value per segment, e.g. the
+# polygon of its ring) only segments of the same group are tested against each other.
+# Sweep along x: segments sorted by group and west end are only tested against the following segments of
+# their group starting before their east end, then against the ones whose y range overlaps
+def crossing_rings(segments, ring_id, group=None):
+    ring_id = np.asarray(ring_id)
+    group = np.zeros(len(segments), dtype=np.int64) if group is None else np.asarray(group)
+    ring_start = np.searchsorted(ring_id, ring_id)
+    ring_lengths = np.searchsorted(ring_id, ring_id, side='right') - ring_start
+    position = np.arange(len(segments)) - ring_start
+
+    west = segments[:, :, 0].min(axis=1)
+    order = np.lexsort((west, group))
+    segments, ring_id, ring_lengths, position, group = segments[order], ring_id[order], ring_lengths[order], position[order], group[order]
+    west = west[order]
+    east = segments[:, :, 0].max(axis=1)
+    south = segments[:, :, 1].min(axis=1)
+    north = segments[:, :, 1].max(axis=1)
+    # segments j > i of the same group with west[j] <= east[i], from integer (group, rank of west) keys
+    west_values, west_rank = np.unique(west, return_inverse=True)
+    _, group_index = np.unique(group, return_inverse=True)
+    keys = group_index.astype(np.int64) * (len(west_values) + 1) + west_rank
+    stop = np.searchsorted(keys, group_index.astype(np.int64) * (len(west_values) + 1) + np.searchsorted(west_values, east, side='right'))
+    counts = np.maximum(stop - np.arange(len(segments)) - 1, 0)
+
+    crossing = []
+    start = 0
+    while start < len(segments):
+        # as many segments as fit in CROSS_CHECK_PAIRS candidate pairs (at least one)
+        end = start + 1 + int(np.searchsorted(np.cumsum(counts[start + 1:]), CROSS_CHECK_PAIRS - counts[start], side='right'))
+        end = min(end, len(segments))
+        first = np.repeat(np.arange(start, end), counts[start:end])
+        if len(first):
+            offsets = np.arange(len(first)) - np.repeat(np.cumsum(counts[start:end]) - counts[start:end], counts[start:end])
+            second = first + 1 + offsets
+            overlap = (south[second] <= north[first]) & (north[second] >= south[first])
+            first, second = first[overlap], second[overlap]
+
+            # segments sharing a vertex in the same ring are neighbours, not crossings
+            gap = np.abs(position[first] - position[second])
+            adjacent = (ring_id[first] == ring_id[second]) & ((gap <= 1) | (gap == ring_lengths[first] - 1))
+            first, second = first[~adjacent], second[~adjacent]
+
+            a1, b1 = segments[first, 0], segments[first, 1]
+            a2, b2 = segments[second, 0], segments[second, 1]
+            crosses = (_orientation(a1, b1, a2) * _orientation(a1, b1, b2) < 0) & (_orientation(a2, b2, a1) * _orientation(a2, b2, b1) < 0)
+            crossing.append(ring_id[first[crosses]])
+            crossing.append(ring_id[second[crosses]])
+        start = end
+    return np.unique(np.concatenate(crossing)) if crossing else np.zeros(0, dtype=ring_id.dtype)
+
+# Topology preserving simplification: rings are simplified with Douglas-Peucker and the tolerance is
+# halved for a polygon until none of its rings crosses itself or another ring
+def simplify(geometry, tolerance):
+    simplified = []
+    for polygon in polygons(geometry):
+        rings = [np.asarray(ring, dtype=np.float64) for ring in polygon]
+        polygon_tolerance = tolerance
+        while True:
+            candidate = [simplify_ring(ring, polygon_tolerance) for ring in rings]
+            if polygon_tolerance <= 0 or not rings_cross(candidate):
+                break
+            polygon_tolerance = polygon_tolerance / 2 if polygon_tolerance > tolerance / 64 else 0
+        simplified.append([ring.tolist() for ring in candidate])
+
+    if len(simplified) == 1:
+        return {'type': 'Polygon', 'coordinates': simplified[0]}
+    return {'type': 'MultiPolygon', 'coordinates': simplified}
+
+#################### Rasterization ####################
+# GDAL style geotransform: (x_origin, pixel_width, 0, y_origin, 0, pixel_height)
+# Converting map coordinates to fractional (col, row) pixel coordinates
+def to_pixel(coords, transform):
+    coords = np.asarray(coords, dtype=np.float64)
+    col = (coords[:, 0] - transform[0]) / transform[1]
+    row = (coords[:, 1] - transform[3]) / transform[5]
+    return col, row
+
+# Burning one polygon (list of rings): the pixel window of its bounding box and the mask of the pixel
+# centers inside it within that window, None when it misses the raster
+def _burn(polygon, transform, shape):
+    height, width = shape
+    rings = [to_pixel(ring, transform) for ring in polygon]
+    cols = np.concatenate([col for col, _ in rings])
+    rows = np.concatenate([row for _, row in rings])
+    row_start, row_stop = int(np.clip(np.floor(rows.min()), 0, height)), int(np.clip(np.ceil(rows.max()) + 1, 0, height))
+    col_start, col_stop = int(np.clip(np.floor(cols.min()), 0, width)), int(np.clip(np.ceil(cols.max()) + 1, 0, width))
+    if row_start >= row_stop or col_start >= col_stop:
+        return None
+
+    # each ring edge toggles the inside state of the pixels right of its crossing (even-odd rule),
+    # only over the polygon's bounding box
+    toggles = np.zeros((row_stop - row_start, col_stop - col_start + 1), dtype=np.int32)
+    for col, row in rings:
+        x0, y0, x1, y1 = col[:-1], row[:-1], col[1:], row[1:]
+        y_min, y_max = np.minimum(y0, y1), np.maximum(y0, y1)
+
+        # rows whose center line (r + 0.5) lies in [y_min, y_max)
+        first = np.clip(np.ceil(y_min - 0.5), row_start, row_stop).astype(np.int64)
+        last = np.clip(np.ceil(y_max - 0.5), row_start, row_stop).astype(np.int64)
+        counts = np.maximum(last - first, 0)
+        if not counts.sum():
+            continue
+
+        edge = np.repeat(np.arange(len(x0)), counts)
+        crossing_rows = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + first[edge]
+        # x position of the crossing on each row center line
+        ratio = (crossing_rows + 0.5 - y0[edge]) / (y1[edge] - y0[edge])
+        cross = x0[edge] + ratio * (x1[edge] - x0[edge])
+        crossing_cols = np.clip(np.ceil(cross - 0.5), col_start, col_stop).astype(np.int64)
+        np.add.at(toggles, (crossing_rows - row_start, crossing_cols - col_start), 1)
+
+    inside = (np.cumsum(toggles, axis=1)[:, :col_stop - col_start] % 2).astype(bool)
+    return (slice(row_start, row_stop), slice(col_start, col_stop)), inside
+
+# Burning polygons into a boolean mask of the given shape (pixel centers inside = True)
+def rasterize(geometry, transform, shape):
+    mask = np.zeros(shape, dtype=bool)
+    for polygon in polygons(geometry):
+        burnt = _burn(polygon, transform, shape)
+        if burnt is not None:
+            window, inside = burnt
+            mask[window] |= inside
+    return mask
+
+# Burning a list of geometries into a zone raster: pixels get the 1-based index of the geometry covering
+# them (the last one where geometries overlap), 0 outside every geometry
+def rasterize_ids(geometries, transform, shape, ids=None):
+    zones = np.zeros(shape, dtype=np.int32)
+    for index, geo in enumerate(geometries):
+        zone = index + 1 if ids is None else ids[index]
+        for polygon in polygons(geo):
+            burnt = _burn(polygon, transform, shape)
+            if burnt is not None:
+                window, inside = burnt
+                zones[window][inside] = zone
+    return zones
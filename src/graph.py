@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.cache import cache_key
+
+#################### Incremental recomputation graph ####################
+# The processing steps are nodes of a dependency graph, each node is memoized under a key derived from
+# its name and the keys of its dependencies (the inputs' values at the leaves). When one input changes
+# (e.g. the post-fire date) only the nodes downstream of it get new keys and are recomputed, the others
+# are read back from the memo, which can outlive the graph (e.g. kept in st.session_state).
+# Nodes can be evaluated from several threads: each node key has its own lock, a node needed by two
+# threads at once (e.g. dNBR, under both its layer and the statistics) is computed once.
+# With a recorder (src/instrument.py) every node read is recorded: memo hits, and the computation time
+# of the node alone (its dependencies are recorded under their own names).
+
+# Memoized node values kept at most, least recently used ones are dropped first
+MAX_ENTRIES = 64
+
+# Threads evaluating nodes at once (layers are mostly waiting on Earth Engine requests or disk)
+WORKERS = 4
+
+
+class Graph:
+    def __init__(self, memo=None, max_entries=MAX_ENTRIES, recorder=None):
+        self.memo = memo if memo is not None else OrderedDict()
+        self.max_entries = max_entries
+        self.recorder = recorder
+        # name > (function, dependency names)
+        self.nodes = {}
+        # name > (value, key content)
+        self.inputs = {}
+        self._keys = {}
+        # nodes computed (not found in the memo) by this graph
+        self.computed = []
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    # Declaring an input value, `key` replaces the value in the node keys when it can't be hashed
+    # (e.g. a backend object)
+    def input(self, name, value, key=None):
+        self.inputs[name] = (value, value if key is None else key)
+        self._keys.clear()
+
+    # Declaring a node computed by function(*values of the dependencies)
+    def node(self, name, function, *dependencies):
+        self.nodes[name] = (function, dependencies)
+        self._keys.clear()
+
+    def key(self, name):
+        if name not in self._keys:
+            if name in self.inputs:
+                self._keys[name] = cache_key('input', name, self.inputs[name][1])
+            else:
+                _, dependencies = self.nodes[name]
+                self._keys[name] = cache_key('node', name, [self.key(dependency) for dependency in dependencies])
+        return self._keys[name]
+
+    # Value of an input or a node, computing the node (and the missing dependencies) when not memoized
+    def get(self, name):
+        if name in self.inputs:
+            return self.inputs[name][0]
+
+        key = self.key(name)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # other threads asking for this node wait for it instead of computing it again
+        with key_lock:
+            with self._lock:
+                memoized = key in self.memo
+                if memoized:
+                    self.memo.move_to_end(key)
+                    value = self.memo[key]
+            if memoized:
+                if self.recorder is not None:
+                    self.recorder.add(name, cache='hit')
+                return value
+
+            function, dependencies = self.nodes[name]
+            arguments = [self.get(dependency) for dependency in dependencies]
+            if self.recorder is None:
+                value = function(*arguments)
+            else:
+                with self.recorder.stage(name, cache='miss'):
+                    value = function(*arguments)
+            with self._lock:
+                self.computed.append(name)
+                self.memo[key] = value
+                while len(self.memo) > self.max_entries:
+                    self.memo.popitem(last=False)
+            return value
+
+    # Values of several nodes evaluated concurrently, as {name: value}
+    # callback(name, done, total) is called from the calling thread as each node completes (progress bars...)
+    def evaluate(self, names, workers=WORKERS, callback=None):
+        values = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(names)))) as pool:
+            futures = {pool.submit(self.get, name): name for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                values[name] = future.result()
+                if callback is not None:
+                    callback(name, len(values), len(names))
+        return values
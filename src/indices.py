@@ -0,0 +1,129 @@
+import numpy as np
+
+from src import classify
+
+#################### Burn severity indices ####################
+# NBR and NDWI of both periods, dNBR and its relativized forms computed together in one fused pass: the
+# B3 / B8 / B11 / B12 bands of the pre and post-fire images are read once per chunk of rows, every index of
+# the chunk is derived from them in float32 and written to its output. No full size intermediate (pre / post
+# NBR, raw dNBR...) is materialized between steps.
+#   dNBR   = pre_NBR - post_NBR - offset
+#   RdNBR  = dNBR / sqrt(|pre_NBR|)          relativized dNBR (Miller & Thode, 2007)
+#   RBR    = dNBR / (pre_NBR + 1.001)        relativized burn ratio (Parks et al., 2014)
+# The dNBR offset is the mean dNBR of unburned pixels (e.g. a reference area next to the fire): it removes
+# the change between the two dates that is not fire (phenology, sun angle, moisture). RdNBR and RBR are
+# computed from the corrected dNBR.
+# NBR is in [-1, 1] here: RdNBR and RBR are the x1000 scaled values of the literature divided by 1000.
+
+# Selectable severity indices (app, webmap.py)
+INDICES = ['dNBR', 'RdNBR', 'RBR']
+
+# Outputs of the fused pass: product > band name of its image (same band names as get_NBR / get_NDWI / get_dNBR)
+PRODUCTS = {
+    'pre_NBR': 'NBR',
+    'post_NBR': 'NBR',
+    'pre_NDWI': 'NDWI',
+    'post_NDWI': 'NDWI',
+    'dNBR': 'dNBR',
+    'RdNBR': 'RdNBR',
+    'RBR': 'RBR',
+}
+
+# Rows processed at once, every band of both periods is held for a chunk only
+CHUNK_ROWS = 512
+
+# |pre-fire NBR| floor of the RdNBR denominator (bare pixels would blow it up)
+MIN_PRE_NBR = 0.001
+
+# Shift of the RBR denominator, keeps it positive for any pre-fire NBR
+RBR_SHIFT = 1.001
+
+# Severity ramps of each index, spanning the same severities (unburned to high) on their own scales
+VIS_PARAMS = {
+    'dNBR': {'min': -0.12, 'max': 0.82, 'palette': classify.PALETTE},
+    'RdNBR': {'min': -0.15, 'max': 1.2, 'palette': classify.PALETTE},
+    'RBR': {'min': -0.08, 'max': 0.55, 'palette': classify.PALETTE},
+}
+
+LABELS = {
+    'dNBR': 'dNBR - Burn Severity',
+    'RdNBR': 'RdNBR - Relativized dNBR',
+    'RBR': 'RBR - Relativized Burn Ratio',
+}
+
+
+# Bands a set of products is computed from
+def bands_for(products):
+    bands = []
+    if any(name.endswith('NDWI') for name in products):
+        bands += ['B3', 'B11']
+    if any(not name.endswith('NDWI') for name in products):
+        bands += ['B8', 'B12']
+    return bands
+
+def normalized_difference(a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (a - b) / (a + b)
+
+# Relativized dNBR
+def rdnbr(dNBR, pre_NBR):
+    return (dNBR / np.sqrt(np.maximum(np.abs(pre_NBR), MIN_PRE_NBR))).astype(np.float32)
+
+# Relativized burn ratio
+def rbr(dNBR, pre_NBR):
+    return (dNBR / (pre_NBR + RBR_SHIFT)).astype(np.float32)
+
+# Products of one chunk, pre / post: {band: array} of the same rows
+def severity_chunk(pre, post, offset=0.0, products=PRODUCTS):
+    pre = {band: np.asarray(values, dtype=np.float32) for band, values in pre.items()}
+    post = {band: np.asarray(values, dtype=np.float32) for band, values in post.items()}
+    values = {}
+    if 'pre_NDWI' in products:
+        values['pre_NDWI'] = normalized_difference(pre['B3'], pre['B11'])
+    if 'post_NDWI' in products:
+        values['post_NDWI'] = normalized_difference(post['B3'], post['B11'])
+    if 'B8' in pre:
+        pre_NBR = normalized_difference(pre['B8'], pre['B12'])
+        post_NBR = normalized_difference(post['B8'], post['B12'])
+        dNBR = pre_NBR - post_NBR
+        if offset:
+            dNBR -= np.float32(offset)
+        values.update({'pre_NBR': pre_NBR, 'post_NBR': post_NBR, 'dNBR': dNBR})
+        if 'RdNBR' in products:
+            values['RdNBR'] = rdnbr(dNBR, pre_NBR)
+        if 'RBR' in products:
+            values['RBR'] = rbr(dNBR, pre_NBR)
+    return {name: values[name] for name in products}
+
+# Fused pass over whole images: pre_bands / post_bands are {band: 2D array} (arrays or memory maps, only
+# the bands the products need are read), returns {product: float32 array}
+def severity(pre_bands, post_bands, offset=0.0, products=PRODUCTS, chunk_rows=CHUNK_ROWS):
+    bands = bands_for(products)
+    height = np.shape(pre_bands[bands[0]])[0]
+    outputs = {name: np.empty(np.shape(pre_bands[bands[0]]), dtype=np.float32) for name in products}
+    for row in range(0, height, chunk_rows):
+        rows = slice(row, min(row + chunk_rows, height))
+        chunk = severity_chunk({band: pre_bands[band][rows] for band in bands},
+                               {band: post_bands[band][rows] for band in bands}, offset, products)
+        for name, values in chunk.items():
+            outputs[name][rows] = values
+    return outputs
+
+# Same products as Earth Engine images, from one expression graph over both images: Earth Engine evaluates
+# it per output tile, reading each band once for all the products of the tile
+def ee_severity(pre_image, post_image, offset=0.0, products=PRODUCTS):
+    pre_NBR = pre_image.normalizedDifference(['B8', 'B12'])
+    post_NBR = post_image.normalizedDifference(['B8', 'B12'])
+    dNBR = pre_NBR.subtract(post_NBR)
+    if offset:
+        dNBR = dNBR.subtract(offset)
+    images = {
+        'pre_NBR': pre_NBR,
+        'post_NBR': post_NBR,
+        'pre_NDWI': pre_image.normalizedDifference(['B3', 'B11']),
+        'post_NDWI': post_image.normalizedDifference(['B3', 'B11']),
+        'dNBR': dNBR,
+        'RdNBR': dNBR.divide(pre_NBR.abs().max(MIN_PRE_NBR).sqrt()),
+        'RBR': dNBR.divide(pre_NBR.add(RBR_SHIFT)),
+    }
+    return {name: images[name] for name in products}
@@ -0,0 +1,152 @@
+import codecs
+import json
+
+from src import geometry
+from src import spatial
+
+#################### Streaming GeoJSON ingestion ####################
+# Large FeatureCollections are decoded one feature at a time from fixed-size chunks of the file,
+# the whole document is never loaded (or parsed) at once. Bounds and centroids are computed locally
+# and the features are indexed in an STR tree to find the ones under a tile.
+
+# Bytes read from the file at once
+CHUNK_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+# Incremental reader over a text or binary file object
+class _Stream:
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+        # multi-byte characters may be split between two chunks
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+
+    def _read_more(self):
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        # dropping what was already decoded so the buffer stays around one chunk
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    # Next non whitespace character (not consumed), None at the end of the file
+    def peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                return None
+            self._read_more()
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError(f'Invalid GeoJSON: expected {character!r} at position {self.position}')
+        self.position += 1
+
+    # Decoding the next JSON value, reading more of the file until it is complete
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._read_more()
+                continue
+            # a number cut at the end of the buffer would decode as a shorter number
+            if end == len(self.buffer) and not self.eof:
+                self._read_more()
+                continue
+            self.position = end
+            return value
+
+
+# Yielding the features of a GeoJSON file one by one, as {'geometry': ..., 'properties': ...} dicts
+# FeatureCollection 'features' and GeometryCollection 'geometries' arrays are streamed,
+# a single Feature or geometry object is yielded as one feature.
+def iter_features(file, chunk_size=CHUNK_SIZE):
+    stream = _Stream(file, chunk_size)
+    stream.expect('{')
+    document = {}
+    streamed = False
+
+    while stream.peek() != '}':
+        if document or streamed:
+            stream.expect(',')
+        key = stream.value()
+        stream.expect(':')
+
+        if key in ('features', 'geometries') and stream.peek() == '[':
+            streamed = True
+            stream.expect('[')
+            first = True
+            while stream.peek() != ']':
+                if not first:
+                    stream.expect(',')
+                first = False
+                item = stream.value()
+                yield item if key == 'features' else {'geometry': item}
+            stream.expect(']')
+        else:
+            document[key] = stream.value()
+
+    if not streamed:
+        if document.get('type') == 'Feature':
+            yield document
+        elif 'coordinates' in document:
+            yield {'geometry': document}
+
+
+# Features of one or more GeoJSON files with their bounds, centroids and an STR tree over their boxes
+class FeatureIndex:
+    def __init__(self, features):
+        self.geometries = []
+        for feature in features:
+            geo = feature.get('geometry') if isinstance(feature, dict) else None
+            # only surfaces make an area of study
+            if geo and 'coordinates' in geo and geo.get('type') in ('Polygon', 'MultiPolygon'):
+                self.geometries.append(geo)
+
+        self.boxes, self.centroids = geometry.bounds_and_centroids(self.geometries)
+        self.tree = spatial.STRtree(self.boxes)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    # Overall (west, south, east, north), None when empty
+    def bounds(self):
+        if not len(self):
+            return None
+        return self.boxes[:, 0].min(), self.boxes[:, 1].min(), self.boxes[:, 2].max(), self.boxes[:, 3].max()
+
+    # Geometries whose bounding box intersects a (west, south, east, north) box
+    def query(self, box):
+        return [self.geometries[index] for index in self.tree.query(box)]
+
+    # All the features as a single MultiPolygon
+    def union(self):
+        return geometry.union(self.geometries)
+
+
+# Indexing the features of several GeoJSON files (paths or file objects)
+def load_files(files, chunk_size=CHUNK_SIZE):
+    def features():
+        for file in files:
+            if isinstance(file, str):
+                with open(file, 'rb') as f:
+                    yield from iter_features(f, chunk_size)
+            else:
+                yield from iter_features(file, chunk_size)
+    return FeatureIndex(features())
@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+#################### Per stage instrumentation ####################
+# Every processing stage (graph node, layer drawing, batch step...) is recorded with its wall time, the bytes
+# the process read meanwhile, the peak resident memory at its end and whether it came from a cache.
+# Records are kept by a Recorder (shown in the app's debug panel, written next to batch outputs) and logged
+# as JSON lines on the 'wildfire.stages' logger, sent to a file (or stderr with '-') when the
+# WILDFIRE_STAGE_LOG environment variable is set:
+#   WILDFIRE_STAGE_LOG=stages.jsonl streamlit run app.py
+# Bytes read come from the process I/O counters: stages running at the same time share them, and memory
+# mapped pages are not counted.
+
+ENV_VARIABLE = 'WILDFIRE_STAGE_LOG'
+
+logger = logging.getLogger('wildfire.stages')
+_logging_lock = threading.Lock()
+
+
+# Peak resident memory of the current process in bytes
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        import psutil
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# Bytes read by the process so far (read() calls, page cache included), None when unknown
+def bytes_read():
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import psutil
+        counters = psutil.Process().io_counters()
+    except (ImportError, AttributeError, OSError):
+        return None
+    return getattr(counters, 'read_chars', counters.read_bytes)
+
+# Sending the JSON records to the file (or stderr) named by WILDFIRE_STAGE_LOG, once per process
+def configure_logging():
+    destination = os.environ.get(ENV_VARIABLE)
+    with _logging_lock:
+        if not destination or logger.handlers:
+            return
+        handler = logging.StreamHandler(sys.stderr) if destination == '-' else logging.FileHandler(destination)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+class Recorder:
+    def __init__(self, name):
+        self.name = name
+        self.records = []
+        self._lock = threading.Lock()
+        configure_logging()
+
+    # Adding a record: stage name, seconds, cache ('hit' / 'miss' / None) and any other field
+    def add(self, stage, seconds=0.0, cache=None, **fields):
+        record = {
+            'run': self.name,
+            'stage': stage,
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'seconds': seconds,
+            'cache': cache,
+            'thread': threading.current_thread().name,
+        }
+        record.update(fields)
+        with self._lock:
+            self.records.append(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record))
+        return record
+
+    # Timing a block as a stage, `fields` (e.g. cache) can be updated inside the block
+    @contextmanager
+    def stage(self, stage, cache=None, **fields):
+        fields['cache'] = cache
+        read_before = bytes_read()
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            seconds = time.perf_counter() - start
+            read_after = bytes_read()
+            fields['bytes_read'] = None if read_before is None or read_after is None else read_after - read_before
+            fields['peak_rss'] = peak_rss()
+            self.add(stage, seconds, **fields)
+
+    # Total seconds, calls and cache hits per stage, slowest stages first
+    def summary(self):
+        stages = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            stage = stages.setdefault(record['stage'], {'stage': record['stage'], 'calls': 0, 'seconds': 0.0,
+                                                        'cache_hits': 0, 'bytes_read': 0, 'peak_rss': 0})
+            stage['calls'] += 1
+            stage['seconds'] += record['seconds']
+            stage['cache_hits'] += record['cache'] == 'hit'
+            stage['bytes_read'] += record.get('bytes_read') or 0
+            stage['peak_rss'] = max(stage['peak_rss'], record.get('peak_rss') or 0)
+        return sorted(stages.values(), key=lambda stage: stage['seconds'], reverse=True)
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump({'run': self.name, 'summary': self.summary(), 'records': self.records}, f, indent=2)
+        return path
+
+
+# Running a function under a profiler, the profile is written to `path`:
+# 'cprofile' (.prof, for pstats / snakeviz) or 'pyinstrument' (.html)
+def profiled(profiler, path, function, *args, **kwargs):
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+        profile = Profiler()
+        profile.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.stop()
+            with open(path, 'w') as f:
+                f.write(profile.output_html())
+    import cProfile
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args, **kwargs)
+    finally:
+        profile.dump_stats(path)
@@ -0,0 +1,68 @@
+// Map shell: draws the layers listed in the JSON file named by the #map element (see src/mapshell.py)
+// Tile and image layers are plain leaflet layers, vector layers fetch their GeoJSON the first time they are shown.
+(function () {
+  var container = document.getElementById('map');
+
+  function tooltip(fields) {
+    return function (feature, layer) {
+      if (!fields || !fields.length) return;
+      layer.bindTooltip(fields.map(function (field) {
+        return '<b>' + field[1] + '</b>: ' + feature.properties[field[0]];
+      }).join('<br>'));
+    };
+  }
+
+  function makeLayer(spec) {
+    if (spec.type === 'tile') {
+      return L.tileLayer(spec.url, {
+        attribution: spec.attribution || '',
+        maxNativeZoom: spec.max_native_zoom || undefined,
+        maxZoom: spec.max_zoom || 18,
+        opacity: spec.opacity === undefined ? 1 : spec.opacity
+      });
+    }
+    if (spec.type === 'image') {
+      return L.imageOverlay(spec.url, spec.bounds, {opacity: spec.opacity === undefined ? 1 : spec.opacity});
+    }
+    var layer = L.geoJSON(null, {style: spec.style || {}, onEachFeature: tooltip(spec.tooltip)});
+    var requested = false;
+    layer.on('add', function () {
+      if (requested) return;
+      requested = true;
+      fetch(spec.url).then(function (response) { return response.json(); }).then(function (data) {
+        layer.addData(data);
+      });
+    });
+    return layer;
+  }
+
+  function draw(spec) {
+    var map = L.map(container, {center: spec.center, zoom: spec.zoom});
+    L.control.scale().addTo(map);
+    var basemaps = {};
+    var overlays = {};
+    spec.basemaps.forEach(function (basemap, index) {
+      basemaps[basemap.name] = L.tileLayer(basemap.url, {attribution: basemap.attribution || '', maxZoom: basemap.max_zoom || 19});
+      if (index === 0) basemaps[basemap.name].addTo(map);
+    });
+    spec.layers.forEach(function (layer) {
+      overlays[layer.name] = makeLayer(layer);
+      if (layer.visible !== false) overlays[layer.name].addTo(map);
+    });
+    L.control.layers(basemaps, overlays, {collapsed: spec.collapsed}).addTo(map);
+    if (spec.bounds) map.fitBounds(spec.bounds);
+  }
+
+  // legend panels of src/uilegend.py (legend.js), draggable when jQuery UI is loaded
+  if (window.wildfireLegend) {
+    document.body.insertAdjacentHTML('beforeend', window.wildfireLegend);
+    if (window.jQuery && jQuery.fn.draggable) {
+      jQuery('#ui-container, #title-container, #project-container').draggable({
+        start: function () { jQuery(this).css({right: 'auto', top: 'auto', bottom: 'auto'}); }
+      });
+      jQuery('.collapse-this').accordion({collapsible: true});
+    }
+  }
+
+  fetch(container.dataset.layers).then(function (response) { return response.json(); }).then(draw);
+})();
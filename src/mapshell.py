@@ -0,0 +1,174 @@
+import hashlib
+import html
+import json
+import os
+import re
+import uuid
+
+from src import uilegend
+
+#################### Lightweight map pages ####################
+# A folium map inlines the legend template, its CSS links and the javascript of every layer: each streamlit
+# rerun ships the whole document again, and it grows with every fire and layer. A map shell is a small
+# constant size page instead:
+#   <name>.html          leaflet + the shared assets, no layer in it
+#   <name>.layers.json   the layer list (tile urls, image overlays, vector layers), fetched by the page
+#   <assets>/            ui.css, legend.js (the src/uilegend.py panels) and map.js, shared by every map and
+#                        versioned by content hash: browsers keep them cached between maps and reruns
+# Vector layers are GeoJSON files fetched the first time they are shown, hidden ones never load.
+# The layer list is fetched: shells are opened through a web server (the local tile server, GitHub Pages,
+# python -m http.server), not as file:// pages.
+
+ASSET_DIR = 'assets'
+
+# Leaflet, jQuery UI (draggable legend panels) and Font Awesome icons from their CDNs
+LEAFLET_CSS = 'https://unpkg.com/leaflet@1.9.4/dist/leaflet.css'
+LEAFLET_JS = 'https://unpkg.com/leaflet@1.9.4/dist/leaflet.js'
+HEAD_LINKS = [
+    '<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.2.1/css/all.min.css" crossorigin="anonymous" referrerpolicy="no-referrer">',
+    '<link rel="stylesheet" href="https://code.jquery.com/ui/1.12.1/themes/base/jquery-ui.css">',
+    '<script src="https://code.jquery.com/jquery-1.12.4.js"></script>',
+    '<script src="https://code.jquery.com/ui/1.12.1/jquery-ui.js"></script>',
+]
+
+OSM = {
+    'name': 'Open Street Map',
+    'url': 'https://tile.openstreetmap.org/{z}/{x}/{y}.png',
+    'attribution': '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors',
+}
+DARK_MATTER = {
+    'name': 'Dark Matter',
+    'url': 'https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}.png',
+    'attribution': '&copy; OpenStreetMap contributors &copy; <a href="https://carto.com/attributions">CARTO</a>',
+}
+
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SHELL_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<link rel="stylesheet" href="{leaflet_css}">
+{head_links}
+<link rel="stylesheet" href="{assets}/ui.css?v={version}">
+<style>html, body, #map {{ height: 100%; width: 100%; margin: 0; padding: 0; }}</style>
+</head>
+<body>
+<div id="map" data-layers="{layers}"></div>
+<script src="{leaflet_js}"></script>
+{legend}<script src="{assets}/map.js?v={version}"></script>
+</body>
+</html>
+"""
+
+
+# Legend panels of src/uilegend.py (the body of its template) as a script setting window.wildfireLegend
+def legend_script():
+    body = re.search(r'<body>(.*)</body>', uilegend.uilegend, re.S).group(1)
+    return f'window.wildfireLegend = {json.dumps(body.strip())};\n'
+
+# Asset files of the shells: name > content
+def asset_files():
+    with open(os.path.join(_SRC_DIR, 'ui.css')) as f:
+        css = f.read()
+    with open(os.path.join(_SRC_DIR, 'mapshell.js')) as f:
+        script = f.read()
+    return {'ui.css': css, 'legend.js': legend_script(), 'map.js': script}
+
+# Writing the shared assets into a folder (left untouched when up to date), returns their version hash
+def write_assets(directory):
+    files = asset_files()
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:12]
+    version_path = os.path.join(directory, 'version')
+    if os.path.exists(version_path):
+        with open(version_path) as f:
+            if f.read() == version:
+                return version
+    os.makedirs(directory, exist_ok=True)
+    for name, content in list(files.items()) + [('version', version)]:
+        _write_text(os.path.join(directory, name), content)
+    return version
+
+# Files are written to a temporary file then moved in place: a page served meanwhile reads the old or
+# the new version, never a partial one. Unchanged files are left as is (their ETag stays valid).
+def _write_text(path, content):
+    if os.path.isfile(path):
+        with open(path) as f:
+            if f.read() == content:
+                return
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# legend: the src/uilegend.py panels (webmap.py and batch pages), the app's map has none
+class MapShell:
+    def __init__(self, title='Wildfire Burn Severity Analysis', center=(36.60, 16.00), zoom=5, basemaps=(OSM,),
+                 legend=False, collapsed=True):
+        self.title = title
+        self.center = list(center)
+        self.zoom = zoom
+        self.basemaps = [dict(basemap) for basemap in basemaps]
+        self.legend = legend
+        self.collapsed = collapsed
+        self.layers = []
+        # map extent ([[south, west], [north, east]]), the view fits it when set
+        self.bounds = None
+
+    def tile_layer(self, name, url, attribution='', max_native_zoom=None, max_zoom=18, visible=True, opacity=1):
+        return self._add({'type': 'tile', 'name': name, 'url': url, 'attribution': attribution,
+                          'max_native_zoom': max_native_zoom, 'max_zoom': max_zoom, 'visible': visible, 'opacity': opacity})
+
+    # Image overlay (PNG url or data url) over [[south, west], [north, east]]
+    def image_layer(self, name, url, bounds, visible=True, opacity=1):
+        return self._add({'type': 'image', 'name': name, 'url': url, 'bounds': bounds, 'visible': visible, 'opacity': opacity})
+
+    # GeoJSON layer fetched from `url` when first shown, tooltip: [(property, label), ...]
+    def vector_layer(self, name, url, style=None, tooltip=(), visible=False):
+        return self._add({'type': 'vector', 'name': name, 'url': url, 'style': style or {},
+                          'tooltip': [list(field) for field in tooltip], 'visible': visible})
+
+    def _add(self, layer):
+        self.layers.append(layer)
+        return layer
+
+    def spec(self):
+        return {
+            'title': self.title,
+            'center': self.center,
+            'zoom': self.zoom,
+            'bounds': self.bounds,
+            'collapsed': self.collapsed,
+            'basemaps': self.basemaps,
+            'layers': self.layers,
+        }
+
+    # Page of the shell, `layers_url` and `assets_url` relative to it (or absolute)
+    def document(self, layers_url, assets_url=ASSET_DIR, version=''):
+        return SHELL_TEMPLATE.format(
+            title=html.escape(self.title),
+            leaflet_css=LEAFLET_CSS,
+            leaflet_js=LEAFLET_JS,
+            head_links='\n'.join(HEAD_LINKS) if self.legend else '',
+            assets=assets_url,
+            version=version,
+            layers=html.escape(layers_url),
+            legend=f'<script src="{assets_url}/legend.js?v={version}"></script>\n' if self.legend else '',
+        )
+
+    # Writing <directory>/<name>.html and <name>.layers.json, the assets go to `assets_dir` (default: an
+    # assets folder next to the page, shared by every shell written in the same directory)
+    # Returns the page path
+    def write(self, directory, name='map', assets_dir=None):
+        os.makedirs(directory, exist_ok=True)
+        assets_dir = assets_dir or os.path.join(directory, ASSET_DIR)
+        version = write_assets(assets_dir)
+        layers_name = f'{name}.layers.json'
+        _write_text(os.path.join(directory, layers_name), json.dumps(self.spec()))
+        assets_url = os.path.relpath(assets_dir, directory).replace(os.sep, '/')
+        path = os.path.join(directory, f'{name}.html')
+        _write_text(path, self.document(layers_name, assets_url, version))
+        return path
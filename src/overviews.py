@@ -0,0 +1,119 @@
+import numpy as np
+
+#################### Overview pyramids ####################
+# Each overview level halves the previous one: mean of the valid pixels of each 2x2 block for continuous
+# rasters (reflectance composites, NBR, dNBR...), most frequent class for class rasters. Levels are built
+# once from the level above (about a third of the full resolution cost), zoomed out views and previews
+# then read the level matching their resolution instead of resampling the full raster.
+
+# Levels are built until the raster fits in this many pixels (a map tile)
+MIN_SIZE = 256
+
+# Rows of the source level processed at once (even), bounds the temporary arrays
+CHUNK_ROWS = 1024
+
+# Resampling method per local output raster
+RESAMPLING = {
+    'dNBR_classes': 'mode',
+    'classification': 'mode',
+}
+
+
+def resampling_for(name):
+    return RESAMPLING.get(name, 'mean')
+
+# Missing value of a raster: nodata if given, NaN for floats
+def _missing(dtype, nodata):
+    if nodata is not None:
+        return nodata
+    return np.nan if np.issubdtype(dtype, np.floating) else 0
+
+# Padding a block of rows to even sizes and splitting it in 2x2 blocks: (rows/2, columns/2, 4)
+def _blocks(values, missing):
+    rows, columns = values.shape
+    padded = np.full((rows + rows % 2, columns + columns % 2), missing, dtype=values.dtype)
+    padded[:rows, :columns] = values
+    half_rows, half_columns = padded.shape[0] // 2, padded.shape[1] // 2
+    return padded.reshape(half_rows, 2, half_columns, 2).transpose(0, 2, 1, 3).reshape(half_rows, half_columns, 4)
+
+# Mean of the valid (finite, not nodata) pixels of each block, NaN when there are none
+def _mean(blocks, nodata):
+    values = blocks.astype(np.float32)
+    valid = np.isfinite(values)
+    if nodata is not None:
+        valid &= blocks != nodata
+    counts = valid.sum(axis=-1)
+    sums = np.where(valid, values, 0).sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan).astype(np.float32)
+
+# Most frequent valid class of each block, ties go to the highest (most severe) class
+def _mode(blocks, nodata, missing):
+    result = np.full(blocks.shape[:2], missing, dtype=blocks.dtype)
+    best = np.zeros(blocks.shape[:2], dtype=np.int8)
+    values = np.unique(blocks)
+    for value in values:
+        if (nodata is not None and value == nodata) or (isinstance(value, np.floating) and np.isnan(value)):
+            continue
+        count = (blocks == value).sum(axis=-1, dtype=np.int8)
+        better = (count > 0) & (count >= best)
+        result[better] = value
+        best[better] = count[better]
+    return result
+
+# Reading rows of a raster, memory-mapped files are mapped again for every chunk so the pages
+# already read don't stay resident (peak memory stays bounded by the chunk size)
+def _read_rows(source, start, stop):
+    if isinstance(source, np.memmap) and source.filename:
+        mapped = np.load(source.filename, mmap_mode='r')
+        rows = np.array(mapped[start:stop])
+        del mapped
+        return rows
+    return np.asarray(source[start:stop])
+
+# Next overview level of a raster (2D array or memory map), written into `out` when given
+def downsample(source, method='mean', nodata=None, out=None):
+    rows, columns = source.shape
+    dtype = np.float32 if method == 'mean' else source.dtype
+    missing = _missing(source.dtype, nodata)
+    if out is None:
+        out = np.empty(((rows + 1) // 2, (columns + 1) // 2), dtype=dtype)
+
+    for start in range(0, rows, CHUNK_ROWS):
+        blocks = _blocks(_read_rows(source, start, start + CHUNK_ROWS), missing)
+        if method == 'mean':
+            level = _mean(blocks, nodata)
+        else:
+            level = _mode(blocks, nodata, missing)
+        out[start // 2:start // 2 + len(level)] = level
+    return out
+
+# All the overview levels of a raster: levels[0] is half the resolution, the last one fits in min_size.
+# With `path_template` (e.g. 'dNBR.ov{}.npy') levels are written as .npy files and returned memory-mapped.
+def build(source, method='mean', nodata=None, min_size=MIN_SIZE, path_template=None):
+    levels = []
+    level = source
+    while max(level.shape) > min_size:
+        shape = ((level.shape[0] + 1) // 2, (level.shape[1] + 1) // 2)
+        out = None
+        if path_template is not None:
+            dtype = np.float32 if method == 'mean' else level.dtype
+            out = np.lib.format.open_memmap(path_template.format(len(levels) + 1), mode='w+', dtype=dtype, shape=shape)
+        level = downsample(level, method, nodata, out)
+        if path_template is not None:
+            level.flush()
+        levels.append(level)
+    return levels
+
+# Overview level to read for a target pixel size (same unit as pixel_size): the coarsest level that is
+# still at least as fine as the target, 0 is the full resolution
+def level_for(pixel_size, target_size, levels):
+    level = 0
+    while level < levels and abs(pixel_size) * 2 ** (level + 1) <= abs(target_size):
+        level += 1
+    return level
+
+# Geotransform of an overview level
+def level_transform(transform, level):
+    x0, dx, rx, y0, ry, dy = transform
+    return [x0, dx * 2 ** level, rx, y0, ry, dy * 2 ** level]
@@ -0,0 +1,77 @@
+import numpy as np
+
+#################### Local rendering of visual parameters ####################
+# Applying the same vis params dicts used with getMapId ('bands', 'min', 'max', 'gamma', 'palette', 'opacity')
+# to numpy rasters, masked (NaN) pixels become transparent.
+
+# Converting a palette entry ('#1c742c', '1c742c', 'black'...) to an RGB tuple
+def parse_color(color):
+    from PIL import ImageColor
+
+    if not color.startswith('#') and len(color) in (3, 6):
+        try:
+            int(color, 16)
+            color = '#' + color
+        except ValueError:
+            pass
+    return ImageColor.getrgb(color)[:3]
+
+# Expanding a single value or a per band list to one value per band
+def _per_band(value, count, default):
+    if value is None:
+        value = default
+    if isinstance(value, str):
+        value = [float(v) for v in value.split(',')]
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    if len(value) == 1:
+        value = list(value) * count
+    return np.asarray(value, dtype=np.float32)
+
+# Stretching, gamma correcting and coloring bands to an RGBA uint8 array
+def colorize(bands, vis_params):
+    bands = [np.asarray(band, dtype=np.float32) for band in bands]
+    count = len(bands)
+    v_min = _per_band(vis_params.get('min'), count, 0)
+    v_max = _per_band(vis_params.get('max'), count, 1)
+    gamma = _per_band(vis_params.get('gamma'), count, 1)
+
+    stretched = []
+    for index, band in enumerate(bands):
+        span = (v_max[index] - v_min[index]) or 1
+        value = np.clip((band - v_min[index]) / span, 0, 1)
+        if gamma[index] != 1:
+            value = value ** (1 / gamma[index])
+        stretched.append(value)
+
+    valid = np.all([np.isfinite(band) for band in bands], axis=0)
+    rgba = np.zeros(bands[0].shape + (4,), dtype=np.uint8)
+
+    palette = vis_params.get('palette')
+    if count == 1 and palette:
+        if isinstance(palette, str):
+            palette = palette.split(',')
+        colors = np.asarray([parse_color(color.strip()) for color in palette], dtype=np.float32)
+        # linear interpolation between the palette stops like Earth Engine does
+        position = np.nan_to_num(stretched[0]) * (len(colors) - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, len(colors) - 1)
+        weight = (position - low)[..., None]
+        rgba[..., :3] = np.round(colors[low] * (1 - weight) + colors[high] * weight)
+    elif count == 1:
+        rgba[..., :3] = np.round(np.nan_to_num(stretched[0]) * 255)[..., None]
+    else:
+        for index in range(3):
+            rgba[..., index] = np.round(np.nan_to_num(stretched[index]) * 255)
+
+    rgba[..., 3] = np.where(valid, round(255 * vis_params.get('opacity', 1)), 0)
+    return rgba
+
+# Picking the bands a vis params dict refers to out of a local image
+def image_bands(image, vis_params):
+    names = vis_params.get('bands')
+    if isinstance(names, str):
+        names = names.split(',')
+    if not names:
+        names = list(image.bands)[:1]
+    return [image.band(name) for name in names]
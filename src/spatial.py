@@ -0,0 +1,58 @@
+import numpy as np
+
+#################### STR packed R-tree ####################
+# Bulk loaded (Sort-Tile-Recursive) R-tree over bounding boxes (west, south, east, north).
+# Built once with numpy, queried level by level: finding the features under a tile or a map view
+# only tests the few nodes whose boxes intersect it instead of every feature.
+
+# Entries per tree node
+NODE_CAPACITY = 16
+
+
+# Boxes intersecting a query box (edges touching count as intersecting)
+def intersects(boxes, box):
+    west, south, east, north = box
+    return (boxes[:, 0] <= east) & (boxes[:, 2] >= west) & (boxes[:, 1] <= north) & (boxes[:, 3] >= south)
+
+
+class STRtree:
+    def __init__(self, boxes, node_capacity=NODE_CAPACITY):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.node_capacity = node_capacity
+        self.size = len(boxes)
+
+        # STR order: vertical slices by x center, then sorted by y center inside each slice
+        count = len(boxes)
+        slices = max(1, int(np.ceil(np.sqrt(np.ceil(count / node_capacity)))))
+        x_rank = np.argsort(np.argsort((boxes[:, 0] + boxes[:, 2]) / 2, kind='stable'), kind='stable')
+        slice_id = x_rank // (slices * node_capacity)
+        self.order = np.lexsort(((boxes[:, 1] + boxes[:, 3]) / 2, slice_id))
+
+        # levels[0] holds the sorted leaf boxes, each next level groups node_capacity consecutive boxes
+        self.levels = [boxes[self.order]]
+        while len(self.levels[-1]) > node_capacity:
+            children = self.levels[-1]
+            starts = np.arange(0, len(children), node_capacity)
+            self.levels.append(np.column_stack([
+                np.minimum.reduceat(children[:, 0], starts),
+                np.minimum.reduceat(children[:, 1], starts),
+                np.maximum.reduceat(children[:, 2], starts),
+                np.maximum.reduceat(children[:, 3], starts),
+            ]))
+
+    def __len__(self):
+        return self.size
+
+    # Indices (in input order) of the boxes intersecting the query box
+    def query(self, box):
+        if not self.size:
+            return np.empty(0, dtype=np.int64)
+        nodes = np.arange(len(self.levels[-1]))
+        for depth in range(len(self.levels) - 1, -1, -1):
+            hits = nodes[intersects(self.levels[depth][nodes], box)]
+            if depth == 0:
+                return np.sort(self.order[hits])
+            # expanding the hit nodes to their children in the level below
+            nodes = (hits[:, None] * self.node_capacity + np.arange(self.node_capacity)).ravel()
+            nodes = nodes[nodes < len(self.levels[depth - 1])]
+        return np.empty(0, dtype=np.int64)
@@ -0,0 +1,34 @@
+import os
+import sys
+import time
+
+#################### Startup timing ####################
+# Time from the start of a script (or of a streamlit rerun) to its checkpoints: imports done,
+# input panel drawn, map ready... Checkpoints are printed on stderr when the WILDFIRE_STARTUP_TIMING
+# environment variable is set:
+#   WILDFIRE_STARTUP_TIMING=1 python batch.py fires.json
+# For the cost of every single import: python -X importtime batch.py fires.json
+
+ENV_VARIABLE = 'WILDFIRE_STARTUP_TIMING'
+
+
+class StartupTimer:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        # (checkpoint, seconds since start)
+        self.marks = []
+
+    # Recording a checkpoint, returns the seconds elapsed since start
+    def mark(self, checkpoint):
+        elapsed = time.perf_counter() - self.start
+        self.marks.append((checkpoint, elapsed))
+        if os.environ.get(ENV_VARIABLE):
+            print(f'[startup] {self.name}: {checkpoint} after {elapsed * 1000:.0f} ms', file=sys.stderr)
+        return elapsed
+
+    def elapsed(self, checkpoint):
+        for name, seconds in self.marks:
+            if name == checkpoint:
+                return seconds
+        return None
@@ -0,0 +1,421 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src import mapshell
+from src import overviews
+from src import render
+from src.cache import CACHE_DIR
+from src.engine import transform_bounds
+
+#################### Local XYZ tile rendering ####################
+# Local rasters are served as web mercator z/x/y PNG tiles instead of remote Earth Engine tile URLs:
+# a layer is a set of bands on a lon/lat grid plus the vis params used with getMapId, tiles are rendered
+# on first request and kept on disk (<store>/<layer>/<z>/<x>/<y>.png). Layer ids are content hashes, a
+# tile never changes once rendered: the server answers with long lived cache headers and ETags.
+# The store is bounded in bytes like the result cache: the least recently used layers (bands, overviews and
+# tiles) are evicted first, `generation` counts the evictions so layer ids handed out before can be renewed.
+#
+#   python -m src.tiles ~/.cache/wildfire-burn-severity/tiles --port 8765
+
+TILE_SIZE = 256
+TILE_DIR = os.path.join(CACHE_DIR, 'tiles')
+TILE_MAX_BYTES = 4 * 1024 ** 3
+# Map shells (src/mapshell.py) served under /maps/
+MAP_DIR = os.path.join(CACHE_DIR, 'maps')
+# Map shells kept in MAP_DIR, the least recently written are removed first
+MAX_MAPS = 200
+TILE_HOST = '127.0.0.1'
+TILE_PORT = 8765
+
+
+# lon/lat of the pixel centers of a web mercator tile, as 1D arrays (columns, rows)
+def tile_lonlat(z, x, y, size=TILE_SIZE):
+    count = 2 ** z
+    offsets = (np.arange(size) + 0.5) / size
+    lon = (x + offsets) / count * 360 - 180
+    lat = np.degrees(np.arctan(np.sinh(np.pi - 2 * np.pi * (y + offsets) / count)))
+    return lon, lat
+
+# Tile (x, y) containing a lon/lat point at a zoom level
+def lonlat_tile(lon, lat, z):
+    count = 2 ** z
+    lat = np.clip(lat, -85.0511, 85.0511)
+    x = int(np.floor((lon + 180) / 360 * count))
+    y = int(np.floor((1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * count))
+    return min(max(x, 0), count - 1), min(max(y, 0), count - 1)
+
+# Zoom level at which a tile pixel is about the size of a raster pixel of `dx` degrees
+def native_zoom(dx):
+    return max(0, int(np.ceil(np.log2(360 / (TILE_SIZE * abs(dx))))))
+
+def png_bytes(rgba):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.fromarray(rgba).save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
+
+# Content hash of a layer: bands, grid, vis params and resampling
+def layer_id(bands, transform, vis_params, nodata=None, resampling='mean'):
+    digest = hashlib.sha256()
+    for band in bands:
+        band = np.ascontiguousarray(band)
+        digest.update(str((band.dtype.str, band.shape)).encode())
+        digest.update(memoryview(band).cast('B'))
+    digest.update(json.dumps([list(transform), vis_params, nodata, resampling], sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:32]
+
+
+# Size in bytes of the files under a folder
+def _folder_size(directory):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+
+
+class TileStore:
+    # max_bytes: None for an unbounded store
+    def __init__(self, directory=TILE_DIR, max_bytes=TILE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.generation = 0
+        os.makedirs(directory, exist_ok=True)
+        # layer id > (layer.json content, memory-mapped bands)
+        self._layers = {}
+        self._lock = threading.RLock()
+
+        # layer id > [size in bytes, last use time], rebuilt from disk (layer.json is touched on use)
+        self._entries = {}
+        for layer in os.listdir(directory):
+            manifest = os.path.join(directory, layer, 'layer.json')
+            if os.path.isfile(manifest):
+                self._entries[layer] = [_folder_size(self._layer_dir(layer)), os.path.getmtime(manifest)]
+
+    def _layer_dir(self, layer):
+        return os.path.join(self.directory, layer)
+
+    # Recording a use of a layer and the bytes it grew by, then evicting other layers if needed
+    def _used(self, layer, added_bytes=0):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.setdefault(layer, [0, now])
+            entry[0] += added_bytes
+            entry[1] = now
+            self._evict(keep=layer)
+        try:
+            os.utime(os.path.join(self._layer_dir(layer), 'layer.json'), (now, now))
+        except OSError:
+            pass
+
+    # Removing the least recently used layers until the store fits in max_bytes (the layer in use is kept)
+    def _evict(self, keep=None):
+        if self.max_bytes is None:
+            return
+        total = sum(size for size, _ in self._entries.values())
+        for layer, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            if layer == keep:
+                continue
+            shutil.rmtree(self._layer_dir(layer), ignore_errors=True)
+            del self._entries[layer]
+            self._layers.pop(layer, None)
+            self.generation += 1
+            total -= size
+
+    # Storing the bands of a layer and their overview pyramids (kept as .npy files), returns the layer id
+    # `resampling` is 'mean' for continuous values, 'mode' for classes, `band_overviews` are already built
+    # overview levels of each band (see src/overviews.py)
+    def add_layer(self, bands, transform, vis_params, nodata=None, resampling='mean', band_overviews=None):
+        layer = layer_id(bands, transform, vis_params, nodata, resampling)
+        layer_dir = self._layer_dir(layer)
+        if os.path.isfile(os.path.join(layer_dir, 'layer.json')):
+            self._used(layer)
+            return layer
+
+        tmp_dir = os.path.join(self.directory, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(tmp_dir)
+        levels = 0
+        for index, band in enumerate(bands):
+            np.save(os.path.join(tmp_dir, f'band{index}.npy'), np.asarray(band))
+            if band_overviews is not None:
+                for level, values in enumerate(band_overviews[index], 1):
+                    np.save(os.path.join(tmp_dir, f'band{index}.ov{level}.npy'), np.asarray(values))
+                levels = len(band_overviews[index])
+            else:
+                template = os.path.join(tmp_dir, f'band{index}.ov{{}}.npy')
+                levels = len(overviews.build(band, resampling, nodata, path_template=template))
+        info = {
+            'transform': [float(value) for value in transform],
+            'shape': list(np.shape(bands[0])),
+            'bands': len(bands),
+            'vis_params': vis_params,
+            'nodata': nodata,
+            'resampling': resampling,
+            'overviews': levels,
+        }
+        with open(os.path.join(tmp_dir, 'layer.json'), 'w') as f:
+            json.dump(info, f)
+        size = _folder_size(tmp_dir)
+        try:
+            os.replace(tmp_dir, layer_dir)
+        except OSError:
+            # the same layer was stored in the meantime
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            size = 0
+        self._used(layer, size)
+        return layer
+
+    def has_layer(self, layer):
+        return os.path.isfile(os.path.join(self._layer_dir(layer), 'layer.json'))
+
+    def _open(self, layer):
+        with self._lock:
+            if layer not in self._layers:
+                layer_dir = self._layer_dir(layer)
+                with open(os.path.join(layer_dir, 'layer.json')) as f:
+                    info = json.load(f)
+                # bands[band][level], level 0 is the full resolution
+                bands = [
+                    [np.load(os.path.join(layer_dir, f'band{index}.npy'), mmap_mode='r')] +
+                    [np.load(os.path.join(layer_dir, f'band{index}.ov{level}.npy'), mmap_mode='r') for level in range(1, info['overviews'] + 1)]
+                    for index in range(info['bands'])
+                ]
+                self._layers[layer] = (info, bands)
+            return self._layers[layer]
+
+    # (west, south, east, north) of a layer
+    def bounds(self, layer):
+        info, _ = self._open(layer)
+        return transform_bounds(info['transform'], info['shape'])
+
+    # Zoom levels worth rendering: from the whole layer in one tile to the raster resolution
+    def zoom_range(self, layer):
+        info, _ = self._open(layer)
+        west, south, east, north = self.bounds(layer)
+        max_zoom = native_zoom(info['transform'][1])
+        min_zoom = max_zoom
+        while min_zoom > 0 and lonlat_tile(west, north, min_zoom) != lonlat_tile(east, south, min_zoom):
+            min_zoom -= 1
+        return min_zoom, max_zoom
+
+    # Nearest neighbour sampling of a layer's bands on the tile pixels, None when the tile is outside the layer
+    # Zoomed out tiles read the overview level matching their pixel size: constant work whatever the raster size
+    def sample(self, layer, z, x, y):
+        info, bands = self._open(layer)
+        level = overviews.level_for(info['transform'][1], 360 / (TILE_SIZE * 2 ** z), info['overviews'])
+        x0, dx, _, y0, _, dy = overviews.level_transform(info['transform'], level)
+        height, width = bands[0][level].shape
+        lon, lat = tile_lonlat(z, x, y)
+        columns = np.floor((lon - x0) / dx).astype(np.int64)
+        rows = np.floor((lat - y0) / dy).astype(np.int64)
+        column_valid = (columns >= 0) & (columns < width)
+        row_valid = (rows >= 0) & (rows < height)
+        if not column_valid.any() or not row_valid.any():
+            return None
+
+        # only the rows/columns under the tile are read from the memory-mapped bands
+        column_index = np.clip(columns, 0, width - 1)
+        row_index = np.clip(rows, 0, height - 1)
+        outside = ~(row_valid[:, None] & column_valid[None, :])
+        sampled = []
+        for band in bands:
+            values = np.asarray(band[level][row_index[:, None], column_index[None, :]], dtype=np.float32)
+            if info['nodata'] is not None:
+                values[values == info['nodata']] = np.nan
+            values[outside] = np.nan
+            sampled.append(values)
+        return sampled
+
+    # PNG bytes of a tile, None when it is fully transparent (cached as an empty file)
+    def render(self, layer, z, x, y):
+        path = os.path.join(self._layer_dir(layer), str(z), str(x), f'{y}.png')
+        if os.path.isfile(path):
+            with self._lock:
+                if layer in self._entries:
+                    self._entries[layer][1] = time.time()
+            with open(path, 'rb') as f:
+                return f.read() or None
+
+        info, _ = self._open(layer)
+        sampled = self.sample(layer, z, x, y)
+        if sampled is None:
+            return None
+        rgba = render.colorize(sampled, info['vis_params'])
+        data = png_bytes(rgba) if rgba[..., 3].any() else b''
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._used(layer, len(data))
+        return data or None
+
+    # Rendering every tile of a layer ahead of time into a z/x/y folder (the store by default),
+    # returns the number of non empty tiles
+    def prerender(self, layer, output_dir=None, min_zoom=None, max_zoom=None):
+        zoom_min, zoom_max = self.zoom_range(layer)
+        min_zoom = zoom_min if min_zoom is None else min_zoom
+        max_zoom = zoom_max if max_zoom is None else max_zoom
+        west, south, east, north = self.bounds(layer)
+
+        count = 0
+        for z in range(min_zoom, max_zoom + 1):
+            x_min, y_min = lonlat_tile(west, north, z)
+            x_max, y_max = lonlat_tile(east, south, z)
+            for x in range(x_min, x_max + 1):
+                for y in range(y_min, y_max + 1):
+                    data = self.render(layer, z, x, y)
+                    if data is None:
+                        continue
+                    count += 1
+                    if output_dir is not None:
+                        path = os.path.join(output_dir, str(z), str(x), f'{y}.png')
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        with open(path, 'wb') as f:
+                            f.write(data)
+        return count
+
+
+#################### Tile server ####################
+# GET /<layer>/<z>/<x>/<y>.png, empty tiles answer 204 (leaflet leaves them transparent)
+# GET /maps/<path>, files of the map shells folder: versioned urls (?v=...) are cached for good, the
+# others are revalidated with their ETag (a rewritten layer list is picked up, an unchanged one is a 304)
+MAP_CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.json': 'application/json',
+    '.geojson': 'application/geo+json',
+    '.js': 'text/javascript',
+    '.css': 'text/css',
+    '.png': 'image/png',
+}
+
+class _TileHandler(BaseHTTPRequestHandler):
+    store = None
+    maps_dir = None
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        parts = path.strip('/').split('/')
+        if parts[0] == 'maps':
+            return self.send_map_file('/'.join(parts[1:]), 'v=' in query)
+        try:
+            layer, z, x, y = parts[0], int(parts[1]), int(parts[2]), int(parts[3].split('.')[0])
+        except (IndexError, ValueError):
+            return self.send_error(404)
+        if not self.store.has_layer(layer) or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+            return self.send_error(404)
+
+        etag = f'"{layer}-{z}-{x}-{y}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        data = self.store.render(layer, z, x, y)
+        self.send_response(200 if data else 204)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if data:
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def send_map_file(self, relative_path, versioned):
+        if self.maps_dir is None:
+            return self.send_error(404)
+        root = os.path.realpath(self.maps_dir)
+        path = os.path.realpath(os.path.join(root, relative_path))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return self.send_error(404)
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache_control = 'public, max-age=31536000, immutable' if versioned else 'no-cache'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.end_headers()
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Content-Type', MAP_CONTENT_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream'))
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # requests are not logged on stderr
+    def log_message(self, format, *args):
+        pass
+
+
+class TileServer:
+    def __init__(self, store, host=TILE_HOST, port=TILE_PORT, maps_dir=MAP_DIR):
+        self.store = store
+        self.maps_dir = maps_dir
+        handler = type('TileHandler', (_TileHandler,), {'store': store, 'maps_dir': maps_dir})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = None
+
+    # XYZ url template of a layer for folium/leaflet
+    def url(self, layer):
+        return f'http://{self.host}:{self.port}/{layer}/{{z}}/{{x}}/{{y}}.png'
+
+    # Url of a file of the map shells folder
+    def map_url(self, relative_path):
+        return f"http://{self.host}:{self.port}/maps/{relative_path.replace(os.sep, '/')}"
+
+    # Writing a map shell (src/mapshell.py) as <maps_dir>/<name>/map.html next to the shared assets, returns
+    # its url. Past MAX_MAPS shells, the least recently written ones are removed.
+    def write_map(self, shell, name):
+        directory = os.path.join(self.maps_dir, name)
+        shell.write(directory, assets_dir=os.path.join(self.maps_dir, mapshell.ASSET_DIR))
+        # unchanged files are left as they are (their ETags stay valid), the folder time marks the use
+        os.utime(directory)
+        shells = sorted((entry for entry in os.scandir(self.maps_dir) if entry.is_dir() and entry.name != mapshell.ASSET_DIR),
+                        key=lambda entry: entry.stat().st_mtime)
+        for entry in shells[:max(len(shells) - MAX_MAPS, 0)]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+        return self.map_url(f'{name}/map.html')
+
+    # Serving from a daemon thread
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._thread = None
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Serve the local tile store over HTTP')
+    parser.add_argument('directory', nargs='?', default=TILE_DIR, help='tile store folder')
+    parser.add_argument('--host', default=TILE_HOST)
+    parser.add_argument('--port', type=int, default=TILE_PORT)
+    parser.add_argument('--maps', default=MAP_DIR, help='map shells folder, served under /maps/')
+    args = parser.parse_args()
+    server = TileServer(TileStore(args.directory), args.host, args.port, args.maps)
+    print(f'Serving {args.directory} on http://{server.host}:{server.port}/<layer>/<z>/<x>/<y>.png')
+    server.httpd.serve_forever()
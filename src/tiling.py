@@ -0,0 +1,240 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from src import classify
+from src import composite
+from src import overviews
+from src.instrument import peak_rss
+
+#################### Tiled processing of large scenes ####################
+# Streaming fixed-size windows of the area of interest through
+# compositing (the collections' src/composite.py method) > NBR / NDWI / dNBR / RdNBR / RBR (one fused pass,
+# src/indices.py) > classification
+# Each output is written straight into a .npy file on disk, so peak memory only depends on the tile size
+# and on the number of scenes, not on the scene size (a full 10980 x 10980 px Sentinel-2 tile works).
+
+# Tile side in pixels (a 1024 x 1024 float32 band is 4 MB)
+TILE_SIZE = 1024
+
+# Bands needed by the analysis (NDWI: B3/B11, NBR: B8/B12)
+ANALYSIS_BANDS = ['B3', 'B8', 'B11', 'B12']
+
+# Output rasters of a tiled run: name > dtype
+OUTPUTS = {
+    'pre_fire_NBR': np.float32,
+    'post_fire_NBR': np.float32,
+    'dNBR': np.float32,
+    'RdNBR': np.float32,
+    'RBR': np.float32,
+    'dNBR_classes': np.uint8,
+    'pre_ndwi': np.float32,
+}
+
+# Bands of the optional pre/post fire composite outputs (the app's TCI bands + the NBR bands)
+COMPOSITE_BANDS = ['B4', 'B8', 'B11', 'B12']
+
+# Outputs of a run, with the composite bands as '<pre_fire|post_fire>_<band>' rasters
+def output_types(composite_bands=()):
+    outputs = dict(OUTPUTS)
+    for period in ('pre_fire', 'post_fire'):
+        for band in composite_bands:
+            outputs[f'{period}_{band}'] = np.float32
+    return outputs
+
+
+# Splitting a raster shape into tiles, yields (window, padded window) pairs
+# The padded window adds `overlap` pixels on each side for steps that need neighbouring pixels.
+def tile_windows(shape, tile_size=TILE_SIZE, overlap=0):
+    height, width = shape
+    for row in range(0, height, tile_size):
+        for col in range(0, width, tile_size):
+            window = (row, min(row + tile_size, height)), (col, min(col + tile_size, width))
+            padded = (max(row - overlap, 0), min(row + tile_size + overlap, height)), \
+                (max(col - overlap, 0), min(col + tile_size + overlap, width))
+            yield window, padded
+
+# Cropping a padded tile array back to its window
+def crop(data, window, padded):
+    (row_start, row_stop), (col_start, col_stop) = window
+    (padded_row, _), (padded_col, _) = padded
+    return data[row_start - padded_row:row_stop - padded_row, col_start - padded_col:col_stop - padded_col]
+
+# Creating the output .npy files of a run
+def create_outputs(output_dir, shape, outputs=OUTPUTS):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for name, dtype in outputs.items():
+        paths[name] = os.path.join(output_dir, f'{name}.npy')
+        np.lib.format.open_memmap(paths[name], mode='w+', dtype=dtype, shape=shape).flush()
+    return paths
+
+# Writing a tile into an output file, the memory map is closed right away so written pages don't pile up
+def write_window(path, window, data):
+    (row_start, row_stop), (col_start, col_stop) = window
+    output = np.load(path, mmap_mode='r+')
+    output[row_start:row_stop, col_start:col_stop] = data
+    output.flush()
+    del output
+
+# Products of the fused index pass written by a run
+TILE_PRODUCTS = ['pre_NBR', 'post_NBR', 'pre_NDWI', 'dNBR', 'RdNBR', 'RBR']
+
+# Running the whole analysis on one tile, `offset` is the dNBR offset (src/indices.py)
+def process_tile(backend, pre_collection, post_collection, window, preset='USGS', composite_bands=(), offset=0.0):
+    bands = ANALYSIS_BANDS + [band for band in composite_bands if band not in ANALYSIS_BANDS]
+    pre_sat_imagery = backend.composite(pre_collection, window=window, bands=bands)
+    post_sat_imagery = backend.composite(post_collection, window=window, bands=bands)
+
+    products = backend.severity_indices(pre_sat_imagery, post_sat_imagery, offset, TILE_PRODUCTS)
+    dNBR = products['dNBR'].band('dNBR')
+    dNBR_classes, counts = classify.classify(dNBR, preset)
+    pre_ndwi = backend.mask_gt(products['pre_NDWI'], -0.12)
+
+    results = {
+        'pre_fire_NBR': products['pre_NBR'].band('NBR'),
+        'post_fire_NBR': products['post_NBR'].band('NBR'),
+        'dNBR': dNBR,
+        'RdNBR': products['RdNBR'].band('RdNBR'),
+        'RBR': products['RBR'].band('RBR'),
+        'dNBR_classes': dNBR_classes,
+        'pre_ndwi': pre_ndwi.band('NDWI'),
+    }
+    for band in composite_bands:
+        results[f'pre_fire_{band}'] = pre_sat_imagery.band(band)
+        results[f'post_fire_{band}'] = post_sat_imagery.band(band)
+    return results, counts
+
+# Empty results of a tile outside the area of interest
+def empty_tile(window, preset='USGS', outputs=OUTPUTS):
+    shape = (window[0][1] - window[0][0], window[1][1] - window[1][0])
+    results = {name: np.full(shape, 0 if dtype == np.uint8 else np.nan, dtype=dtype) for name, dtype in outputs.items()}
+    counts = np.zeros(classify.class_count(preset) + 1, dtype=np.int64)
+    counts[0] = shape[0] * shape[1]
+    return results, counts
+
+# Processing a tile and writing its results, returns the tile class counts
+# Tiles that don't touch any polygon of the area of interest are not read at all
+def run_tile(backend, pre_collection, post_collection, window, preset, paths, composite_bands=(), offset=0.0):
+    if pre_collection.intersects(window):
+        results, counts = process_tile(backend, pre_collection, post_collection, window, preset, composite_bands, offset)
+    else:
+        results, counts = empty_tile(window, preset, output_types(composite_bands))
+    for name, data in results.items():
+        write_window(paths[name], window, data)
+    return counts
+
+#################### Process pool ####################
+# Worker processes receive the (small) backend and collection descriptions once, at startup.
+# Tiles are then scheduled by window only: workers read the scene bands through memory maps and write
+# their results into the memory-mapped outputs, no pixel array is ever pickled between processes.
+_worker_job = None
+
+def _init_worker(backend, pre_collection, post_collection, preset, paths, composite_bands, offset):
+    global _worker_job
+    _worker_job = (backend, pre_collection, post_collection, preset, paths, composite_bands, offset)
+
+def _run_worker_tile(window):
+    backend, pre_collection, post_collection, preset, paths, composite_bands, offset = _worker_job
+    return run_tile(backend, pre_collection, post_collection, window, preset, paths, composite_bands, offset), peak_rss()
+
+# Running the tiles over a process pool, returns the summed class counts and the highest worker peak RSS
+def run_parallel(backend, pre_collection, post_collection, windows, preset, paths, workers, composite_bands=(), offset=0.0):
+    counts = np.zeros(classify.class_count(preset) + 1, dtype=np.int64)
+    workers_peak_rss = 0
+    job = (backend, pre_collection, post_collection, preset, paths, composite_bands, offset)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=job) as pool:
+        futures = [pool.submit(_run_worker_tile, window) for window in windows]
+        for future in as_completed(futures):
+            tile_counts, worker_peak_rss = future.result()
+            counts += tile_counts
+            workers_peak_rss = max(workers_peak_rss, worker_peak_rss)
+    return counts, workers_peak_rss
+
+# Decoding the bands read by a run into the scenes' band store (src/bandstore.py) before the workers start,
+# so they all map the same files instead of each decoding them
+def prefetch(collections, composite_bands=()):
+    for collection in collections:
+        bands = ANALYSIS_BANDS + [band for band in composite_bands if band not in ANALYSIS_BANDS]
+        if collection.compositing in composite.MASKED_METHODS:
+            bands.append('SCL')
+        if collection.compositing == 'best_pixel':
+            bands.append(composite.HAZE_BAND)
+        for scene in collection.scenes:
+            if scene.band_store is not None:
+                scene.band_store.prefetch([scene], bands)
+
+# Tiled run of a pre/post fire analysis, outputs are written in output_dir along with a run.json summary
+# workers > 1 fans the tiles out over a process pool (None = one worker per core)
+# composite_bands adds the composites of these bands to the outputs (e.g. COMPOSITE_BANDS for exports)
+# offset: dNBR offset subtracted before classification, RdNBR and RBR (src/indices.py)
+def run(backend, pre_collection, post_collection, output_dir, preset='USGS', tile_size=TILE_SIZE, workers=1, composite_bands=(),
+        offset=0.0):
+    start = time.perf_counter()
+    transform, shape = pre_collection.grid()
+    if post_collection.grid() != (transform, shape):
+        raise ValueError('Pre-fire and post-fire scenes must share the same pixel grid')
+
+    composite_bands = list(composite_bands)
+    paths = create_outputs(output_dir, shape, output_types(composite_bands))
+    windows = [window for window, _ in tile_windows(shape, tile_size)]
+    workers = min(workers or os.cpu_count(), len(windows))
+    if workers > 1:
+        prefetch([pre_collection, post_collection], composite_bands)
+        counts, workers_peak_rss = run_parallel(backend, pre_collection, post_collection, windows, preset, paths, workers,
+                                                composite_bands, offset)
+    else:
+        counts = np.zeros(classify.class_count(preset) + 1, dtype=np.int64)
+        for window in windows:
+            counts += run_tile(backend, pre_collection, post_collection, window, preset, paths, composite_bands, offset)
+        workers_peak_rss = 0
+
+    # overview pyramids of every output, built once here and read by the tile renderer and previews
+    overview_paths = {}
+    for name, path in paths.items():
+        method = overviews.resampling_for(name)
+        template = os.path.join(output_dir, f'{name}.ov{{}}.npy')
+        levels = overviews.build(np.load(path, mmap_mode='r'), method, 0 if method == 'mode' else None, path_template=template)
+        overview_paths[name] = [os.path.basename(template.format(index)) for index in range(1, len(levels) + 1)]
+        del levels
+
+    summary = {
+        'transform': list(transform),
+        'shape': list(shape),
+        'preset': preset,
+        'dnbr_offset': offset,
+        'tiles': len(windows),
+        'tile_size': tile_size,
+        'workers': workers,
+        'class_counts': counts.tolist(),
+        # file names only (outputs and overviews), joined with the folder the run is opened from
+        'outputs': {name: os.path.basename(path) for name, path in paths.items()},
+        'composite_bands': composite_bands,
+        'compositing': pre_collection.compositing,
+        'overviews': overview_paths,
+        'seconds': time.perf_counter() - start,
+        # per process peak: the main process and the largest worker
+        'peak_rss': max(peak_rss(), workers_peak_rss),
+    }
+    with open(os.path.join(output_dir, 'run.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+# Path of a run file listed in run.json, inside output_dir (runs written before file names were stored
+# there listed paths relative to the folder they were run from)
+def run_path(output_dir, path):
+    return os.path.join(output_dir, os.path.basename(path))
+
+# Opening the outputs of a finished run as read-only memory maps
+def open_outputs(output_dir):
+    with open(os.path.join(output_dir, 'run.json')) as f:
+        summary = json.load(f)
+    return summary, {name: np.load(run_path(output_dir, path), mmap_mode='r') for name, path in summary['outputs'].items()}
+
+# Opening the overview levels of the outputs of a finished run as read-only memory maps
+def open_overviews(summary, output_dir):
+    return {name: [np.load(run_path(output_dir, path), mmap_mode='r') for path in paths]
+            for name, paths in summary.get('overviews', {}).items()}
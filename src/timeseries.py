@@ -0,0 +1,196 @@
+import csv
+from datetime import datetime
+
+import numpy as np
+
+from src import composite
+from src.indices import rdnbr
+
+#################### Burn recovery time series ####################
+# Vegetation regrowth after a fire from every acquisition of a scene stack, in one pass: B8, B12 (and SCL)
+# of all the scenes are read chunk by chunk as (scenes, rows, cols) arrays, NBR is computed for every date
+# at once and reduced to
+#   - pre_NBR:         median of the clear pre-fire NBR observations
+#   - dNBR, RdNBR:     initial severity, from the first clear post-fire observation of each pixel
+#   - recovery_rate:   least squares slope of the post-fire NBR over time (NBR units per year)
+#   - recovery_ratio:  share of the NBR drop recovered at the last clear observation (1: back to pre-fire)
+# and to trajectories: per date mean NBR, dNBR and RdNBR of the burned pixels (initial dNBR >= BURNED_DNBR).
+# RdNBR is src/indices.py's: dNBR / sqrt(|pre_NBR|) with NBR in [-1, 1].
+
+# Rows processed at once: chunks hold (scenes, CHUNK_ROWS, cols) arrays of every band
+CHUNK_ROWS = 256
+
+# Lowest dNBR of a burned pixel (lower bound of the USGS low severity class)
+BURNED_DNBR = 0.1
+
+# Smallest NBR drop a recovery ratio is computed for
+MIN_NBR_DROP = 0.05
+
+DAYS_PER_YEAR = 365.25
+
+RASTERS = ['pre_NBR', 'dNBR', 'RdNBR', 'recovery_rate', 'recovery_ratio']
+
+# Trajectory table columns
+COLUMNS = ['date', 'period', 'days_since_fire', 'clear_percent', 'burned_pixels', 'mean_NBR', 'mean_dNBR', 'mean_RdNBR']
+
+
+# NBR of stacked B8 / B12 arrays, NaN where the SCL class is not clear
+def nbr(b8, b12, scl=None):
+    b8 = np.asarray(b8, dtype=np.float32)
+    b12 = np.asarray(b12, dtype=np.float32)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = (b8 - b12) / (b8 + b12)
+    if scl is not None:
+        values[~composite.clear_mask(scl)] = np.nan
+    return values
+
+# Mean of the clear observations of each date: scenes sorted by date, `starts` is the first scene of every
+# date (scenes of the same day, e.g. overlapping orbits, are merged)
+def date_means(stack, starts):
+    valid = np.isfinite(stack)
+    sums = np.add.reduceat(np.where(valid, stack, 0), starts, axis=0)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan).astype(np.float32)
+
+# Index along the first axis of the first (or last) finite value of every pixel, and whether there is one
+def first_valid(stack, last=False):
+    valid = np.isfinite(stack)
+    if last:
+        index = len(stack) - 1 - np.argmax(valid[::-1], axis=0)
+    else:
+        index = np.argmax(valid, axis=0)
+    return index, valid.any(axis=0)
+
+# NaN aware least squares slope of every pixel of a (dates, rows, cols) stack against `x` (one value per
+# date), NaN where there are less than 2 observations
+def slope(stack, x):
+    valid = np.isfinite(stack)
+    count = valid.sum(axis=0)
+    x = np.broadcast_to(np.asarray(x, dtype=np.float64)[:, None, None], stack.shape)
+    x_mean = np.where(valid, x, 0).sum(axis=0) / np.maximum(count, 1)
+    y_mean = np.where(valid, stack, 0).sum(axis=0) / np.maximum(count, 1)
+    dx = np.where(valid, x - x_mean, 0)
+    dy = np.where(valid, stack - y_mean, 0)
+    variance = (dx * dx).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((count >= 2) & (variance > 0), (dx * dy).sum(axis=0) / variance, np.nan).astype(np.float32)
+
+# Recovery of a (dates, rows, cols) NBR chunk: `pre` marks the pre-fire dates, `years` the time of every
+# date since the fire (post-fire dates), returns the RASTERS arrays and the (dates, rows, cols) dNBR / RdNBR
+def recovery_chunk(nbr_dates, pre, years):
+    post = ~pre
+    if pre.any():
+        pre_NBR = composite.masked_median(nbr_dates[pre], np.isfinite(nbr_dates[pre]))
+    else:
+        pre_NBR = np.full(nbr_dates.shape[1:], np.nan, dtype=np.float32)
+    dNBR_series = (pre_NBR[None] - nbr_dates).astype(np.float32)
+    RdNBR_series = rdnbr(dNBR_series, pre_NBR[None])
+
+    post_NBR = nbr_dates[post]
+    rasters = {'pre_NBR': pre_NBR}
+    if len(post_NBR):
+        first, observed = first_valid(post_NBR)
+        last, _ = first_valid(post_NBR, last=True)
+        first_NBR = np.take_along_axis(post_NBR, first[None], axis=0)[0]
+        last_NBR = np.take_along_axis(post_NBR, last[None], axis=0)[0]
+        drop = pre_NBR - first_NBR
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.where(drop >= MIN_NBR_DROP, (last_NBR - first_NBR) / drop, np.nan)
+        rasters['dNBR'] = np.where(observed, drop, np.nan).astype(np.float32)
+        rasters['recovery_rate'] = slope(post_NBR, np.asarray(years)[post])
+        rasters['recovery_ratio'] = np.where(observed, ratio, np.nan).astype(np.float32)
+    else:
+        empty = np.full(pre_NBR.shape, np.nan, dtype=np.float32)
+        rasters.update({'dNBR': empty, 'recovery_rate': empty, 'recovery_ratio': empty})
+    rasters['RdNBR'] = rdnbr(rasters['dNBR'], pre_NBR)
+    return rasters, dNBR_series, RdNBR_series
+
+# Recovery rasters and trajectories of a scene stack
+# read(window) returns the (scenes, rows, cols) B8, B12 and SCL (or None) stacks of a ((row_start, row_stop),
+# (col_start, col_stop)) window, scene_dates are sorted. Dates in [pre_start, pre_end) are pre-fire, dates
+# from post_start on are post-fire (fire time of the trajectories), the others are skipped.
+# inside(window) returns the area of interest mask of a window (everything when None). Only a chunk of rows
+# is held at once when the outputs are memory maps: `rasters` optional {name: array} of shape (rows, cols)
+# receiving the RASTERS (allocated in memory otherwise), `series` optional {'dNBR': array, 'RdNBR': array}
+# of shape (post-fire dates, rows, cols) receiving the per date rasters.
+def recovery(read, shape, scene_dates, pre_start, pre_end, post_start, inside=None, series=None, rasters=None,
+             chunk_rows=CHUNK_ROWS):
+    dates = sorted(set(scene_dates))
+    starts = [list(scene_dates).index(date) for date in dates]
+    pre = np.array([pre_start <= date < pre_end for date in dates], dtype=bool)
+    post = np.array([date >= post_start for date in dates], dtype=bool)
+    used = pre | post
+    days = np.array([(date - post_start).days for date in dates])
+    years = days[used] / DAYS_PER_YEAR
+    pre_used = pre[used]
+
+    height, width = shape
+    if rasters is None:
+        rasters = {name: np.full(shape, np.nan, dtype=np.float32) for name in RASTERS}
+    clear = np.zeros(len(dates), dtype=np.int64)
+    burned = np.zeros(len(dates), dtype=np.int64)
+    sums = {name: np.zeros(len(dates)) for name in ('NBR', 'dNBR', 'RdNBR')}
+    area_pixels = 0
+
+    for row in range(0, height, chunk_rows):
+        window = ((row, min(row + chunk_rows, height)), (0, width))
+        b8, b12, scl = read(window)
+        nbr_dates = date_means(nbr(b8, b12, scl), starts)
+        chunk_inside = np.ones(nbr_dates.shape[1:], dtype=bool) if inside is None else np.asarray(inside(window))
+        nbr_dates[:, ~chunk_inside] = np.nan
+        chunk_rasters, dNBR_series, RdNBR_series = recovery_chunk(nbr_dates[used], pre_used, years)
+        for name, values in chunk_rasters.items():
+            rasters[name][window[0][0]:window[0][1]] = values
+
+        # trajectories over the pixels burned at the first post-fire observation
+        is_burned = chunk_rasters['dNBR'] >= BURNED_DNBR
+        area_pixels += int(chunk_inside.sum())
+        clear += np.isfinite(nbr_dates).sum(axis=(1, 2))
+        used_index = np.nonzero(used)[0]
+        for values, name in ((nbr_dates[used], 'NBR'), (dNBR_series, 'dNBR'), (RdNBR_series, 'RdNBR')):
+            burned_values = np.where(is_burned[None] & np.isfinite(values), values, 0)
+            sums[name][used_index] += burned_values.sum(axis=(1, 2))
+        burned[used_index] += (is_burned[None] & np.isfinite(nbr_dates[used])).sum(axis=(1, 2))
+        if series is not None:
+            for name, values in (('dNBR', dNBR_series), ('RdNBR', RdNBR_series)):
+                if name in series:
+                    series[name][:, window[0][0]:window[0][1]] = values[~pre_used]
+
+    trajectory = []
+    for index, date in enumerate(dates):
+        if used[index]:
+            means = {name: sums[name][index] / burned[index] if burned[index] else None for name in sums}
+            trajectory.append(trajectory_row(date, pre[index], post_start, 100 * clear[index] / area_pixels if area_pixels else 0.0,
+                                             burned[index], means))
+    return rasters, trajectory
+
+# Trajectory table row of a date, means: {'NBR': value, 'dNBR': value, 'RdNBR': value} (None when unknown)
+def trajectory_row(date, is_pre, post_start, clear_percent, burned_pixels, means):
+    row = {
+        'date': date.isoformat(),
+        'period': 'pre_fire' if is_pre else 'post_fire',
+        'days_since_fire': (date - post_start).days,
+        'clear_percent': round(float(clear_percent), 2),
+        'burned_pixels': int(burned_pixels),
+    }
+    for name in ('NBR', 'dNBR', 'RdNBR'):
+        row[f'mean_{name}'] = None if means.get(name) is None else round(float(means[name]), 4)
+    return row
+
+# Dates of the post-fire rasters of the series
+def post_fire_dates(scene_dates, post_start):
+    return [date for date in sorted(set(scene_dates)) if date >= post_start]
+
+# Dates of the pre-fire [start, end) period and start of the post-fire period from 'YYYY-MM-DD' strings
+def parse_periods(pre_dates, post_start):
+    pre_start, pre_end = [datetime.strptime(date, '%Y-%m-%d').date() for date in pre_dates]
+    return pre_start, pre_end, datetime.strptime(post_start, '%Y-%m-%d').date()
+
+# Writing a trajectory table as CSV
+def write_trajectory(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
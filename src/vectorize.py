@@ -0,0 +1,398 @@
+import importlib.util
+import json
+import os
+import sys
+
+import numpy as np
+
+from src import classify
+from src import geometry
+
+#################### Burn scar polygonization ####################
+# Local replacement of Earth Engine's reduceToVectors for the burn scar (classes >= the preset's
+# 'burn_scar_from' class, 4-connected like webmap.py's eightConnected: False):
+#   1. the mask is labelled strip by strip (scipy.ndimage.label), labels touching across a strip seam
+#      are merged with a union-find
+#   2. pixel counts, areas and dNBR sums are accumulated per label with bincount
+#   3. the outline of every burned pixel run is emitted as horizontal/vertical edges, then all the edges
+#      are chained into rings at once with array operations (exteriors counter-clockwise, holes clockwise)
+#   4. the rings are simplified as they come out of the chaining, all at once (topology preserving
+#      Douglas-Peucker, one pixel tolerance by default, 0 keeps the exact pixel boundaries), and written as
+#      GeoJSON features with their area (hectares) and mean dNBR
+#
+#   python -m src.vectorize results/chenoua-2022
+
+# Rows labelled at once
+STRIP_ROWS = 1024
+
+# Mean earth radius based meters per degree of latitude
+METERS_PER_DEGREE = 111320
+
+# Edge directions in pixel coordinates (x = column, y = row, downwards), burned pixels on the right hand side
+EAST, SOUTH, WEST, NORTH = 0, 1, 2, 3
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = np.zeros(1, dtype=np.int64)
+
+    # Adding labels up to `count` (label 0 is the background)
+    def grow(self, count):
+        if count >= len(self.parent):
+            self.parent = np.concatenate([self.parent, np.arange(len(self.parent), count + 1)])
+
+    def find(self, label):
+        root = label
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # path compression
+        while self.parent[label] != root:
+            self.parent[label], label = root, self.parent[label]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+    # Root of every label
+    def roots(self):
+        roots = self.parent.copy()
+        while True:
+            parents = roots[roots]
+            if np.array_equal(parents, roots):
+                return roots
+            roots = parents
+
+
+# Horizontal runs of True values of a 2D mask as (row, start column, stop column) arrays
+def _runs(mask):
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    rows, columns = np.nonzero(np.diff(padded, axis=1))
+    return rows[0::2], columns[0::2], columns[1::2]
+
+# Boundary edges between two rows of pixels (the row above and the row below the y line), as
+# (x0, y0, x1, y1, direction, owner label) arrays, consecutive pixel edges merged into runs
+def _horizontal_edges(y, above, above_labels, below, below_labels):
+    edges = []
+    # burned below: walking east along the top of the pixels
+    _, start, stop = _runs((below & ~above)[None, :])
+    edges.append((start, np.full(len(start), y), stop, np.full(len(start), y), np.full(len(start), EAST), below_labels[start]))
+    # burned above: walking west along the bottom of the pixels
+    _, start, stop = _runs((above & ~below)[None, :])
+    edges.append((stop, np.full(len(start), y), start, np.full(len(start), y), np.full(len(start), WEST), above_labels[start]))
+    return edges
+
+# Boundary edges between the columns of a strip of rows starting at `row`
+def _vertical_edges(row, mask, labels):
+    width = mask.shape[1]
+    padded = np.zeros((mask.shape[0], width + 2), dtype=bool)
+    padded[:, 1:-1] = mask
+    left, right = padded[:, :-1], padded[:, 1:]
+    edges = []
+    # burned on the left of the x line: walking south, runs along the columns (transposed)
+    x, start, stop = _runs((left & ~right).T)
+    edges.append((x, row + start, x, row + stop, np.full(len(x), SOUTH), labels[start, x - 1]))
+    # burned on the right: walking north
+    x, start, stop = _runs((right & ~left).T)
+    edges.append((x, row + stop, x, row + start, np.full(len(x), NORTH), labels[start, x]))
+    return edges
+
+
+# Labelling the burn scar of a class raster strip by strip: returns the edges of every polygon outline
+# (with the provisional label owning them), the label union-find and per label pixel counts, areas and
+# dNBR sums
+def _label(classes, dNBR, threshold, transform):
+    from scipy import ndimage
+
+    height, width = classes.shape
+    x0, dx, _, y0, _, dy = transform
+    union_find = UnionFind()
+    edges = []
+    pixels, area, dNBR_sum, dNBR_count = [np.zeros(1)], [np.zeros(1)], [np.zeros(1)], [np.zeros(1)]
+    previous_mask = np.zeros(width, dtype=bool)
+    previous_labels = np.zeros(width, dtype=np.int64)
+    next_label = 0
+
+    for row in range(0, height, STRIP_ROWS):
+        mask = np.asarray(classes[row:row + STRIP_ROWS]) >= threshold
+        labels, count = ndimage.label(mask)
+        labels = labels.astype(np.int64)
+        labels[mask] += next_label
+        union_find.grow(next_label + count)
+
+        # merging the labels touching across the seam with the previous strip
+        seam = previous_mask & mask[0]
+        for a, b in set(zip(previous_labels[seam].tolist(), labels[0][seam].tolist())):
+            union_find.union(a, b)
+
+        # per label statistics, pixel areas shrink with the cosine of the latitude
+        latitude = y0 + (row + np.arange(len(mask)) + 0.5) * dy
+        pixel_area = abs(dx * dy) * METERS_PER_DEGREE ** 2 * np.cos(np.radians(latitude))
+        values = np.asarray(dNBR[row:row + STRIP_ROWS], dtype=np.float64)
+        valid = mask & np.isfinite(values)
+        size = next_label + count + 1
+        pixels.append(np.bincount(labels[mask], minlength=size)[next_label + 1:])
+        area.append(np.bincount(labels[mask], weights=np.broadcast_to(pixel_area[:, None], mask.shape)[mask], minlength=size)[next_label + 1:])
+        dNBR_sum.append(np.bincount(labels[valid], weights=values[valid], minlength=size)[next_label + 1:])
+        dNBR_count.append(np.bincount(labels[valid], minlength=size)[next_label + 1:])
+
+        # outline edges: the y lines above every row of the strip, and the x lines within the strip
+        edges.extend(_horizontal_edges(row, previous_mask, previous_labels, mask[0], labels[0]))
+        for offset in range(1, len(mask)):
+            edges.extend(_horizontal_edges(row + offset, mask[offset - 1], labels[offset - 1], mask[offset], labels[offset]))
+        edges.extend(_vertical_edges(row, mask, labels))
+
+        previous_mask, previous_labels = mask[-1], labels[-1]
+        next_label += count
+
+    # bottom line of the raster
+    edges.extend(_horizontal_edges(height, previous_mask, previous_labels, np.zeros(width, dtype=bool), np.zeros(width, dtype=np.int64)))
+    statistics = [np.concatenate(values) for values in (pixels, area, dNBR_sum, dNBR_count)]
+    return edges, union_find, statistics
+
+# Chaining every directed edge into closed rings at once: each edge is followed by the edge leaving its end
+# vertex, at a vertex shared by two diagonal pixels (two edges leave it) the walk turns right, hugging the
+# same pixel, so 4-connected polygons stay apart. The rings are the cycles of this permutation, found by
+# pointer doubling (log2 of the longest ring passes over the edge arrays).
+# Returns the edge indices in walking order and the ring of each of them (its lowest edge index, rings
+# start at it)
+def _chain(x0, y0, x1, y1, direction, width):
+    count = len(x0)
+    start_keys = y0 * (width + 1) + x0
+    end_keys = y1 * (width + 1) + x1
+    by_start = np.lexsort((direction, start_keys))
+    first = np.searchsorted(start_keys[by_start], end_keys)
+    outgoing = np.searchsorted(start_keys[by_start], end_keys, side='right') - first
+    following = by_start[first]
+    second = by_start[np.minimum(first + 1, count - 1)]
+    following = np.where((outgoing > 1) & (direction[following] != (direction + 1) % 4), second, following)
+
+    # ring of every edge: the lowest edge index of its cycle
+    ring = np.arange(count)
+    step = following
+    while True:
+        lowest = np.minimum(ring, ring[step])
+        if np.array_equal(lowest, ring):
+            break
+        ring, step = lowest, step[step]
+
+    # distance of every edge to the last edge of its ring (the one leading back to the first)
+    last = following == ring
+    distance = np.where(last, 0, 1)
+    step = np.where(last, np.arange(count), following)
+    while True:
+        jump = step[step]
+        if np.array_equal(jump, step):
+            break
+        distance, step = distance + distance[step], jump
+    order = np.lexsort((-distance, ring))
+    return order, ring[order]
+
+# Douglas-Peucker pass over every ring at once: points are the closed rings (first vertex repeated after
+# the last) laid end to end, the vertices of the `redo` rings are simplified again with their ring's
+# tolerance, the others keep their `keep` flags. Each step splits all the segments still farther than the
+# tolerance from one of their vertices at their farthest vertex (rings are anchored on their first, middle
+# and last vertex). Returns the kept vertices mask
+def _douglas_peucker(points, closed_starts, lengths, closed_ring, ring_tolerance, redo, keep):
+    keep = keep.copy()
+    simplified = redo[closed_ring]
+    keep[simplified] = False
+    keep[np.concatenate([closed_starts, closed_starts + lengths // 2, closed_starts + lengths])[np.tile(redo, 3)]] = True
+    active = simplified & ~keep
+    while active.any():
+        candidates = np.flatnonzero(active)
+        kept = np.flatnonzero(keep)
+        after = np.searchsorted(kept, candidates)
+        start, end = kept[after - 1], kept[after]
+        segment = points[end] - points[start]
+        offset = points[candidates] - points[start]
+        length = np.hypot(segment[:, 0], segment[:, 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distance = np.where(length > 0, np.abs(segment[:, 0] * offset[:, 1] - segment[:, 1] * offset[:, 0]) / length,
+                                np.hypot(offset[:, 0], offset[:, 1]))
+        # candidates are grouped by segment (same start vertex)
+        firsts = np.flatnonzero(np.diff(start, prepend=-1))
+        segment_index = np.repeat(np.arange(len(firsts)), np.diff(np.append(firsts, len(start))))
+        farthest = np.maximum.reduceat(distance, firsts)
+        split = farthest > ring_tolerance[closed_ring[start[firsts]]]
+        at_farthest = (distance == farthest[segment_index]) & split[segment_index]
+        chosen, chosen_segment = candidates[at_farthest], segment_index[at_farthest]
+        chosen = chosen[np.diff(chosen_segment, prepend=-1) != 0]
+        keep[chosen] = True
+        active[candidates[~split[segment_index]]] = False
+        active[chosen] = False
+    return keep
+
+# Polygons (ring owners) whose kept ring segments cross, over the `checked` rings
+def _crossing_polygons(points, keep, closed_ring, checked, ring_owner):
+    kept = np.flatnonzero(keep & checked[closed_ring])
+    ring_id = closed_ring[kept]
+    same_ring = ring_id[1:] == ring_id[:-1]
+    segments = np.stack([points[kept[:-1]][same_ring], points[kept[1:]][same_ring]], axis=1)
+    ring_id = ring_id[:-1][same_ring]
+    return np.unique(ring_owner[geometry.crossing_rings(segments, ring_id, ring_owner[ring_id])])
+
+# Simplifying all the rings as they come out of the chaining (vertices in walking order, rings starting at
+# ring_starts, not closed), topology preserving like geometry.simplify: the tolerance of a polygon whose rings
+# cross is halved (down to tolerance / 64, then exact) and its rings simplified again. Rings left with less
+# than 3 vertices keep all theirs. Returns the kept vertices mask
+def _simplify(vertices, ring_starts, ring_owner, tolerance):
+    count, ring_count = len(vertices), len(ring_starts)
+    lengths = np.diff(np.append(ring_starts, count))
+    closed_starts = ring_starts + np.arange(ring_count)
+    closed_ring = np.repeat(np.arange(ring_count), lengths + 1)
+    open_positions = np.arange(count) + np.repeat(np.arange(ring_count), lengths)
+    source = np.empty(count + ring_count, dtype=np.int64)
+    source[open_positions] = np.arange(count)
+    source[closed_starts + lengths] = ring_starts
+    points = vertices[source]
+
+    ring_tolerance = np.full(ring_count, float(tolerance))
+    keep = np.ones(len(points), dtype=bool)
+    redo = lengths > 3
+    while redo.any():
+        keep = _douglas_peucker(points, closed_starts, lengths, closed_ring, ring_tolerance, redo, keep)
+        keep |= (np.add.reduceat(keep, closed_starts) < 4)[closed_ring]
+        crossing = _crossing_polygons(points, keep, closed_ring, np.isin(ring_owner, ring_owner[redo]), ring_owner)
+        redo = np.isin(ring_owner, crossing)
+        ring_tolerance[redo] = np.where(ring_tolerance[redo] > tolerance / 64, ring_tolerance[redo] / 2, 0)
+        exact = redo & (ring_tolerance == 0)
+        keep |= exact[closed_ring]
+        redo &= ~exact & (lengths > 3)
+    return keep[open_positions]
+
+# Whether a point is inside a ring (even-odd rule)
+def _contains(ring, point):
+    x, y = ring[:-1, 0], ring[:-1, 1]
+    x_next, y_next = ring[1:, 0], ring[1:, 1]
+    crosses = (y > point[1]) != (y_next > point[1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x + (point[1] - y) * (x_next - x) / (y_next - y)
+    return bool(np.count_nonzero(crosses & (point[0] < x_cross)) % 2)
+
+# Assembling the rings of a polygon (lon/lat) into a Polygon or MultiPolygon, `exterior` flags the exterior rings
+def _polygon(rings, exterior):
+    exteriors = [ring for ring, is_exterior in zip(rings, exterior) if is_exterior]
+    holes = [ring for ring, is_exterior in zip(rings, exterior) if not is_exterior]
+    polygons = [[ring] for ring in exteriors]
+    for hole in holes:
+        owner = 0
+        if len(polygons) > 1:
+            # a hole belongs to the exterior ring containing it
+            point = hole[:2].mean(axis=0)
+            owner = next((index for index, ring in enumerate(exteriors) if _contains(ring, point)), 0)
+        polygons[owner].append(hole)
+    coordinates = [[ring.tolist() for ring in polygon] for polygon in polygons]
+    if len(coordinates) == 1:
+        return {'type': 'Polygon', 'coordinates': coordinates[0]}
+    return {'type': 'MultiPolygon', 'coordinates': coordinates}
+
+# Burn scar polygons of a class raster: GeoJSON features with their area (hectares) and mean dNBR
+# tolerance: simplification tolerance in degrees (None: one pixel, 0: exact pixel boundaries), min_pixels
+# drops the smaller polygons
+def burn_scar_features(classes, dNBR, transform, preset='USGS', tolerance=None, min_pixels=1):
+    threshold = classify.get_preset(preset)['burn_scar_from']
+    edges, union_find, (pixels, area, dNBR_sum, dNBR_count) = _label(classes, dNBR, threshold, transform)
+
+    # statistics and edges moved from the provisional labels to their root label
+    roots = union_find.roots()
+    size = len(roots)
+    pixels, area, dNBR_sum, dNBR_count = [np.bincount(roots[:len(values)], weights=values, minlength=size)
+                                          for values in (pixels, area, dNBR_sum, dNBR_count)]
+    x0, y0, x1, y1, direction, owner = [np.concatenate([edge[index] for edge in edges]).astype(np.int64) for index in range(6)]
+    owner = roots[owner]
+
+    # rings of every polygon, in walking order: ring starts, owner label and orientation
+    order, edge_ring = _chain(x0, y0, x1, y1, direction, classes.shape[1])
+    ring_starts = np.flatnonzero(np.diff(edge_ring, prepend=-1))
+    ring_ids = edge_ring[ring_starts]
+    ring_owner = owner[ring_ids]
+    # shoelace area in pixel coordinates, y downwards and walked with burned pixels on the right: the
+    # reversed lon/lat exterior rings are counter-clockwise
+    cross = (x0 * y1 - x1 * y0).astype(np.float64)
+    ring_area = np.bincount(np.searchsorted(ring_ids, edge_ring), weights=cross[order], minlength=len(ring_ids))
+    origin_x, dx, _, origin_y, _, dy = transform
+    ring_exterior = -ring_area * dx * dy > 0
+    # pixel corners to lon/lat
+    vertices = np.column_stack([origin_x + x0[order] * dx, origin_y + y0[order] * dy])
+    # rings grouped by label
+    ring_order = np.lexsort((ring_ids, ring_owner))
+    label_rings = np.searchsorted(ring_owner[ring_order], np.arange(size + 1))
+    ring_bounds = np.append(ring_starts, len(order))
+    if tolerance is None:
+        tolerance = abs(dx)
+    keep = _simplify(vertices, ring_starts, ring_owner, tolerance) if tolerance else np.ones(len(order), dtype=bool)
+
+    features = []
+    for label in np.nonzero(pixels >= max(min_pixels, 1))[0]:
+        rings, exterior = [], []
+        for index in ring_order[label_rings[label]:label_rings[label + 1]]:
+            walk = vertices[ring_bounds[index]:ring_bounds[index + 1]][keep[ring_bounds[index]:ring_bounds[index + 1]]]
+            # reversed and closed: [v0, vn-1, ..., v1, v0]
+            rings.append(np.concatenate([walk[:1], walk[:0:-1], walk[:1]]))
+            exterior.append(ring_exterior[index])
+        features.append({
+            'type': 'Feature',
+            'geometry': _polygon(rings, exterior),
+            'properties': {
+                'id': len(features) + 1,
+                'pixels': int(pixels[label]),
+                'area_ha': round(float(area[label]) / 10000, 4),
+                'mean_dNBR': round(float(dNBR_sum[label] / dNBR_count[label]), 4) if dNBR_count[label] else None,
+            },
+        })
+    return features
+
+# Writing features as a GeoJSON FeatureCollection, one feature per line
+def write_geojson(path, features):
+    with open(path, 'w') as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        for index, feature in enumerate(features):
+            f.write(('' if index == 0 else ',\n') + json.dumps(feature))
+        f.write('\n]}\n')
+    return path
+
+# Writing features as FlatGeobuf (optional, needs fiona)
+def write_flatgeobuf(path, features):
+    import fiona
+    schema = {'geometry': 'MultiPolygon', 'properties': {'id': 'int', 'pixels': 'int', 'area_ha': 'float', 'mean_dNBR': 'float'}}
+    with fiona.open(path, 'w', driver='FlatGeobuf', schema=schema, crs='EPSG:4326') as dst:
+        for feature in features:
+            geo = feature['geometry']
+            coordinates = [geo['coordinates']] if geo['type'] == 'Polygon' else geo['coordinates']
+            dst.write({'geometry': {'type': 'MultiPolygon', 'coordinates': coordinates}, 'properties': feature['properties']})
+    return path
+
+# Burn scar of a finished tiled run (see src/tiling.py), written next to its outputs
+def vectorize_run(output_dir, tolerance=None, min_pixels=1, flatgeobuf=False):
+    from src import tiling
+    summary, outputs = tiling.open_outputs(output_dir)
+    features = burn_scar_features(outputs['dNBR_classes'], outputs['dNBR'], summary['transform'], summary['preset'],
+                                  tolerance, min_pixels)
+    paths = [write_geojson(os.path.join(output_dir, 'burn_scar.geojson'), features)]
+    if flatgeobuf:
+        # fiona is optional: without it only the GeoJSON is written
+        if importlib.util.find_spec('fiona') is None:
+            print('fiona is not installed, burn_scar.fgb is not written', file=sys.stderr)
+        else:
+            paths.append(write_flatgeobuf(os.path.join(output_dir, 'burn_scar.fgb'), features))
+    return features, paths
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Burn scar polygons of a tiled analysis')
+    parser.add_argument('output_dir', help='folder of a tiled run (holding run.json)')
+    parser.add_argument('--tolerance', type=float, help='simplification tolerance in degrees (default: one pixel, 0: exact pixel boundaries)')
+    parser.add_argument('--min-pixels', type=int, default=1, help='smallest polygon kept, in pixels')
+    parser.add_argument('--flatgeobuf', action='store_true', help='also write burn_scar.fgb (needs fiona)')
+    args = parser.parse_args(argv)
+    features, paths = vectorize_run(args.output_dir, args.tolerance, args.min_pixels, args.flatgeobuf)
+    print(f"{len(features)} burn scar polygons written to {', '.join(paths)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
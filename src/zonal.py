@@ -0,0 +1,161 @@
+import csv
+
+import numpy as np
+
+from src import classify
+from src import geometry
+from src import spatial
+
+#################### Zonal burn statistics ####################
+# Per class (and per uploaded polygon) burn statistics in a single pass over the class and dNBR rasters:
+# every pixel gets a (zone, class, dNBR bin) index and pixel counts, areas, dNBR sums and dNBR histograms
+# are accumulated with bincount, strip by strip. Percentiles are read from the histograms (DNBR_BIN wide
+# bins), so the rasters are never sorted nor read twice.
+
+# Rows processed at once
+STRIP_ROWS = 1024
+
+# dNBR histogram range and bin width used for the percentiles
+DNBR_RANGE = (-2.0, 2.0)
+DNBR_BIN = 0.005
+
+# dNBR percentiles reported per class
+PERCENTILES = (10, 50, 90)
+
+# Mean earth radius based meters per degree of latitude
+METERS_PER_DEGREE = 111320
+
+# Table columns
+COLUMNS = ['zone', 'class', 'label', 'pixels', 'area_ha', 'percent', 'mean_dNBR'] + [f'p{p}_dNBR' for p in PERCENTILES]
+
+
+# Percentile values of histograms (one per row), linearly interpolated inside the bins
+def histogram_percentiles(histograms, percentiles=PERCENTILES, value_range=DNBR_RANGE, bin_width=DNBR_BIN):
+    totals = histograms.sum(axis=1)
+    cumulative = np.cumsum(histograms, axis=1)
+    result = np.full((len(histograms), len(percentiles)), np.nan)
+    for column, percentile in enumerate(percentiles):
+        target = totals * percentile / 100
+        for row in np.nonzero(totals)[0]:
+            index = min(int(np.searchsorted(cumulative[row], target[row])), histograms.shape[1] - 1)
+            before = cumulative[row, index - 1] if index else 0
+            inside = histograms[row, index]
+            fraction = (target[row] - before) / inside if inside else 0
+            result[row, column] = value_range[0] + (index + fraction) * bin_width
+    return result
+
+def _strip_transform(transform, row):
+    x0, dx, rx, y0, ry, dy = transform
+    return (x0, dx, rx, y0 + row * dy, ry, dy)
+
+# Zone raster of a strip: pixels get the 1-based index of the zone geometry covering them
+def _strip_zones(zones, tree, transform, row, shape):
+    x0, dx, _, y0, _, dy = transform
+    xs, ys = (x0, x0 + shape[1] * dx), (y0 + row * dy, y0 + (row + shape[0]) * dy)
+    hits = tree.query((min(xs), min(ys), max(xs), max(ys)))
+    return geometry.rasterize_ids([zones[index] for index in hits], _strip_transform(transform, row), shape, ids=hits + 1)
+
+# Statistics table of a class raster (uint8, or float with NaN for unclassified) and its dNBR raster
+# `zones`: optional list of GeoJSON geometries, each one gets its own rows (zone = its name), the area of
+# interest `aoi` (GeoJSON geometry, None: the whole raster) is the 'all' zone, pixels outside of it are not
+# counted. Percent is the share of the zone's area, unclassified and masked pixels included.
+def zonal_stats(classes, dNBR, transform, preset='USGS', zones=None, zone_names=None, aoi=None):
+    height = classes.shape[0]
+    _, dx, _, y0, _, dy = transform
+    class_slots = classify.class_count(preset) + 1
+    zone_count = len(zones) + 1 if zones else 1
+    bins = int(round((DNBR_RANGE[1] - DNBR_RANGE[0]) / DNBR_BIN))
+    tree = None
+    if zones:
+        boxes, _ = geometry.bounds_and_centroids(zones)
+        tree = spatial.STRtree(boxes)
+
+    size = zone_count * class_slots
+    pixels = np.zeros(size, dtype=np.int64)
+    area = np.zeros(size)
+    dNBR_sum = np.zeros(size)
+    dNBR_count = np.zeros(size, dtype=np.int64)
+    histograms = np.zeros(size * bins, dtype=np.int64)
+    zone_area = np.zeros(zone_count)
+
+    for row in range(0, height, STRIP_ROWS):
+        strip_classes = np.asarray(classes[row:row + STRIP_ROWS])
+        if np.issubdtype(strip_classes.dtype, np.floating):
+            strip_classes = np.nan_to_num(strip_classes, nan=0)
+        strip_classes = strip_classes.astype(np.int64)
+        values = np.asarray(dNBR[row:row + STRIP_ROWS], dtype=np.float64)
+        latitude = y0 + (row + np.arange(len(values)) + 0.5) * dy
+        pixel_area = np.broadcast_to((abs(dx * dy) * METERS_PER_DEGREE ** 2 * np.cos(np.radians(latitude)))[:, None], values.shape)
+
+        # the AOI (the whole raster without one), then the pixels of each zone
+        in_aoi = None if aoi is None else geometry.rasterize(aoi, _strip_transform(transform, row), values.shape)
+        keys = [strip_classes if in_aoi is None else strip_classes[in_aoi]]
+        masks = [in_aoi]
+        if zones:
+            strip_zones = _strip_zones(zones, tree, transform, row, values.shape)
+            inside = strip_zones > 0
+            keys.append((strip_zones * class_slots + strip_classes)[inside])
+            masks.append(inside)
+
+        # total area of every zone, whatever the class
+        zone_area[0] += pixel_area.sum() if in_aoi is None else pixel_area[in_aoi].sum()
+        if zones:
+            zone_area += np.bincount(strip_zones[inside], weights=pixel_area[inside], minlength=zone_count)
+
+        for key, mask in zip(keys, masks):
+            key = key.ravel()
+            key_values = values.ravel() if mask is None else values[mask]
+            key_area = pixel_area.ravel() if mask is None else pixel_area[mask]
+            pixels += np.bincount(key, minlength=size)
+            area += np.bincount(key, weights=key_area, minlength=size)
+            valid = np.isfinite(key_values)
+            dNBR_sum += np.bincount(key[valid], weights=key_values[valid], minlength=size)
+            dNBR_count += np.bincount(key[valid], minlength=size)
+            value_bin = np.clip(((key_values[valid] - DNBR_RANGE[0]) / DNBR_BIN).astype(np.int64), 0, bins - 1)
+            histograms += np.bincount(key[valid] * bins + value_bin, minlength=size * bins)
+
+    percentiles = histogram_percentiles(histograms.reshape(size, bins))
+    names = ['all'] + list(zone_names or [f'polygon {index}' for index in range(1, zone_count)])
+    rows = []
+    for zone in range(zone_count):
+        slots = slice(zone * class_slots, (zone + 1) * class_slots)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(dNBR_count[slots] > 0, dNBR_sum[slots] / np.maximum(dNBR_count[slots], 1), np.nan)
+        rows += zone_rows(names[zone], preset, pixels[slots], area[slots], means, percentiles[slots], zone_area[zone])
+    return rows
+
+# Table rows of one zone from per class arrays indexed by class value (index 0, unclassified, is skipped):
+# pixel counts, areas in square meters, dNBR means and (class, percentile) dNBR values, NaN when unknown
+# zone_area: area of the zone in square meters (unclassified and masked pixels included)
+def zone_rows(zone, preset, pixels, area, means, percentiles, zone_area):
+    labels = classify.get_preset(preset)['labels']
+    rows = []
+    for value in range(1, classify.class_count(preset) + 1):
+        row = {
+            'zone': zone,
+            'class': value,
+            'label': labels[value - 1],
+            'pixels': int(pixels[value]),
+            'area_ha': round(float(area[value]) / 10000, 4),
+            'percent': round(100 * float(area[value]) / zone_area, 3) if zone_area else 0.0,
+            'mean_dNBR': _rounded(means[value]),
+        }
+        for index, percentile in enumerate(PERCENTILES):
+            row[f'p{percentile}_dNBR'] = _rounded(percentiles[value][index])
+        rows.append(row)
+    return rows
+
+def _rounded(value):
+    return None if value is None or np.isnan(value) else round(float(value), 4)
+
+# Writing a statistics table as CSV, or Parquet (pandas + pyarrow) for .parquet paths
+def write_table(path, rows):
+    if path.endswith('.parquet'):
+        import pandas as pd
+        pd.DataFrame(rows, columns=COLUMNS).to_parquet(path, index=False)
+        return path
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
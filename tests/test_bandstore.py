@@ -0,0 +1,41 @@
+import numpy as np
+
+from src import bandstore
+
+
+# Scene with one band held in memory, its source file only signs the stored band
+class Scene:
+    id = '20220812T103031_T31SDA'
+    tile = None
+
+    def __init__(self, directory, data):
+        self.data = data
+        self.shape = data.shape
+        self.source = str(directory / 'B8.tif')
+        with open(self.source, 'wb') as f:
+            f.write(b'source')
+
+    def band_source(self, band):
+        return self.source
+
+    def read_source(self, band, window=None):
+        (row_start, row_stop), (col_start, col_stop) = window
+        return self.data[row_start:row_stop, col_start:col_stop]
+
+
+def test_band_is_stored_and_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(bandstore, 'WRITE_ROWS', 2)
+    data = np.arange(15, dtype=np.float32).reshape(5, 3)
+    store = bandstore.BandStore(str(tmp_path / 'store'))
+    band = store.band(Scene(tmp_path, data), 'B8')
+    assert isinstance(band, np.memmap)
+    np.testing.assert_array_equal(band, data)
+
+# Zero-height bands are stored as empty arrays of the band's dtype
+def test_zero_height_band(tmp_path):
+    store = bandstore.BandStore(str(tmp_path / 'store'))
+    scene = Scene(tmp_path, np.zeros((0, 4), dtype=np.uint8))
+    band = store.band(scene, 'B8')
+    assert band.shape == (0, 4)
+    assert band.dtype == np.uint8
+    assert store.has_band(scene, 'B8')
@@ -0,0 +1,50 @@
+import sys
+from unittest import mock
+
+import numpy as np
+
+from src import classify
+from src import engine
+
+
+# Pixels below the first edge, above the last one or NaN are unclassified (class 0)
+def test_out_of_table_pixels_are_unclassified():
+    values = np.array([[-0.6, -0.5, 1.3, 1.4, np.nan]], dtype=np.float32)
+    classes, counts = classify.classify(values, 'USGS')
+    assert classes.tolist() == [[0, 1, 7, 0, 0]]
+    assert counts[0] == 3
+
+# The local backend masks them (NaN), like classify_ee on Earth Engine
+def test_local_classification_masks_unclassified_pixels():
+    dNBR = engine.LocalImage({'dNBR': np.array([[-0.6, 0.0, 1.4]], dtype=np.float32)}, (0, 1, 0, 0, 0, -1))
+    classified = engine.LocalBackend('.').classify(dNBR, 'USGS').band('classification')
+    assert np.isnan(classified[0, 0]) and np.isnan(classified[0, 2])
+    assert classified[0, 1] == 3
+
+# classify_ee masks the pixels out of the table instead of keeping their raw dNBR (the baseline .where() chain)
+def test_classify_ee_masks_out_of_table_pixels(monkeypatch):
+    ee = mock.MagicMock()
+    monkeypatch.setitem(sys.modules, 'ee', ee)
+    dNBR = mock.MagicMock()
+    classify.classify_ee(dNBR, 'USGS')
+
+    classes = ee.Image.return_value.gte.return_value.reduce.return_value
+    # above the (inclusive) top edge
+    dNBR.lte.assert_called_once_with(1.3)
+    classes.updateMask.assert_called_once_with(dNBR.lte.return_value)
+    # below the first edge
+    in_range = classes.updateMask.return_value
+    in_range.gt.assert_called_once_with(0)
+    in_range.updateMask.assert_called_once_with(in_range.gt.return_value)
+
+# Open ended presets only mask the pixels below their first edge
+def test_classify_ee_open_top_edge(monkeypatch):
+    ee = mock.MagicMock()
+    monkeypatch.setitem(sys.modules, 'ee', ee)
+    dNBR = mock.MagicMock()
+    classify.classify_ee(dNBR, 'Project')
+
+    classes = ee.Image.return_value.gte.return_value.reduce.return_value
+    dNBR.lt.assert_not_called()
+    classes.updateMask.assert_called_once_with(classes.gt.return_value)
+    classes.gt.assert_called_once_with(0)
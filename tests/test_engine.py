@@ -0,0 +1,33 @@
+import json
+import os
+
+import numpy as np
+
+from src import engine
+
+
+def write_scene(library, scene_id, values):
+    scene_dir = os.path.join(library, scene_id)
+    os.makedirs(scene_dir, exist_ok=True)
+    np.save(os.path.join(scene_dir, 'B8.npy'), values)
+    with open(os.path.join(scene_dir, 'scene.json'), 'w') as f:
+        json.dump({'date': '2023-07-20', 'transform': [0, 1, 0, 0, 0, -1]}, f)
+
+
+# The library signature (part of the app's result cache key) follows added and replaced scenes
+def test_library_signature_follows_the_scenes(tmp_path):
+    library = str(tmp_path)
+    backend = engine.LocalBackend(library)
+    write_scene(library, 'scene1', np.zeros((4, 4), dtype=np.uint16))
+    first = backend.library_signature()
+    assert backend.library_signature() == first
+
+    write_scene(library, 'scene2', np.zeros((4, 4), dtype=np.uint16))
+    second = backend.library_signature()
+    assert second != first
+
+    write_scene(library, 'scene2', np.ones((8, 8), dtype=np.uint16))
+    assert backend.library_signature() != second
+
+def test_missing_library_has_no_signature(tmp_path):
+    assert engine.LocalBackend(str(tmp_path / 'missing')).library_signature() is None
@@ -0,0 +1,33 @@
+import json
+import os
+
+import pytest
+
+import batch
+from src import bench
+from src import export
+from src import vectorize
+
+
+# A batch run in one folder is exported and vectorized from another one: run.json holds file names only
+def test_export_run_from_another_directory(tmp_path, monkeypatch):
+    pytest.importorskip('zarr')
+    bench.synthetic_library(str(tmp_path / 'library'), 64, scenes=1)
+    bench.synthetic_aoi(str(tmp_path / 'aoi.geojson'), 64)
+    fire = {'name': 'f1', 'aoi': 'aoi.geojson', 'pre_date': bench.PRE_FIRE_DATE.isoformat(),
+            'post_date': bench.POST_FIRE_DATE.isoformat()}
+    with open(tmp_path / 'fires.json', 'w') as f:
+        json.dump({'library': 'library', 'fires': [fire]}, f)
+
+    monkeypatch.chdir(tmp_path)
+    assert batch.main(['fires.json', '--output', 'out', '--no-band-store']) == 0
+    with open(tmp_path / 'out' / 'f1' / 'run.json') as f:
+        summary = json.load(f)
+    assert summary['outputs']['dNBR'] == 'dNBR.npy'
+
+    (tmp_path / 'elsewhere').mkdir()
+    monkeypatch.chdir(tmp_path / 'elsewhere')
+    manifest = export.export_run(os.path.join('..', 'out', 'f1'), ['zarr'])
+    assert os.path.isdir(manifest['files']['zarr'])
+    features, _ = vectorize.vectorize_run(os.path.join('..', 'out', 'f1'))
+    assert features
@@ -0,0 +1,28 @@
+import numpy as np
+
+from src import tiles
+
+TRANSFORM = (2.3, 0.001, 0, 36.6, 0, -0.001)
+VIS_PARAMS = {'min': 0, 'max': 1}
+
+
+def band(value):
+    return np.full((64, 64), value, dtype=np.float32)
+
+
+# Past max_bytes the least recently used layer goes first, the layer in use is kept
+def test_least_recently_used_layer_is_evicted(tmp_path):
+    store = tiles.TileStore(str(tmp_path), max_bytes=None)
+    first = store.add_layer([band(0.1)], TRANSFORM, VIS_PARAMS)
+    layer_size = tiles._folder_size(str(tmp_path / first))
+
+    store = tiles.TileStore(str(tmp_path), max_bytes=int(layer_size * 2.5))
+    second = store.add_layer([band(0.2)], TRANSFORM, VIS_PARAMS)
+    # a rendered tile of the first layer makes it the most recently used one
+    west, south, east, north = store.bounds(first)
+    z, _ = store.zoom_range(first)
+    store.render(first, z, *tiles.lonlat_tile((west + east) / 2, (south + north) / 2, z))
+    third = store.add_layer([band(0.3)], TRANSFORM, VIS_PARAMS)
+    assert store.has_layer(first) and store.has_layer(third)
+    assert not store.has_layer(second)
+    assert store.generation == 1
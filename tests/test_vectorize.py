@@ -0,0 +1,46 @@
+import numpy as np
+
+from src import geometry
+from src import vectorize
+
+TRANSFORM = (2.3, 0.001, 0, 36.6, 0, -0.001)
+
+
+# Burned disc with a hole and a few small blobs (class 4 and up is the USGS burn scar)
+def classes_raster():
+    rows, columns = np.ogrid[:64, :64]
+    distance = np.hypot(rows - 30, columns - 28)
+    burned = (distance < 22) & (distance > 6)
+    burned[2:5, 55:60] = True
+    burned[58:62, 3:5] = True
+    return np.where(burned, 5, 1).astype(np.uint8)
+
+def rasterized(features, shape):
+    mask = np.zeros(shape, dtype=bool)
+    for feature in features:
+        mask |= geometry.rasterize(feature['geometry'], TRANSFORM, shape)
+    return mask
+
+def vertex_count(features):
+    return sum(len(ring) for feature in features for polygon in geometry.polygons(feature['geometry']) for ring in polygon)
+
+
+def test_exact_boundaries():
+    classes = classes_raster()
+    features = vectorize.burn_scar_features(classes, classes.astype(np.float32), TRANSFORM, tolerance=0)
+    assert len(features) == 3
+    np.testing.assert_array_equal(rasterized(features, classes.shape), classes >= 4)
+
+# Rings are simplified at one pixel by default, without crossings
+def test_simplified_at_one_pixel():
+    classes = classes_raster()
+    exact = vectorize.burn_scar_features(classes, classes.astype(np.float32), TRANSFORM, tolerance=0)
+    simplified = vectorize.burn_scar_features(classes, classes.astype(np.float32), TRANSFORM)
+    assert [feature['properties'] for feature in simplified] == [feature['properties'] for feature in exact]
+    assert vertex_count(simplified) < vertex_count(exact) / 2
+    for feature in simplified:
+        for polygon in geometry.polygons(feature['geometry']):
+            assert not geometry.rings_cross([np.asarray(ring) for ring in polygon])
+    # at most one pixel off the exact outline
+    difference = rasterized(simplified, classes.shape) != (classes >= 4)
+    assert difference.sum() < 0.1 * (classes >= 4).sum()
@@ -0,0 +1,20 @@
+import numpy as np
+
+from src import zonal
+
+TRANSFORM = (0, 0.001, 0, 0.01, 0, -0.001)
+
+AOI = {'type': 'Polygon', 'coordinates': [[[0, 0.01], [0.005, 0.01], [0.005, 0.005], [0, 0.005], [0, 0.01]]]}
+
+
+# Only the pixels of the AOI make the 'all' zone of a class raster that is not clipped to it
+def test_all_zone_is_masked_with_the_aoi():
+    classes = np.full((10, 10), 3, dtype=np.uint8)
+    classes[:, 5:] = 5
+    classes[0, 0] = 0
+    rows = zonal.zonal_stats(classes, np.zeros((10, 10), dtype=np.float32), TRANSFORM, 'USGS', aoi=AOI)
+    counts = {row['class']: row['pixels'] for row in rows}
+    assert counts[3] == 24
+    assert counts[5] == 0
+    # the unclassified pixel is part of the AOI area
+    assert 95 < sum(row['percent'] for row in rows) < 97